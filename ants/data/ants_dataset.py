@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import shutil
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# CSV families of the ant simulations and the table each one is stored in
+FOOD_COLLECTED_PATTERN = re.compile(
+    r"^food_collected_(llm|netlogo|hybrid)_seed_(\d+)\.csv$"
+)
+DURATION_PATTERN = re.compile(
+    r"^AntColony_(LLM|Netlogo|Hybrid)_Seed_(\d+)_(search|wayback)_duration\.csv$"
+)
+MODEL_NAMES = {"llm": "LLM", "netlogo": "NetLogo", "hybrid": "Hybrid"}
+MODEL_ORDER = ["LLM", "NetLogo", "Hybrid"]
+TABLES = ("food_collected", "search_duration", "wayback_duration")
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("model", pa.string()), ("seed", pa.int32())]), flavor="hive"
+)
+
+
+def _discover(csv_dir: str) -> dict:
+    """
+    Find the CSV files of every table in a directory.
+
+    :return: dict
+        Maps the table name to a list of (file_name, model, seed) tuples.
+    """
+    found = {table: [] for table in TABLES}
+    for name in sorted(os.listdir(csv_dir)):
+        match = FOOD_COLLECTED_PATTERN.match(name)
+        if match:
+            model, seed = match.groups()
+            found["food_collected"].append((name, MODEL_NAMES[model], int(seed)))
+            continue
+        match = DURATION_PATTERN.match(name)
+        if match:
+            model, seed, kind = match.groups()
+            found[f"{kind}_duration"].append(
+                (name, MODEL_NAMES[model.lower()], int(seed))
+            )
+    return found
+
+
+def _read_csv(file_path: str, table: str) -> pd.DataFrame:
+    if table == "food_collected":
+        return pd.read_csv(
+            file_path, dtype={"step_number": "int32", "food_amount": "int32"}
+        )
+    # The duration files are header-less "food patch, steps" pairs
+    return pd.read_csv(
+        file_path,
+        names=["Food Patch", "Steps"],
+        dtype={"Food Patch": "int8", "Steps": "int32"},
+        skipinitialspace=True,
+    )
+
+
+def convert_to_parquet(csv_dir: str = ".", dataset_dir: str = "ants_dataset") -> None:
+    """
+    Convert the food-collected and duration CSV files into a Parquet dataset.
+
+    Each table is written to <dataset_dir>/<table>/model=<model>/seed=<seed>/,
+    so readers can prune files by model and seed without opening them. The
+    tables are rewritten as a whole, so partitions of removed CSV files do not
+    remain.
+
+    :param csv_dir: str, optional
+        Directory holding the CSV files. Default is the current directory.
+    :param dataset_dir: str, optional
+        Output directory of the dataset. Default is "ants_dataset".
+
+    :return: None
+    """
+    for table, files in _discover(csv_dir).items():
+        shutil.rmtree(os.path.join(dataset_dir, table), ignore_errors=True)
+        if not files:
+            continue
+        frames = [
+            _read_csv(os.path.join(csv_dir, name), table).assign(model=model, seed=seed)
+            for name, model, seed in files
+        ]
+        data = pd.concat(frames, ignore_index=True)
+        data["seed"] = data["seed"].astype("int32")
+        ds.write_dataset(
+            pa.Table.from_pandas(data, preserve_index=False),
+            os.path.join(dataset_dir, table),
+            format="parquet",
+            partitioning=PARTITIONING,
+            existing_data_behavior="delete_matching",
+        )
+
+
+def _sources(csv_dir: str) -> list:
+    """
+    Return the [directory, [[file_name, size, mtime], ...]] of the CSV files a
+    dataset is converted from.
+    """
+    files = []
+    for table_files in _discover(csv_dir).values():
+        for name, _, _ in table_files:
+            stat = os.stat(os.path.join(csv_dir, name))
+            files.append([name, stat.st_size, stat.st_mtime_ns])
+    return [os.path.abspath(csv_dir), sorted(files)]
+
+
+def ensure_dataset(csv_dir: str = ".", dataset_dir: str = "ants_dataset") -> str:
+    """
+    Convert the CSV files unless the dataset was converted from the same
+    files. The directory, names, sizes and modification times of the CSV files
+    are kept in <dataset_dir>/.converted, so added, changed and removed files
+    all trigger a conversion.
+
+    :return: str
+        The dataset directory.
+    """
+    sources = _sources(csv_dir)
+    marker = os.path.join(dataset_dir, ".converted")
+    try:
+        with open(marker, "r") as file:
+            converted = json.load(file)
+    except (OSError, ValueError):
+        converted = None
+    if converted != sources:
+        convert_to_parquet(csv_dir, dataset_dir)
+        os.makedirs(dataset_dir, exist_ok=True)
+        with open(marker, "w") as file:
+            json.dump(sources, file)
+    return dataset_dir
+
+
+def load_table(
+    dataset_dir: str,
+    table: str,
+    columns: list = None,
+    models: list = None,
+    seeds: list = None,
+    filter=None,
+) -> pd.DataFrame:
+    """
+    Load a table of the dataset, reading only the requested columns and
+    partitions.
+
+    :param dataset_dir: str
+        Directory written by convert_to_parquet.
+    :param table: str
+        One of "food_collected", "search_duration" or "wayback_duration".
+    :param columns: List of str, optional
+        Columns to read. The "seed" and "source" (the model name as an
+        ordered categorical) columns are always added. Default is all.
+    :param models: List of str, optional
+        Models to keep, e.g. ["LLM", "Hybrid"]. Default is all.
+    :param seeds: List of int, optional
+        Seeds to keep. Default is all.
+    :param filter: pyarrow.compute.Expression, optional
+        Additional row filter pushed down to the Parquet reader.
+
+    :return: pd.DataFrame
+    """
+    dataset = ds.dataset(
+        os.path.join(dataset_dir, table), format="parquet", partitioning=PARTITIONING
+    )
+    expression = filter
+    for field, values in (("model", models), ("seed", seeds)):
+        if values is not None:
+            condition = ds.field(field).isin(list(values))
+            expression = condition if expression is None else expression & condition
+    if columns is not None:
+        columns = list(columns) + [c for c in ("seed", "model") if c not in columns]
+    data = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    data["source"] = pd.Categorical(data.pop("model"), categories=MODEL_ORDER)
+    # Keep the row order of the CSV loaders: by seed, then model, then step
+    return data.sort_values(["seed", "source"], kind="stable", ignore_index=True)
+
+
+if __name__ == "__main__":
+    csv_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    dataset_dir = sys.argv[2] if len(sys.argv) > 2 else "ants_dataset"
+    convert_to_parquet(csv_dir, dataset_dir)
@@ -1,21 +1,103 @@
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import pandas as pd
+import pyarrow.dataset as ds
 import seaborn as sns
 from mpl_toolkits.axes_grid1.inset_locator import mark_inset
 
+from ants_dataset import ensure_dataset, load_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from swarmgpt.aggregate import AggregateCache, aggregate, file_signature, lineplot
+from swarmgpt.journal import read_steps
+
 # Set the style of seaborn
 sns.set_theme(style="whitegrid", font_scale=1.3)
 
+# Line plot aggregates shared by all figures of a session
+AGGREGATES = AggregateCache()
+
+
+def load_food_collected(file_path: str) -> pd.DataFrame:
+    """
+    Load the food collected per step from a CSV export or an action journal.
+
+    :param file_path: str
+        Either a food_collected_*.csv file, or the prefix of an action journal
+        written by the models (e.g. antgpt_hybrid_seed_21504), whose segments
+        are named <prefix>.<first step>.jsonl[.gz].
+
+    :return: pd.DataFrame
+        Columns step_number and food_amount.
+    """
+    if file_path.endswith(".csv"):
+        return pd.read_csv(file_path)
+    # read_steps stops at the partial last record of an interrupted run
+    rows = [
+        (record["step"], record["metrics"]["food_amount"])
+        for record in read_steps(file_path)
+        if "food_amount" in record.get("metrics", {})
+    ]
+    return pd.DataFrame(rows, columns=["step_number", "food_amount"])
+
+
+def load_durations(
+    file_paths: list = None, dataset: str = None, table: str = None, seeds=None
+) -> pd.DataFrame:
+    """
+    Load the per-food-patch step counts of the three models.
+
+    :param file_paths: List of tuples of str, optional
+        Each tuple contains file paths for the LLM, NetLogo, and Hybrid CSV files to load.
+    :param dataset: str, optional
+        Directory of the Parquet dataset written by ants_dataset, used instead of file_paths.
+    :param table: str, optional
+        Dataset table, "search_duration" or "wayback_duration".
+    :param seeds: List of int, optional
+        Seeds to read from the dataset. Default is all.
 
-def collected_food(file_paths: list, step_number: int = 20, **kwargs) -> None:
+    :return: pd.DataFrame
+        Columns Food Patch, Steps and source.
+    """
+    if dataset is not None:
+        return load_table(dataset, table, columns=["Food Patch", "Steps"], seeds=seeds)
+    dataframes = []
+    for llm_file, netlogo_file, hybrid_file in file_paths:
+        for file_path, source in (
+            (llm_file, "LLM"),
+            (netlogo_file, "NetLogo"),
+            (hybrid_file, "Hybrid"),
+        ):
+            dataframes.append(
+                pd.read_csv(file_path, names=["Food Patch", "Steps"]).assign(
+                    source=source
+                )
+            )
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def collected_food(
+    file_paths: list = None,
+    step_number: int = 20,
+    dataset: str = None,
+    seeds=None,
+    **kwargs,
+) -> None:
     """
     Plot the average amount of food collected over time for different models (LLM, NetLogo, Hybrid).
     This function generates a line plot with an inset showing a zoomed-in view of a specific range.
 
     :param file_paths: List of tuples of str
-        Each tuple contains file paths for the LLM, NetLogo, and Hybrid CSV files to load.
+        Each tuple contains file paths for the LLM, NetLogo, and Hybrid CSV files (or action
+        journal prefixes, see load_food_collected) to load.
     :param step_number: int, optional
         The step interval for filtering the data. Default is 20.
+    :param dataset: str, optional
+        Directory of the Parquet dataset written by ants_dataset, used instead of file_paths.
+    :param seeds: List of int, optional
+        Seeds to read from the dataset. Default is all.
     :param kwargs: Additional keyword arguments for plot customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -23,37 +105,58 @@ def collected_food(file_paths: list, step_number: int = 20, **kwargs) -> None:
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
-    # Use a list comprehension to load and label the DataFrames
-    dataframes = [
-        pd.concat(
-            [
-                pd.read_csv(llm_file).assign(source="LLM"),
-                pd.read_csv(netlogo_file).assign(source="NetLogo"),
-                pd.read_csv(hybrid_file).assign(source="Hybrid")[:999],
-            ],
-            ignore_index=True,
-        )
-        for llm_file, netlogo_file, hybrid_file in file_paths
-    ]
 
-    # Concatenate all DataFrames in the list into a single DataFrame
-    final_df = pd.concat(dataframes, ignore_index=True)
+    def compute():
+        if dataset is not None:
+            # Read only the needed columns and drop the last Hybrid step on read
+            final_df = load_table(
+                dataset,
+                "food_collected",
+                columns=["step_number", "food_amount"],
+                seeds=seeds,
+                filter=(ds.field("model") != "Hybrid")
+                | (ds.field("step_number") < 999),
+            )
+        else:
+            # Use a list comprehension to load and label the DataFrames
+            dataframes = [
+                pd.concat(
+                    [
+                        load_food_collected(llm_file).assign(source="LLM"),
+                        load_food_collected(netlogo_file).assign(source="NetLogo"),
+                        load_food_collected(hybrid_file).assign(source="Hybrid")[:999],
+                    ],
+                    ignore_index=True,
+                )
+                for llm_file, netlogo_file, hybrid_file in file_paths
+            ]
+
+            # Concatenate all DataFrames in the list into a single DataFrame
+            final_df = pd.concat(dataframes, ignore_index=True)
 
-    # Take every nth step
-    filtered_data = final_df[final_df["step_number"] % step_number == 0]
+        # Take every nth step and average the seeds of every step and model
+        filtered_data = final_df[final_df["step_number"] % step_number == 0]
+        return aggregate(filtered_data, "step_number", "food_amount", "source")
+
+    inputs = [dataset] if dataset is not None else sum(map(list, file_paths), [])
+    agg = AGGREGATES.get(
+        (
+            "collected_food",
+            step_number,
+            None if seeds is None else list(seeds),
+            file_signature(inputs),
+        ),
+        compute,
+    )
 
     # Create a plot
     plt.figure(figsize=kwargs["figsize"])
-    d = sns.lineplot(
-        data=filtered_data,
-        x="step_number",
-        y="food_amount",
-        hue="source",
-        palette=kwargs["palette"],
-    )
+    d = lineplot(agg, "step_number", "source", palette=kwargs["palette"])
     # get axes for inset
     axes = d.axes
     x1, x2, y1, y2 = 0, 100, -1, 10
@@ -63,14 +166,7 @@ def collected_food(file_paths: list, step_number: int = 20, **kwargs) -> None:
     axins.tick_params(
         axis="x", labelsize=10
     )  # Decrease the fontsize of the inset xticks
-    d = sns.lineplot(
-        data=filtered_data,
-        x="step_number",
-        y="food_amount",
-        hue="source",
-        palette=kwargs["palette"],
-        ax=axins,
-    )
+    d = lineplot(agg, "step_number", "source", palette=kwargs["palette"], ax=axins)
     d.set(xlabel=None, ylabel=None)
     d.get_legend().set_visible(False)
     mark_inset(axes, axins, loc1=3, loc2=4, fc="none", ec="0.7")
@@ -81,21 +177,30 @@ def collected_food(file_paths: list, step_number: int = 20, **kwargs) -> None:
     plt.legend(title=kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "collected_food_amount_hybrid.pdf",
+            kwargs.get("output", "collected_food_amount_hybrid.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
     # Show the plot
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
-def steps_return_food(file_paths: list, **kwargs) -> None:
+def steps_return_food(
+    file_paths: list = None, dataset: str = None, seeds=None, **kwargs
+) -> None:
     """
     Plot the average time (in steps) taken for food return by ants for each food source.
     This function generates a box plot to visualize the distribution of steps for different models.
 
     :param file_paths: List of tuples of str
         Each tuple contains file paths for the LLM, NetLogo, and Hybrid CSV files to load.
+    :param dataset: str, optional
+        Directory of the Parquet dataset written by ants_dataset, used instead of file_paths.
+    :param seeds: List of int, optional
+        Seeds to read from the dataset. Default is all.
     :param kwargs: Additional keyword arguments for plot customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -103,28 +208,13 @@ def steps_return_food(file_paths: list, **kwargs) -> None:
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
     # load and label the DataFrames
-    dataframes = []
-    for llm_file, netlogo_file, hybrid_file in file_paths:
-        dataframes.append(
-            pd.read_csv(llm_file, names=["Food Patch", "Steps"]).assign(source="LLM")
-        )
-        dataframes.append(
-            pd.read_csv(netlogo_file, names=["Food Patch", "Steps"]).assign(
-                source="NetLogo"
-            )
-        )
-        dataframes.append(
-            pd.read_csv(hybrid_file, names=["Food Patch", "Steps"]).assign(
-                source="Hybrid"
-            )
-        )
-
-    # Concatenate all DataFrames in the list into a single DataFrame
-    final_df = pd.concat(dataframes, ignore_index=True)
+    final_df = load_durations(file_paths, dataset, "wayback_duration", seeds)
     # Print out statistics
     print(final_df.groupby(["Food Patch", "source"])["Steps"].describe())
 
@@ -142,20 +232,29 @@ def steps_return_food(file_paths: list, **kwargs) -> None:
     legend.set_title(kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "steps_return_food.pdf",
+            kwargs.get("output", "steps_return_food.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
-def steps_search_food(file_paths: list, **kwargs) -> None:
+def steps_search_food(
+    file_paths: list = None, dataset: str = None, seeds=None, **kwargs
+) -> None:
     """
     Plot the average time (in steps) taken for ants to search for food for each food source.
     This function generates a box plot to visualize the distribution of steps for different models.
 
     :param file_paths: List of tuples of str
         Each tuple contains file paths for the LLM, NetLogo, and Hybrid CSV files to load.
+    :param dataset: str, optional
+        Directory of the Parquet dataset written by ants_dataset, used instead of file_paths.
+    :param seeds: List of int, optional
+        Seeds to read from the dataset. Default is all.
     :param kwargs: Additional keyword arguments for customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -163,28 +262,13 @@ def steps_search_food(file_paths: list, **kwargs) -> None:
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
     # load and label the DataFrames
-    dataframes = []
-    for llm_file, netlogo_file, hybrid_file in file_paths:
-        dataframes.append(
-            pd.read_csv(llm_file, names=["Food Patch", "Steps"]).assign(source="LLM")
-        )
-        dataframes.append(
-            pd.read_csv(netlogo_file, names=["Food Patch", "Steps"]).assign(
-                source="NetLogo"
-            )
-        )
-        dataframes.append(
-            pd.read_csv(hybrid_file, names=["Food Patch", "Steps"]).assign(
-                source="Hybrid"
-            )
-        )
-
-    # Concatenate all DataFrames in the list into a single DataFrame
-    final_df = pd.concat(dataframes, ignore_index=True)
+    final_df = load_durations(file_paths, dataset, "search_duration", seeds)
     # Print out statistics
     print(final_df.groupby(["Food Patch", "source"])["Steps"].describe())
     # Create a box plot
@@ -201,11 +285,14 @@ def steps_search_food(file_paths: list, **kwargs) -> None:
     legend.set_title(kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "steps_search_food.pdf",
+            kwargs.get("output", "steps_search_food.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
 if __name__ == "__main__":
@@ -219,38 +306,17 @@ if __name__ == "__main__":
         "savefig": False,
     }
 
+    # Convert the CSV files to a Parquet dataset once, re-converting only when
+    # a CSV file is added, removed or changes size or modification time
+    dataset = ensure_dataset(".", "ants_dataset")
+    seeds = range(1, 6)
+    AGGREGATES.cache_dir = "aggregate_cache"
+
     # Figure 3
-    # Define the list of file paths
-    file_paths = [
-        (
-            f"food_collected_llm_seed_{i}.csv",
-            f"food_collected_netlogo_seed_{i}.csv",
-            f"food_collected_hybrid_seed_{i}.csv",
-        )
-        for i in range(1, 6)
-    ]
-    collected_food(file_paths, **kwargs)
+    collected_food(dataset=dataset, seeds=seeds, **kwargs)
 
     # figure 4
-    # Define the list of file paths
-    file_paths = [
-        (
-            f"AntColony_LLM_Seed_{i}_wayback_duration.csv",
-            f"AntColony_Netlogo_Seed_{i}_wayback_duration.csv",
-            f"AntColony_Hybrid_Seed_{i}_wayback_duration.csv",
-        )
-        for i in range(1, 6)
-    ]
-    steps_return_food(file_paths, **kwargs)
+    steps_return_food(dataset=dataset, seeds=seeds, **kwargs)
 
     # figure 5
-    # Define the list of file paths
-    file_paths = [
-        (
-            f"AntColony_LLM_Seed_{i}_search_duration.csv",
-            f"AntColony_Netlogo_Seed_{i}_search_duration.csv",
-            f"AntColony_Hybrid_Seed_{i}_search_duration.csv",
-        )
-        for i in range(1, 6)
-    ]
-    steps_search_food(file_paths, **kwargs)
+    steps_search_food(dataset=dataset, seeds=seeds, **kwargs)
@@ -0,0 +1,161 @@
+"""
+Microbenchmark of the reply parsers.
+
+    python benchmarks/parse_bench.py --replies 20000 --repeat 5
+
+Times swarmgpt.ants/birds.parse_response against the string-surgery parsers
+they replaced (kept below as the baseline) over a synthetic mix of plain,
+code-fenced and Python-style replies, and reports how often each parser
+accepts the replies and agrees with the other.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import swarmgpt.ants  # noqa: E402
+import swarmgpt.birds  # noqa: E402
+from swarmgpt.backends import ant_oracle_action  # noqa: E402
+
+
+def legacy_ant_parse(response: str) -> list:
+    text = response.lower().strip().replace(chr(39), chr(34)).replace("_", "-")
+    try:
+        text = text[text.find("{") :]
+        text = text[: text.find("}") + 1]
+        text = json.loads(text)
+        return [
+            True,
+            "None",
+            str(text["move-forward"]).lower() == "true",
+            str(text["rotate"]).lower(),
+            str(text["pick-up-food"]).lower() == "true",
+            str(text["drop-pheromone"]).lower() == "true",
+            str(text["drop-food"]).lower() == "true",
+        ]
+    except Exception as e:
+        return [False, str(e)]
+
+
+def legacy_bird_parse(response: str) -> list:
+    text = response.lower().strip().replace(chr(39), chr(34)).replace("_", "-")
+    try:
+        key = '"new-heading":'
+        index = text.find(key)
+        if index < 0:
+            raise ValueError("new-heading not found")
+        text = text[index + len(key) :]
+        return [True, "None", float(text[: text.find("}")].strip())]
+    except Exception as e:
+        return [False, str(e)]
+
+
+def ant_replies(count: int, rng: random.Random) -> list:
+    replies = []
+    for _ in range(count):
+        prompt = (
+            "Highest Pheromone Concentration: "
+            + rng.choice(["Left", "Right", "Front", "None"])
+            + ", -Nest Presence: **"
+            + rng.choice(["True", "False"])
+            + "** , -Stronger Nest Scent: Left, -Food Concentration at your "
+            + f"location: {rng.choice([0, 0, 0, 3.5])}, -Carrying Food Status **"
+            + rng.choice(["True", "False"])
+            + "**"
+        )
+        action = ant_oracle_action(prompt)
+        style = rng.random()
+        if style < 0.6:
+            reply = json.dumps(action)
+        elif style < 0.8:
+            reply = "```json\n" + json.dumps(action, indent=2) + "\n```"
+        else:
+            reply = "Here are my actions: " + repr(action)
+        replies.append(reply)
+    return replies
+
+
+def bird_replies(count: int, rng: random.Random) -> list:
+    replies = []
+    for _ in range(count):
+        heading = round(rng.uniform(0, 360), 2)
+        rationale = rng.choice(
+            [
+                "Align with the average heading of neighbors.",
+                "Separation {too close} dominates, turning away.",
+                "Cohere towards flockmates at {x: 3, y: -2}.",
+            ]
+        )
+        fields = [("rationale", rationale), ("new-heading", heading)]
+        if rng.random() < 0.3:
+            fields.reverse()
+        reply = json.dumps(dict(fields))
+        if rng.random() < 0.3:
+            reply = "```json\n" + reply + "\n```"
+        replies.append(reply)
+    return replies
+
+
+def bench(parse, replies: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for reply in replies:
+            parse(reply)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(replies: int = 20000, repeat: int = 5, seed: int = 0) -> dict:
+    """
+    Benchmark both parsers of both models.
+
+    :return: dict
+        Per model and parser: replies per second and the accepted share, plus
+        the share of replies accepted by both with identical records.
+    """
+    swarmgpt.ants.VERBOSE = False
+    swarmgpt.birds.VERBOSE = False
+    rng = random.Random(seed)
+    results = {}
+    for model, texts, legacy, current in (
+        (
+            "ants",
+            ant_replies(replies, rng),
+            legacy_ant_parse,
+            swarmgpt.ants.parse_response,
+        ),
+        (
+            "birds",
+            bird_replies(replies, rng),
+            legacy_bird_parse,
+            swarmgpt.birds.parse_response,
+        ),
+    ):
+        old = [legacy(text) for text in texts]
+        new = [current(text) for text in texts]
+        results[model] = {
+            "legacy_per_second": len(texts) / bench(legacy, texts, repeat),
+            "schema_per_second": len(texts) / bench(current, texts, repeat),
+            "legacy_accepted": sum(r[0] for r in old) / len(texts),
+            "schema_accepted": sum(r[0] for r in new) / len(texts),
+            "agree_when_both_accept": sum(
+                a == b for a, b in zip(old, new) if a[0] and b[0]
+            )
+            / max(1, sum(a[0] and b[0] for a, b in zip(old, new))),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--replies", type=int, default=20000, help="replies per model")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the reply mix")
+    args = parser.parse_args()
+    print(json.dumps(run(args.replies, args.repeat, args.seed), indent=1))
@@ -0,0 +1,552 @@
+"""
+Offline regression benchmarks of the Python side of the models.
+
+    python benchmarks/suite.py --scales 1 10 100 --output results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --check
+
+Times the hot paths at synthetic scale-ups of the seed data, without NetLogo
+or a network:
+
+- replay: process_step over every step of ant step logs in the format the
+  models print, one 1000-step log of 5 LLM ants per scale unit, index build
+  included;
+- parse: ants/birds parse_response over recorded-style replies (plain,
+  code-fenced and Python-style, see parse_bench.py), 5000 per scale unit;
+- prompt: ants/birds prompt rendering from sensor readings, 5000 per scale
+  unit;
+- analysis: the figure functions of ants_food_collection.py over copies of the
+  five seeds of CSVs in ants/data (one copy per scale unit), and of flocking.py
+  over synthetic .pairs flocks (one hybrid and one rule-based run per scale
+  unit);
+- flock: FlockEngine steps of 100 birds, 5 of them LLM birds, 100 steps per
+  scale unit.
+
+Every case reports its best timing and its throughput. The suite makes --runs
+passes over all cases with --repeat timings each, because the timings of the
+short cases vary by more than 50% between passes on a shared host, and load
+only ever adds time. A fixed reference workload of pure Python and numpy is
+timed the same way, and --baseline compares the case timings relative to it,
+so a baseline pinned on one host holds on a faster or slower one. The cases
+slower than the pinned baseline by more than --tolerance (default: twice as
+slow) are listed under "regressions", and --check fails the run on them. The
+analysis functions print their statistics; they are discarded while timing,
+so stdout only holds the JSON results.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+ANTS_DATA = os.path.join(ROOT, "ants", "data")
+BIRDS_DATA = os.path.join(ROOT, "birds", "data")
+for path in (ROOT, ANTS_DATA, BIRDS_DATA, HERE):
+    sys.path.insert(0, path)
+
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+
+import ants_food_collection  # noqa: E402
+import flocking  # noqa: E402
+import swarmgpt.ants  # noqa: E402
+import swarmgpt.birds  # noqa: E402
+import swarmgpt.replay  # noqa: E402
+from ants_dataset import ensure_dataset  # noqa: E402
+from parse_bench import ant_replies, bird_replies  # noqa: E402
+from swarmgpt.backends import ant_oracle_action  # noqa: E402
+from swarmgpt.flock import FlockEngine  # noqa: E402
+from swarmgpt.pairwise import PairwiseWriter  # noqa: E402
+
+LOG_STEPS = 1000
+LOG_ANTS = 5
+ITEMS = LOG_STEPS * LOG_ANTS
+ANT_SEEDS = range(1, 6)
+ANT_MODELS = ("llm", "netlogo", "hybrid")
+FLOCK_BIRDS = 20
+FLOCK_STEPS = 100
+ENGINE_BIRDS = 100
+ENGINE_LLM_BIRDS = 5
+
+PLOT_KWARGS = {
+    "figsize": (12, 6),
+    "palette": "Set2",
+    "bbox_inches": "tight",
+    "pad_inches": 0.1,
+    "legend_title": "Model Variant",
+    "savefig": False,
+    "show": False,
+}
+
+# Markers printed by populate_ant_with_llm_data, in its order
+ROTATE_MARKERS = {
+    "left": "rotate-left",
+    "right": "rotate-right",
+    "none": "rotate-none",
+}
+
+
+def timed(function, repeat: int, setup=None) -> float:
+    """
+    Return the best wall time of function over repeat runs; setup runs
+    untimed before each.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def reference_work() -> None:
+    """
+    The fixed workload the cases are timed relative to: sorting, JSON and
+    string handling in Python and vector arithmetic in numpy.
+    """
+    rng = random.Random(0)
+    values = [rng.random() for _ in range(100000)]
+    sorted(values)
+    json.loads(json.dumps(values[:20000]))
+    " ".join(f"{value:.3f}" for value in values[:20000]).split()
+    array = np.asarray(values)
+    np.sort(array)
+    head = array[:300]
+    np.hypot(head[:, np.newaxis], head[np.newaxis, :]).sum()
+
+
+def ant_observation(rng: random.Random) -> list:
+    return [
+        rng.choice([0.0, 0.0, rng.uniform(0, 5)]),
+        rng.choice([0.0, 0.0, rng.uniform(0, 5)]),
+        rng.choice([0.0, 0.0, rng.uniform(0, 5)]),
+        rng.random() < 0.1,
+        rng.uniform(0, 200),
+        rng.uniform(0, 200),
+        rng.uniform(0, 200),
+        rng.choice([0, 0, 0, 0, 1, 2]),
+        rng.random() < 0.3,
+    ]
+
+
+def bird_observation(rng: random.Random) -> list:
+    flockmates = [
+        [rng.uniform(0, 360), rng.uniform(-5, 5), rng.uniform(-5, 5)]
+        for _ in range(rng.randint(0, 8))
+    ]
+    return [rng.uniform(0, 360), flockmates]
+
+
+def write_ant_log(file_name: str, rng: random.Random, oracle: dict) -> None:
+    """
+    Write a step log of LOG_STEPS steps of LOG_ANTS LLM ants, as printed by
+    the hybrid model without a journal.
+    """
+    lines = []
+    for step in range(LOG_STEPS):
+        lines.append(f"step: {step}")
+        for ant in range(LOG_ANTS):
+            prompt, _ = swarmgpt.ants.observation_prompt(ant_observation(rng))
+            if prompt not in oracle:
+                oracle[prompt] = ant_oracle_action(prompt)
+            action = oracle[prompt]
+            lines += [
+                f"Start-AntID: {ant}",
+                "User prompt: " + prompt,
+                "--------------- llm data: ----------------",
+                "Parser ok",
+            ]
+            if action["pick-up-food"]:
+                lines.append("--- action pick-up-food")
+            if action["move-forward"]:
+                lines.append("--- action move")
+            rotate = ROTATE_MARKERS.get(
+                action["rotate"], rng.choice(["rotate-random-r", "rotate-random-l"])
+            )
+            lines.append("--- action " + rotate)
+            if action["drop-pheromone"]:
+                lines.append("--- action drop-pheromone")
+            if action["drop-food"]:
+                lines.append("--- action drop-food")
+            lines += ["end parser", f"End-AntID: {ant}"]
+        lines.append("end step")
+    with open(file_name, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def write_flock(file_name: str, rng: np.random.Generator) -> None:
+    """
+    Write a .pairs file of a random flock drifting on the 71x71 torus.
+    """
+    writer = PairwiseWriter(file_name, FLOCK_BIRDS, 71, 71)
+    state = np.column_stack(
+        [
+            rng.uniform(-35, 35, FLOCK_BIRDS),
+            rng.uniform(-35, 35, FLOCK_BIRDS),
+            rng.uniform(0, 360, FLOCK_BIRDS),
+        ]
+    )
+    for step in range(FLOCK_STEPS):
+        state[:, 2] = (state[:, 2] + rng.normal(0, 10, FLOCK_BIRDS)) % 360
+        radians = np.radians(state[:, 2])
+        state[:, 0] = (state[:, 0] + np.sin(radians) + 35.5) % 71 - 35.5
+        state[:, 1] = (state[:, 1] + np.cos(radians) + 35.5) % 71 - 35.5
+        writer.write(step, state.tolist())
+    writer.close()
+
+
+def scale_ant_csvs(directory: str, scale: int) -> None:
+    """
+    Copy the CSVs of ants/data scale times, renumbering the seeds.
+    """
+    for unit in range(scale):
+        for seed in ANT_SEEDS:
+            new_seed = unit * len(ANT_SEEDS) + seed
+            for path in glob.glob(os.path.join(ANTS_DATA, f"*_[Ss]eed_{seed}[_.]*csv")):
+                name = os.path.basename(path).replace(
+                    f"_seed_{seed}.", f"_seed_{new_seed}."
+                )
+                name = name.replace(f"_Seed_{seed}_", f"_Seed_{new_seed}_")
+                shutil.copyfile(path, os.path.join(directory, name))
+
+
+def ant_file_paths(directory: str, seeds, kind: str = None) -> list:
+    """
+    Return the (LLM, NetLogo, Hybrid) file tuples of the seeds, for the food
+    collected (kind None) or a duration table ("search" or "wayback").
+    """
+    if kind is None:
+        names = [f"food_collected_{model}_seed_{{}}.csv" for model in ANT_MODELS]
+    else:
+        names = [
+            f"AntColony_{model}_Seed_{{}}_{kind}_duration.csv"
+            for model in ("LLM", "Netlogo", "Hybrid")
+        ]
+    return [
+        tuple(os.path.join(directory, name.format(seed)) for name in names)
+        for seed in seeds
+    ]
+
+
+def _reset_analysis() -> None:
+    # Time the computation, not the in-memory caches of earlier repeats
+    ants_food_collection.AGGREGATES._tables.clear()
+    flocking.AGGREGATES._tables.clear()
+    flocking.FLOCK_DATA.clear()
+
+
+def _result(seconds: float, items: int) -> dict:
+    return {"seconds": seconds, "items": items, "per_second": items / seconds}
+
+
+def run_scale(scale: int, work_dir: str, repeat: int, seed: int) -> dict:
+    """
+    Run every case at one scale.
+
+    :return: dict
+        Case name to {"seconds", "items", "per_second"}.
+    """
+    rng = random.Random(seed)
+    swarmgpt.ants.VERBOSE = False
+    swarmgpt.birds.VERBOSE = False
+    results = {}
+
+    # Replay
+    oracle = {}
+    logs = []
+    for unit in range(scale):
+        logs.append(os.path.join(work_dir, f"antgpt_hybrid_seed_{unit + 1}.txt"))
+        write_ant_log(logs[-1], rng, oracle)
+
+    def cold_replay():
+        swarmgpt.replay._open_logs.clear()
+        for log in logs:
+            if os.path.exists(log + swarmgpt.replay.INDEX_SUFFIX):
+                os.remove(log + swarmgpt.replay.INDEX_SUFFIX)
+
+    def replay():
+        for log in logs:
+            for step in range(LOG_STEPS):
+                swarmgpt.replay.process_step(log, step)
+
+    results["replay.process_step"] = _result(
+        timed(replay, repeat, cold_replay), LOG_STEPS * scale
+    )
+
+    # Parsing
+    for name, replies, parse in (
+        ("parse.ants", ant_replies(ITEMS * scale, rng), swarmgpt.ants.parse_response),
+        (
+            "parse.birds",
+            bird_replies(ITEMS * scale, rng),
+            swarmgpt.birds.parse_response,
+        ),
+    ):
+        results[name] = _result(
+            timed(lambda: [parse(reply) for reply in replies], repeat), len(replies)
+        )
+
+    # Prompts
+    observations = [ant_observation(rng) for _ in range(ITEMS * scale)]
+    sensors = [
+        [swarmgpt.ants.netlogo_number(value) for value in observation[:3]]
+        + [str(observation[3])]
+        + [swarmgpt.ants.netlogo_number(value) for value in observation[4:8]]
+        + [str(observation[8])]
+        for observation in observations
+    ]
+    birds = [bird_observation(rng) for _ in range(ITEMS * scale)]
+    context = [40.0, 5.0, 3.0, 1.0]
+    for name, function in (
+        (
+            "prompt.ants.create_prompt",
+            lambda: [swarmgpt.ants.create_prompt(*row) for row in sensors],
+        ),
+        (
+            "prompt.ants.observation_prompt",
+            lambda: [swarmgpt.ants.observation_prompt(row) for row in observations],
+        ),
+        (
+            "prompt.birds.observation_prompt",
+            lambda: [swarmgpt.birds.observation_prompt(row, context) for row in birds],
+        ),
+    ):
+        results[name] = _result(timed(function, repeat), ITEMS * scale)
+
+    # Ant analysis, from the CSVs and from the Parquet dataset
+    csv_dir = os.path.join(work_dir, "ants")
+    os.makedirs(csv_dir)
+    scale_ant_csvs(csv_dir, scale)
+    seeds = range(1, len(ANT_SEEDS) * scale + 1)
+    dataset = ensure_dataset(csv_dir, os.path.join(work_dir, "ants_dataset"))
+    for function, kind in (
+        (ants_food_collection.collected_food, None),
+        (ants_food_collection.steps_return_food, "wayback"),
+        (ants_food_collection.steps_search_food, "search"),
+    ):
+        file_paths = ant_file_paths(csv_dir, seeds, kind)
+        results[f"analysis.ants.{function.__name__}.csv"] = _result(
+            timed(lambda: function(file_paths, **PLOT_KWARGS), repeat, _reset_analysis),
+            len(seeds),
+        )
+        results[f"analysis.ants.{function.__name__}.dataset"] = _result(
+            timed(
+                lambda: function(dataset=dataset, seeds=seeds, **PLOT_KWARGS),
+                repeat,
+                _reset_analysis,
+            ),
+            len(seeds),
+        )
+
+    # Flocking analysis
+    generator = np.random.default_rng(seed)
+    hybrid, rule_based = [], []
+    for unit in range(scale):
+        for group, name in ((hybrid, "flockdata"), (rule_based, "flockdata_rulebased")):
+            group.append(os.path.join(work_dir, f"{name}_seed_{unit + 1}.pairs"))
+            write_flock(group[-1], generator)
+    for function in (
+        flocking.heading_differences,
+        flocking.distances,
+        flocking.collisions,
+        flocking.number_neighbours,
+    ):
+        results[f"analysis.birds.{function.__name__}"] = _result(
+            timed(
+                lambda: function(hybrid, rule_based, **PLOT_KWARGS),
+                repeat,
+                _reset_analysis,
+            ),
+            2 * scale,
+        )
+
+    # Flock step of the rule-based birds
+    engine = FlockEngine(71, 71)
+    state = np.column_stack(
+        (
+            generator.uniform(-35, 35, ENGINE_BIRDS),
+            generator.uniform(-35, 35, ENGINE_BIRDS),
+            generator.uniform(0, 360, ENGINE_BIRDS),
+        )
+    ).tolist()
+    flock_params = [1.5, 5.0, 3.0, 1.0, 5.0]
+    results["flock.step"] = _result(
+        timed(
+            lambda: [
+                engine.step(state, ENGINE_LLM_BIRDS, flock_params)
+                for _ in range(FLOCK_STEPS * scale)
+            ],
+            repeat,
+        ),
+        FLOCK_STEPS * scale,
+    )
+    return results
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float, reference: float = None
+) -> list:
+    """
+    Return the cases slower than the baseline by more than tolerance.
+
+    :param reference: float, optional
+        Seconds of reference_work in this run. With the reference seconds of
+        the baseline, the ratio compares the case timings in units of the
+        reference workload of each run. Default is to compare seconds.
+
+    :return: List of dict
+        Case, scale, baseline and current seconds and their ratio.
+    """
+    pinned_reference = baseline.get("reference", {}).get("seconds")
+    speed = 1.0
+    if reference and pinned_reference:
+        # > 1 when this host runs the reference workload slower
+        speed = reference / pinned_reference
+    regressions = []
+    for scale, cases in results.items():
+        for case, result in cases.items():
+            pinned = baseline.get("results", {}).get(scale, {}).get(case)
+            if pinned is None:
+                continue
+            ratio = result["seconds"] / (pinned["seconds"] * speed)
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    {
+                        "case": case,
+                        "scale": scale,
+                        "baseline_seconds": pinned["seconds"],
+                        "seconds": result["seconds"],
+                        "ratio": ratio,
+                    }
+                )
+    return regressions
+
+
+def _best_results(passes: list) -> dict:
+    # Case results of the fastest pass, per scale and case
+    return {
+        scale: {
+            case: min(
+                (results[scale][case] for results in passes),
+                key=lambda result: result["seconds"],
+            )
+            for case in cases
+        }
+        for scale, cases in passes[0].items()
+    }
+
+
+def run(
+    scales=(1, 10, 100),
+    repeat: int = 3,
+    seed: int = 0,
+    baseline: dict = None,
+    tolerance: float = 1.0,
+    runs: int = 3,
+) -> dict:
+    """
+    Run the suite.
+
+    :param runs: int, optional
+        Passes over all cases; every timing is the best of all passes.
+        Default is 3.
+
+    :return: dict
+        "environment", "reference" (seconds of reference_work), "results"
+        (scale to case results, see run_scale) and, with a baseline,
+        "regressions" (see compare).
+    """
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": ants_food_collection.pd.__version__,
+        },
+        "repeat": repeat,
+        "runs": runs,
+        "seed": seed,
+    }
+    references = []
+    passes = []
+    for _ in range(max(1, runs)):
+        references.append(timed(reference_work, max(repeat, 5)))
+        results = {}
+        for scale in scales:
+            work_dir = tempfile.mkdtemp(prefix=f"swarmgpt_bench_{scale}x_")
+            try:
+                # Keep the statistics printed by the analysis functions out of
+                # the timings and out of the JSON on stdout
+                with (
+                    open(os.devnull, "w") as devnull,
+                    contextlib.redirect_stdout(devnull),
+                ):
+                    results[f"{scale}x"] = run_scale(scale, work_dir, repeat, seed)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        passes.append(results)
+    report["reference"] = {"seconds": min(references)}
+    report["results"] = _best_results(passes)
+    if baseline is not None:
+        report["tolerance"] = tolerance
+        report["regressions"] = compare(
+            report["results"],
+            baseline,
+            tolerance,
+            report["reference"]["seconds"],
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scales", nargs="*", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the synthetic data"
+    )
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.0,
+        help="allowed slowdown over the baseline, 1.0 (default) is twice as slow",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="passes of the suite, timings are the best of all passes",
+    )
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+    report = run(
+        args.scales, args.repeat, args.seed, baseline, args.tolerance, args.runs
+    )
+    text = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if args.check and report.get("regressions"):
+        sys.exit(1)
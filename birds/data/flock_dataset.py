@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from swarmgpt import pairwise
+
+# Compact dtypes of the pairwise tables written by calculate-differences
+PAIR_DTYPES = {
+    "step_number": "int32",
+    "bird1_id": "int16",
+    "bird2_id": "int16",
+    "distance": "float32",
+    "heading_difference": "float32",
+}
+
+
+def read_condensed(file_path: str, steps=None) -> pd.DataFrame:
+    """
+    Read a condensed .pairs file written by the model's pairwise export.
+
+    :param file_path: str
+        Path of the .pairs file.
+    :param steps: slice or array-like of int, optional
+        Record positions to read, e.g. slice(0, None, 50). Only those records
+        are paged in. Default is all.
+
+    :return: pd.DataFrame
+        The same upper-triangle table read_upper_triangle returns, with
+        distance and heading_difference side by side.
+    """
+    header, records = pairwise.read_pairs(file_path)
+    records = records[slice(None) if steps is None else steps]
+    bird1, bird2 = np.triu_indices(int(header["n_birds"]), 1)
+    pairs = records["pairs"].reshape(-1)
+    return pd.DataFrame(
+        {
+            "step_number": np.repeat(records["step"], len(bird1)),
+            "bird1_id": np.tile(bird1.astype(np.int16), len(records)),
+            "bird2_id": np.tile(bird2.astype(np.int16), len(records)),
+            "distance": pairs["distance"],
+            "heading_difference": pairs["heading_difference"],
+        }
+    )
+
+
+def read_positions(file_path: str, steps=None) -> pd.DataFrame:
+    """
+    Read a .positions file written by the model's position export.
+
+    :param file_path: str
+        Path of the .positions file.
+    :param steps: slice or array-like of int, optional
+        Record positions to read, see read_condensed. Default is all.
+
+    :return: pd.DataFrame
+        Columns step_number, bird_id, xcor, ycor and heading. The world size is
+        kept in attrs["world_size"] for the torus-aware neighbor queries.
+    """
+    header, records = pairwise.read_positions(file_path)
+    records = records[slice(None) if steps is None else steps]
+    n_birds = int(header["n_birds"])
+    birds = records["birds"].reshape(-1)
+    data = pd.DataFrame(
+        {
+            "step_number": np.repeat(records["step"], n_birds),
+            "bird_id": np.tile(np.arange(n_birds, dtype=np.int16), len(records)),
+            "xcor": birds["xcor"],
+            "ycor": birds["ycor"],
+            "heading": birds["heading"],
+        }
+    )
+    data.attrs["world_size"] = (
+        float(header["world_width"]),
+        float(header["world_height"]),
+    )
+    return data
+
+
+def read_upper_triangle(file_path: str) -> pd.DataFrame:
+    """
+    Read a pairwise CSV file and keep each unordered bird pair once.
+
+    The model writes both (i, j) and (j, i) with the same distance and heading
+    difference, so the rows with bird1_id < bird2_id hold all the information.
+
+    :param file_path: str
+        Path of a distances_flockdata_* or headingsdiff_flockdata_* CSV file.
+
+    :return: pd.DataFrame
+        The upper-triangle rows with the PAIR_DTYPES dtypes.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    data = pd.read_csv(
+        file_path, dtype={c: t for c, t in PAIR_DTYPES.items() if c in header}
+    )
+    return data[data["bird1_id"] < data["bird2_id"]].reset_index(drop=True)
+
+
+def iter_upper_triangle(file_path: str, columns=None, chunksize: int = 2**20):
+    """
+    Read a pairwise CSV or .pairs file in chunks of bounded size, keeping each
+    unordered bird pair once, for files too large to load whole.
+
+    :param file_path: str
+        Path of a pairwise CSV file or of a condensed .pairs file.
+    :param columns: list of str, optional
+        Value columns to read besides step_number, bird1_id and bird2_id,
+        e.g. ["distance"]. Default is all.
+    :param chunksize: int, optional
+        Rows read per chunk; a .pairs file is read in whole ticks of about
+        as many pairs. Default is 2**20.
+
+    :return: iterator of pd.DataFrame
+        The upper-triangle rows of every chunk, as read_upper_triangle and
+        read_condensed return them.
+    """
+    keys = ["step_number", "bird1_id", "bird2_id"]
+    if file_path.endswith(".pairs"):
+        header, records = pairwise.read_pairs(file_path)
+        n_birds = int(header["n_birds"])
+        count = len(records)
+        ticks = max(1, chunksize // max(1, pairwise.pair_count(n_birds)))
+        for start in range(0, count, ticks):
+            data = read_condensed(file_path, slice(start, start + ticks))
+            yield data if columns is None else data[keys + list(columns)]
+        return
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = None if columns is None else keys + list(columns)
+    for data in pd.read_csv(
+        file_path,
+        usecols=usecols,
+        dtype={c: t for c, t in PAIR_DTYPES.items() if c in header},
+        chunksize=chunksize,
+    ):
+        yield data[data["bird1_id"] < data["bird2_id"]].reset_index(drop=True)
+
+
+def pair_endpoints(pairs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand upper-triangle pairs to one row per bird and pair, i.e. the rows the
+    full (i, j) and (j, i) table would have with bird1_id as bird_id.
+
+    :param pairs: pd.DataFrame
+        Upper-triangle pairs with step_number, bird1_id and bird2_id columns.
+
+    :return: pd.DataFrame
+        Columns step_number and bird_id.
+    """
+    return pd.concat(
+        [
+            pairs[["step_number", "bird1_id"]].rename(columns={"bird1_id": "bird_id"}),
+            pairs[["step_number", "bird2_id"]].rename(columns={"bird2_id": "bird_id"}),
+        ],
+        ignore_index=True,
+    )
+
+
+class FlockDataset:
+    """
+    Load-once cache of the upper-triangle pairwise tables, shared by the
+    flocking figures.
+
+    Tables are kept in memory per file and reloaded only if the file changed.
+    With a cache directory, the compact tables are also stored as Parquet so
+    later runs skip the CSV parsing. A Parquet copy is named after the absolute
+    path of its CSV file and holds the size and modification time of that file
+    in its metadata, so it is only used for the same, unchanged file.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        :param cache_dir: str, optional
+            Directory for the Parquet copies of the tables. Default is None
+            (memory only).
+        """
+        self.cache_dir = cache_dir
+        self._tables = {}
+
+    def _cache_file(self, file_path: str) -> str:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        digest = hashlib.sha256(os.path.abspath(file_path).encode("utf-8"))
+        return os.path.join(
+            self.cache_dir, f"{name}.{digest.hexdigest()[:16]}.upper.parquet"
+        )
+
+    @staticmethod
+    def _source(file_path: str) -> bytes:
+        stat = os.stat(file_path)
+        return json.dumps(
+            [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+        ).encode("utf-8")
+
+    def _read(self, file_path: str) -> pd.DataFrame:
+        if file_path.endswith(".pairs"):
+            # Already compact and upper-triangle, nothing to cache
+            return read_condensed(file_path)
+        if file_path.endswith(".positions"):
+            return read_positions(file_path)
+        if self.cache_dir is None:
+            return read_upper_triangle(file_path)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cache_file = self._cache_file(file_path)
+        source = self._source(file_path)
+        if os.path.exists(cache_file):
+            metadata = pq.read_schema(cache_file).metadata or {}
+            if metadata.get(b"source") == source:
+                return pd.read_parquet(cache_file)
+        data = read_upper_triangle(file_path)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        table = table.replace_schema_metadata(
+            dict(table.schema.metadata or {}, source=source)
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        pq.write_table(table, cache_file)
+        return data
+
+    def pairs(self, file_path: str) -> pd.DataFrame:
+        """
+        Return the upper-triangle table of a pairwise CSV or .pairs file, or
+        the table of a .positions file.
+
+        The returned DataFrame is shared: columns added by one analysis, such
+        as the bird types, are seen by the next.
+        """
+        key = os.path.abspath(file_path)
+        mtime = os.path.getmtime(file_path)
+        cached = self._tables.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self._read(file_path))
+            self._tables[key] = cached
+        return cached[1]
+
+    def load(self, file_paths: list) -> list:
+        """
+        Return the upper-triangle tables of several files, see pairs.
+        """
+        return [self.pairs(file_path) for file_path in file_paths]
+
+    def clear(self) -> None:
+        self._tables.clear()
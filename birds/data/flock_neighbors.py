@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from flock_dataset import pair_endpoints
+
+# World of the flocking model: patches -35 to 35 on both axes, wrapping
+WORLD_SIZE = (71.0, 71.0)
+
+
+def _wrap(positions: np.ndarray, world_size) -> np.ndarray:
+    box = np.asarray(world_size, dtype=np.float64)
+    wrapped = np.mod(np.asarray(positions, dtype=np.float64), box)
+    # np.mod can round a tiny negative coordinate up to the box size itself
+    return np.where(wrapped >= box, wrapped - box, wrapped)
+
+
+def neighbor_pairs(
+    positions, max_distance: float, min_distance: float = None, world_size=WORLD_SIZE
+) -> np.ndarray:
+    """
+    Find the bird pairs within a distance on the torus with a KD-tree.
+
+    :param positions: array-like of shape (n, 2)
+        xcor and ycor of every bird.
+    :param max_distance: float
+        Pairs with a distance <= max_distance are returned.
+    :param min_distance: float, optional
+        Pairs with a distance <= min_distance are left out. Default is None.
+    :param world_size: tuple of float, optional
+        Width and height of the wrapping world. Default is WORLD_SIZE.
+
+    :return: np.ndarray
+        Array of shape (k, 2) with the i < j indices of the pairs.
+    """
+    wrapped = _wrap(positions, world_size)
+    tree = cKDTree(wrapped, boxsize=world_size)
+    pairs = tree.query_pairs(max_distance, output_type="ndarray")
+    if min_distance is not None and len(pairs):
+        box = np.asarray(world_size, dtype=np.float64)
+        delta = np.abs(wrapped[pairs[:, 0]] - wrapped[pairs[:, 1]])
+        delta = np.minimum(delta, box - delta)
+        pairs = pairs[np.hypot(delta[:, 0], delta[:, 1]) > min_distance]
+    return pairs
+
+
+def neighbor_counts(
+    positions, max_distance: float, min_distance: float = None, world_size=WORLD_SIZE
+) -> np.ndarray:
+    """
+    Count the neighbors of every bird within a distance, see neighbor_pairs.
+
+    :return: np.ndarray
+        One count per bird.
+    """
+    pairs = neighbor_pairs(positions, max_distance, min_distance, world_size)
+    return np.bincount(pairs.reshape(-1), minlength=len(positions))
+
+
+def neighbor_table(
+    data: pd.DataFrame,
+    max_distance: float,
+    min_distance: float = None,
+    step_number: int = None,
+) -> pd.DataFrame:
+    """
+    Count the neighbors of every bird per step, from either a pairwise table or
+    a table of positions.
+
+    Positions (columns step_number, bird_id, xcor and ycor, see
+    flock_dataset.read_positions) are answered with a KD-tree per step in
+    O(N log N), without materializing all pairs. Upper-triangle pairwise tables
+    are filtered on their distance column.
+
+    :param data: pd.DataFrame
+        The positions or upper-triangle pairs of a run.
+    :param max_distance: float
+        Neighbors are at a distance <= max_distance.
+    :param min_distance: float, optional
+        Neighbors are at a distance > min_distance. Default is None.
+    :param step_number: int, optional
+        Only count every nth step. Default is every step.
+
+    :return: pd.DataFrame
+        Columns step_number, bird_id and count, for the birds with at least
+        one neighbor, sorted by step and bird.
+    """
+    if step_number:
+        data = data[data["step_number"] % step_number == 0]
+    if "xcor" not in data.columns:
+        mask = data["distance"] <= max_distance
+        if min_distance is not None:
+            mask &= data["distance"] > min_distance
+        return (
+            pair_endpoints(data[mask])
+            .groupby(["step_number", "bird_id"])
+            .size()
+            .reset_index(name="count")
+        )
+
+    world_size = data.attrs.get("world_size", WORLD_SIZE)
+    data = data.sort_values(["step_number", "bird_id"], kind="stable")
+    steps, starts = np.unique(data["step_number"].to_numpy(), return_index=True)
+    positions = data[["xcor", "ycor"]].to_numpy()
+    bird_ids = data["bird_id"].to_numpy()
+    tables = []
+    for step, start, end in zip(steps, starts, np.append(starts[1:], len(data))):
+        counts = neighbor_counts(
+            positions[start:end], max_distance, min_distance, world_size
+        )
+        found = counts > 0
+        tables.append(
+            pd.DataFrame(
+                {
+                    "step_number": step,
+                    "bird_id": bird_ids[start:end][found],
+                    "count": counts[found],
+                }
+            )
+        )
+    if not tables:
+        return pd.DataFrame(columns=["step_number", "bird_id", "count"])
+    return pd.concat(tables, ignore_index=True)
@@ -1,25 +1,216 @@
+import os
+import sys
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from flock_dataset import FlockDataset, iter_upper_triangle
+from flock_neighbors import neighbor_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from swarmgpt.aggregate import (
+    AggregateCache,
+    RunningAggregate,
+    aggregate,
+    file_signature,
+    lineplot,
+)
+
 sns.set_theme(style="whitegrid", font_scale=1.3)
 
+# Birds with an id up to this value are controlled by the LLM in the hybrid model
+LLM_BIRD_MAX_ID = 4
+BIRD_TYPES = pd.CategoricalDtype(["Hybrid (LLM)", "Hybrid (NetLogo)"], ordered=True)
+
+# Pairwise tables and line plot aggregates shared by all figures of a session
+FLOCK_DATA = FlockDataset()
+AGGREGATES = AggregateCache()
+
 
 # Define helper function to classify birds
-def classify_bird(bird_id):
-    return "Hybrid (LLM)" if bird_id <= 4 else "Hybrid (NetLogo)"
+def classify_bird(bird_id, llm_max_id: int = LLM_BIRD_MAX_ID):
+    return "Hybrid (LLM)" if bird_id <= llm_max_id else "Hybrid (NetLogo)"
+
+
+def classify_birds(bird_ids, llm_max_id: int = LLM_BIRD_MAX_ID) -> pd.Categorical:
+    """
+    Vectorized classify_bird over an array of bird ids.
+
+    :param bird_ids: array-like of int
+        The bird ids to classify.
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
+
+    :return: pd.Categorical
+        "Hybrid (LLM)" or "Hybrid (NetLogo)" per id, with the BIRD_TYPES dtype.
+    """
+    codes = np.where(np.asarray(bird_ids) <= llm_max_id, 0, 1).astype(np.int8)
+    return pd.Categorical.from_codes(codes, dtype=BIRD_TYPES)
+
+
+def add_bird_types(data: pd.DataFrame, llm_max_id: int = LLM_BIRD_MAX_ID):
+    """
+    Add the bird1_type and bird2_type columns to a hybrid pairwise table, unless
+    a previous analysis already added them with the same threshold.
+
+    :return: pd.DataFrame
+        The same DataFrame, classified in place.
+    """
+    if data.attrs.get("llm_max_id") != llm_max_id:
+        data["bird1_type"] = classify_birds(data["bird1_id"], llm_max_id)
+        data["bird2_type"] = classify_birds(data["bird2_id"], llm_max_id)
+        data.attrs["llm_max_id"] = llm_max_id
+    return data
+
+
+def load_pairwise(file_paths: list, dataset: FlockDataset = None) -> list:
+    """
+    Load the upper-triangle (bird1_id < bird2_id) tables of pairwise CSV files,
+    passing through tables that are already loaded.
+
+    :param file_paths: List of str or pd.DataFrame
+        File paths of the CSV files, or DataFrames returned by a previous call.
+    :param dataset: FlockDataset, optional
+        Cache the files are loaded through. Default is FLOCK_DATA, so each file
+        is parsed once per session.
+
+    :return: List of pd.DataFrame
+    """
+    dataset = FLOCK_DATA if dataset is None else dataset
+    return [
+        data if isinstance(data, pd.DataFrame) else dataset.pairs(data)
+        for data in file_paths
+    ]
+
+
+def iter_pairwise(file_paths: list, columns: list, chunksize: int):
+    """
+    Stream the upper-triangle rows of pairwise files chunk by chunk, without
+    keeping them in FLOCK_DATA.
+
+    :param file_paths: List of str or pd.DataFrame
+        Pairwise files, see load_pairwise. DataFrames are passed through whole.
+    :param columns: list of str
+        Value columns to read, e.g. ["distance"].
+    :param chunksize: int
+        Rows per chunk, see flock_dataset.iter_upper_triangle.
+
+    :return: iterator of pd.DataFrame
+    """
+    for file_path in file_paths:
+        if isinstance(file_path, pd.DataFrame):
+            yield file_path
+        else:
+            yield from iter_upper_triangle(file_path, columns, chunksize)
+
+
+def pairwise_lines(
+    file_paths: list,
+    rule_based_file_paths: list,
+    y: str,
+    llm_max_id: int = LLM_BIRD_MAX_ID,
+    chunksize: int = None,
+) -> pd.DataFrame:
+    """
+    Aggregate a pairwise column per step for the LLM and NetLogo birds of the
+    hybrid runs and for the rule based runs.
+
+    :param file_paths: List of str or pd.DataFrame
+        Hybrid pairwise files, see load_pairwise.
+    :param rule_based_file_paths: List of str or pd.DataFrame
+        Rule based pairwise files, see load_pairwise.
+    :param y: str
+        Column to aggregate, "heading_difference" or "distance".
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
+    :param chunksize: int, optional
+        Stream the files in chunks of this many rows into per-step counts,
+        sums and sums of squares, so memory stays bounded by the chunk size
+        and the number of steps. Default is None (load the files whole).
+
+    :return: pd.DataFrame
+        The aggregate (see swarmgpt.aggregate.aggregate) with the hue column
+        bird1_type.
+    """
+
+    def stream():
+        hybrid = RunningAggregate("step_number", y, "bird1_type")
+        for data in iter_pairwise(file_paths, [y], chunksize):
+            hybrid.add(
+                data.assign(bird1_type=classify_birds(data["bird1_id"], llm_max_id))
+            )
+        rule_based = RunningAggregate("step_number", y, "bird1_type")
+        for data in iter_pairwise(rule_based_file_paths, [y], chunksize):
+            rule_based.add(data.assign(bird1_type="NetLogo"))
+
+        # LLM birds first, then NetLogo birds, then the rule based model
+        hybrid = hybrid.result().sort_values("bird1_type", kind="stable")
+        hybrid["bird1_type"] = hybrid["bird1_type"].astype(str)
+        agg = pd.concat([hybrid, rule_based.result()], ignore_index=True)
+        agg.attrs["y"] = y
+        return agg
+
+    def compute():
+        # Load all files into a list of DataFrames
+        data_list = load_pairwise(file_paths)
+        data_list_rule_based = load_pairwise(rule_based_file_paths)
+
+        # Add bird classification columns
+        for data in data_list:
+            add_bird_types(data, llm_max_id)
+
+        # Combine data from all datasets, the tables only hold the unique bird
+        # pairs (bird1_id < bird2_id)
+        combined_data = pd.concat(
+            [data[["step_number", "bird1_type", y]] for data in data_list],
+            ignore_index=True,
+        )
+        combined_data_rb = pd.concat(
+            [data[["step_number", y]] for data in data_list_rule_based],
+            ignore_index=True,
+        ).assign(bird1_type="NetLogo")
+
+        # LLM birds first, then NetLogo birds, then the rule based model
+        hybrid = aggregate(combined_data, "step_number", y, "bird1_type")
+        hybrid = hybrid.sort_values("bird1_type", kind="stable")
+        hybrid["bird1_type"] = hybrid["bird1_type"].astype(str)
+        agg = pd.concat(
+            [hybrid, aggregate(combined_data_rb, "step_number", y, "bird1_type")],
+            ignore_index=True,
+        )
+        agg.attrs["y"] = y
+        return agg
+
+    signatures = file_signature(file_paths), file_signature(rule_based_file_paths)
+    return AGGREGATES.get(
+        (None if None in signatures else ("pairwise_lines", y, llm_max_id, signatures)),
+        compute if chunksize is None else stream,
+    )
 
 
 def heading_differences(
-    file_paths: list, rule_based_file_paths: list, **kwargs
+    file_paths: list,
+    rule_based_file_paths: list,
+    llm_max_id: int = LLM_BIRD_MAX_ID,
+    chunksize: int = None,
+    **kwargs,
 ) -> None:
     """
     Plot the differences in bird headings over time for different models (LLM, NetLogo, Hybrid).
 
     :param file_paths: List of str
-        List of file paths for the CSV files containing heading difference data.
+        List of file paths for the CSV files containing heading difference data,
+        or DataFrames already returned by load_pairwise.
     :param rule_based_file_paths: List of str
-        List of file paths for the CSV files containing rule-based heading difference data.
+        List of file paths for the CSV files containing rule-based heading difference data,
+        or DataFrames already returned by load_pairwise.
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
+    :param chunksize: int, optional
+        Stream the files in chunks of this many rows instead of loading them,
+        for pairwise files larger than memory. Default is None.
     :param kwargs: Additional keyword arguments for customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -27,72 +218,55 @@ def heading_differences(
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
-    # Load all files into a list of DataFrames
-    data_list = [pd.read_csv(file_path) for file_path in file_paths]
-    data_list_rule_based = [
-        pd.read_csv(file_path) for file_path in rule_based_file_paths
-    ]
-
-    # Add bird classification columns and filter unique birds
-    for data in data_list:
-        data["bird1_type"] = data["bird1_id"].apply(classify_bird)
-        data["bird2_type"] = data["bird2_id"].apply(classify_bird)
-
-    # Combine data from all datasets
-    combined_data = pd.concat(data_list, ignore_index=True)
-    combined_data_rb = pd.concat(data_list_rule_based, ignore_index=True)
-    combined_data_rb["bird1_type"] = pd.Series(
-        (["NetLogo" for x in range(len(combined_data_rb.index))])
+    agg = pairwise_lines(
+        file_paths, rule_based_file_paths, "heading_difference", llm_max_id, chunksize
     )
 
-    # Filter for unique bird pairs by enforcing bird1_id < bird2_id
-    unique_data = combined_data[combined_data["bird1_id"] < combined_data["bird2_id"]]
-    unique_data_rb = combined_data_rb[
-        combined_data_rb["bird1_id"] < combined_data_rb["bird2_id"]
-    ]
-
-    # Plot the raw heading differences
+    # Plot the per-step means of the heading differences
     plt.figure(figsize=kwargs["figsize"])
-    unique_data = unique_data.sort_values(
-        by="bird1_type",
-        key=lambda col: col.map({"Hybrid (LLM)": 0, "Hybrid (NetLogo)": 1}),
-    )
-    unique_data_combined = pd.concat(
-        [unique_data, unique_data_rb], ignore_index=True, sort=False
-    )
-    sns.lineplot(
-        data=unique_data_combined,
-        x="step_number",
-        y="heading_difference",
-        hue="bird1_type",
-        palette=kwargs["palette"],
-        alpha=0.7,
-        markers=True,
-    )
+    lineplot(agg, "step_number", "bird1_type", palette=kwargs["palette"], alpha=0.7)
     # plt.title("Heading Differences of LLM and NetLogo Birds")
     plt.xlabel("Step Number")
     plt.ylabel("Heading Difference")
     plt.legend(title=kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "heading_differences_hybrid_rule-based.pdf",
+            kwargs.get("output", "heading_differences_hybrid_rule-based.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
-
-
-def distances(file_paths: list, rule_based_file_paths: list, **kwargs) -> None:
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
+
+
+def distances(
+    file_paths: list,
+    rule_based_file_paths: list,
+    llm_max_id: int = LLM_BIRD_MAX_ID,
+    chunksize: int = None,
+    **kwargs,
+) -> None:
     """
     Plot the distances between birds over time for different models.
 
     :param file_paths: List of str
-        List of file paths for the CSV files containing distance data.
+        List of file paths for the CSV files containing distance data,
+        or DataFrames already returned by load_pairwise.
     :param rule_based_file_paths: List of str
-        List of file paths for the CSV files containing rule-based distance data.
+        List of file paths for the CSV files containing rule-based distance data,
+        or DataFrames already returned by load_pairwise.
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
+    :param chunksize: int, optional
+        Stream the files in chunks of this many rows instead of loading them,
+        for pairwise files larger than memory. Default is None.
     :param kwargs: Additional keyword arguments for customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -100,61 +274,31 @@ def distances(file_paths: list, rule_based_file_paths: list, **kwargs) -> None:
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
-    # Load all files into a list of DataFrames
-    data_list = [pd.read_csv(file_path) for file_path in file_paths]
-    data_list_rule_based = [
-        pd.read_csv(file_path) for file_path in rule_based_file_paths
-    ]
-
-    # Add bird classification columns and filter unique birds
-    for data in data_list:
-        data["bird1_type"] = data["bird1_id"].apply(classify_bird)
-        data["bird2_type"] = data["bird2_id"].apply(classify_bird)
-
-    # Combine data from all datasets
-    combined_data = pd.concat(data_list, ignore_index=True)
-    combined_data_rb = pd.concat(data_list_rule_based, ignore_index=True)
-    combined_data_rb["bird1_type"] = pd.Series(
-        (["NetLogo" for x in range(len(combined_data_rb.index))])
+    agg = pairwise_lines(
+        file_paths, rule_based_file_paths, "distance", llm_max_id, chunksize
     )
 
-    # Filter for unique bird pairs by enforcing bird1_id < bird2_id
-    unique_data = combined_data[combined_data["bird1_id"] < combined_data["bird2_id"]]
-    unique_data_rb = combined_data_rb[
-        combined_data_rb["bird1_id"] < combined_data_rb["bird2_id"]
-    ]
-
-    # Plot the raw heading differences
+    # Plot the per-step means of the distances
     plt.figure(figsize=kwargs["figsize"])
-    unique_data = unique_data.sort_values(
-        by="bird1_type",
-        key=lambda col: col.map({"Hybrid (LLM)": 0, "Hybrid (NetLogo)": 1}),
-    )
-    unique_data_combined = pd.concat(
-        [unique_data, unique_data_rb], ignore_index=True, sort=False
-    )
-    sns.lineplot(
-        data=unique_data_combined,
-        x="step_number",
-        y="distance",
-        hue="bird1_type",
-        palette=kwargs["palette"],
-        alpha=0.7,
-        markers=True,
-    )
+    lineplot(agg, "step_number", "bird1_type", palette=kwargs["palette"], alpha=0.7)
     plt.xlabel("Step Number")
     plt.ylabel("Distances")
     plt.legend(title=kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "distances_hybrid_rule-based.pdf",
+            kwargs.get("output", "distances_hybrid_rule-based.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
 def percentile(n):
@@ -165,14 +309,25 @@ def percentile(n):
     return percentile_
 
 
-def number_neighbours(file_paths: list, rule_based_file_paths: list, **kwargs) -> None:
+def number_neighbours(
+    file_paths: list,
+    rule_based_file_paths: list,
+    llm_max_id: int = LLM_BIRD_MAX_ID,
+    **kwargs,
+) -> None:
     """
     Calculate and visualize the average number of neighbors for birds over time.
 
     :param file_paths: List of str
-        List of file paths for the CSV files containing neighbor data.
+        List of file paths for the CSV files containing neighbor data,
+        or DataFrames already returned by load_pairwise. .positions files are
+        answered with a spatial index instead of the pairwise distances.
     :param rule_based_file_paths: List of str
-        List of file paths for the CSV files containing NetLogo neighbor data.
+        List of file paths for the CSV files containing NetLogo neighbor data,
+        or DataFrames already returned by load_pairwise. .positions files are
+        answered with a spatial index instead of the pairwise distances.
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
     :param kwargs: Additional keyword arguments for customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -180,58 +335,32 @@ def number_neighbours(file_paths: list, rule_based_file_paths: list, **kwargs) -
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
     # Load all files into a list of DataFrames
-    data_list = [pd.read_csv(file_path) for file_path in file_paths]
-    data_list_rule_based = [
-        pd.read_csv(file_path) for file_path in rule_based_file_paths
-    ]
+    data_list = load_pairwise(file_paths)
+    data_list_rule_based = load_pairwise(rule_based_file_paths)
 
     # Function to calculate average number of neighbors for LLM and NetLogo birds
     def calculate_neighbors(data, step_number=50, distance=5):
-        # Add bird classification columns
-        data["bird1_type"] = data["bird1_id"].apply(classify_bird)
-        data["bird2_type"] = data["bird2_id"].apply(classify_bird)
-
-        # Filter data for 1 < distances <= 5 and every 50th iteration
+        # Count neighbors at 1 < distances <= 5 every 50th iteration
         # Distance > 1 because we don't count collisions
-        filtered_data = data[
-            (data["distance"] <= distance)
-            & (data["distance"] > 1)
-            & (data["step_number"] % step_number == 0)
-        ]
+        counts = neighbor_table(data, distance, 1, step_number)
+        counts["bird_type"] = classify_birds(counts["bird_id"], llm_max_id)
 
-        # Calculate average neighbors for LLM birds
-        llm_neighbors = (
-            filtered_data[filtered_data["bird1_id"] <= 4]
-            .groupby(["step_number", "bird1_id"])["bird2_id"]
-            .nunique()
-            .groupby("step_number")
-            .mean()
-            .reset_index()
-        )
-        llm_neighbors["bird_type"] = "Hybrid (LLM)"
-
-        # Calculate average neighbors for NetLogo birds
-        netlogo_neighbors = (
-            filtered_data[filtered_data["bird1_id"] > 4]
-            .groupby(["step_number", "bird1_id"])["bird2_id"]
-            .nunique()
-            .groupby("step_number")
+        # Calculate average neighbors for LLM and NetLogo birds in one pass
+        combined_neighbors = (
+            counts.groupby(["bird_type", "step_number"], observed=True)["count"]
             .mean()
-            .reset_index()
-        )
-        netlogo_neighbors["bird_type"] = "Hybrid (NetLogo)"
-
-        # Combine the results into a single DataFrame
-        combined_neighbors = pd.concat(
-            [llm_neighbors, netlogo_neighbors], ignore_index=True
-        )
-        combined_neighbors.rename(
-            columns={"bird2_id": "average_neighbors"}, inplace=True
+            .reset_index(name="average_neighbors")
         )
+        # Place the bird type last, as in the rule based results
+        combined_neighbors = combined_neighbors[
+            ["step_number", "average_neighbors", "bird_type"]
+        ]
 
         return combined_neighbors
 
@@ -242,24 +371,17 @@ def number_neighbours(file_paths: list, rule_based_file_paths: list, **kwargs) -
     # also calculate the collision for rule based
     neighbors_list_rb = []
     for data in data_list_rule_based:
-        filtered_data = data[
-            (data["distance"] <= 5)
-            & (data["distance"] > 1)
-            & (data["step_number"] % 50 == 0)
-        ]
         group = (
-            filtered_data.groupby(["step_number", "bird1_id"])["bird2_id"]
-            .nunique()
-            .groupby("step_number")
+            neighbor_table(data, 5, 1, 50)
+            .groupby("step_number")["count"]
             .mean()
-            .reset_index()
+            .reset_index(name="average_neighbors")
         )
         group["bird_type"] = "NetLogo"
         neighbors_list_rb.append(group)
 
     # concat rule based list
     neighbors_data_rb = pd.concat(neighbors_list_rb, ignore_index=True)
-    neighbors_data_rb.rename(columns={"bird2_id": "average_neighbors"}, inplace=True)
     # combine everything
     combined = pd.concat(
         [neighbors_data, neighbors_data_rb], sort=False, ignore_index=True
@@ -297,25 +419,38 @@ def number_neighbours(file_paths: list, rule_based_file_paths: list, **kwargs) -
     plt.legend(title=kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "average_neighbors_d_all.pdf",
+            kwargs.get("output", "average_neighbors_d_all.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
 def collisions(
-    file_paths: list, rule_based_file_paths: list, distance: int = 1, **kwargs
+    file_paths: list,
+    rule_based_file_paths: list,
+    distance: int = 1,
+    llm_max_id: int = LLM_BIRD_MAX_ID,
+    **kwargs,
 ) -> None:
     """
     Calculate and visualize the number of collisions between birds over time.
 
     :param file_paths: List of str
-        List of file paths for the CSV files containing collision data.
+        List of file paths for the CSV files containing collision data,
+        or DataFrames already returned by load_pairwise. .positions files are
+        answered with a spatial index instead of the pairwise distances.
     :param rule_based_file_paths: List of str
-        List of file paths for the CSV files containing rule-based collision data.
+        List of file paths for the CSV files containing rule-based collision data,
+        or DataFrames already returned by load_pairwise. .positions files are
+        answered with a spatial index instead of the pairwise distances.
     :param distance: int, optional
         The distance threshold for defining a collision. Default is 1.
+    :param llm_max_id: int, optional
+        Highest id of the LLM-controlled birds. Default is LLM_BIRD_MAX_ID.
     :param kwargs: Additional keyword arguments for customization.
         - figsize: tuple, size of the figure (width, height).
         - palette: str, name of color scheme.
@@ -323,76 +458,71 @@ def collisions(
         - savefig: bool, whether to save the figure as a PDF.
         - bbox_inches: str, bounding box for saving the figure.
         - pad_inches: float, padding for saving the figure.
+        - output: str, optional, file name of the saved figure.
+        - show: bool, optional, whether to show the figure or close it (headless). Default is True.
 
     :return: None
     """
-    # Load all files into a list of DataFrames
-    data_list = [pd.read_csv(file_path) for file_path in file_paths]
-    data_list_rule_based = [
-        pd.read_csv(file_path) for file_path in rule_based_file_paths
-    ]
 
     # Function to calculate collisions for LLM and NetLogo birds
     def calculate_collisions(data):
-        # Add bird classification columns
-        data["bird1_type"] = data["bird1_id"].apply(classify_bird)
-        data["bird2_type"] = data["bird2_id"].apply(classify_bird)
-
-        # Filter data for collisions (distance <= 1)
-        collision_data = data[data["distance"] <= distance]
-
-        # Count collisions for LLM birds
-        llm_collisions = (
-            collision_data[collision_data["bird1_id"] <= 4]
-            .groupby("step_number")["bird1_id"]
-            .count()
-            .reset_index()
+        # Count collisions (distance <= 1) per bird, a collision counts for
+        # both birds of the pair
+        collision_data = neighbor_table(data, distance)
+        collision_data["bird_type"] = classify_birds(
+            collision_data["bird_id"], llm_max_id
         )
-        llm_collisions["bird_type"] = "Hybrid (LLM)"
-
-        # Count collisions for NetLogo birds
-        netlogo_collisions = (
-            collision_data[collision_data["bird1_id"] > 4]
-            .groupby("step_number")["bird1_id"]
-            .count()
-            .reset_index()
-        )
-        netlogo_collisions["bird_type"] = "Hybrid (NetLogo)"
 
-        # Combine the results into a single DataFrame
-        combined_collisions = pd.concat(
-            [llm_collisions, netlogo_collisions], ignore_index=True
-        )
-        combined_collisions.rename(
-            columns={"bird1_id": "collision_count"}, inplace=True
+        # Count collisions for LLM and NetLogo birds in one pass
+        combined_collisions = (
+            collision_data.groupby(["bird_type", "step_number"], observed=True)["count"]
+            .sum()
+            .reset_index(name="collision_count")
         )
+        combined_collisions = combined_collisions[
+            ["step_number", "collision_count", "bird_type"]
+        ]
         return combined_collisions
 
-    # Apply the function to each dataset and combine results
-    collisions_list = [calculate_collisions(data) for data in data_list]
-    collisions_data = pd.concat(collisions_list, ignore_index=True)
-    # also calculate the collision for rule based
-    collisions_list_rb = []
-    for data in data_list_rule_based:
-        filtered_data = data[(data["distance"] <= distance)]
-        group = filtered_data.groupby("step_number")["bird1_id"].count().reset_index()
-        group["bird_type"] = "NetLogo"
-        collisions_list_rb.append(group)
-    collision_data_rb = pd.concat(collisions_list_rb, ignore_index=True)
-    collision_data_rb.rename(columns={"bird1_id": "collision_count"}, inplace=True)
-    # combine everything
-    combined = pd.concat(
-        [collisions_data, collision_data_rb], sort=False, ignore_index=True
+    def compute():
+        # Load all files into a list of DataFrames
+        data_list = load_pairwise(file_paths)
+        data_list_rule_based = load_pairwise(rule_based_file_paths)
+
+        # Apply the function to each dataset and combine results
+        collisions_list = [calculate_collisions(data) for data in data_list]
+        collisions_data = pd.concat(collisions_list, ignore_index=True)
+        collisions_data["bird_type"] = collisions_data["bird_type"].astype(str)
+        # also calculate the collision for rule based
+        collisions_list_rb = []
+        for data in data_list_rule_based:
+            group = (
+                neighbor_table(data, distance)
+                .groupby("step_number")["count"]
+                .sum()
+                .reset_index(name="collision_count")
+            )
+            group["bird_type"] = "NetLogo"
+            collisions_list_rb.append(group)
+        collision_data_rb = pd.concat(collisions_list_rb, ignore_index=True)
+        # combine everything
+        combined = pd.concat(
+            [collisions_data, collision_data_rb], sort=False, ignore_index=True
+        )
+        return aggregate(combined, "step_number", "collision_count", "bird_type")
+
+    signatures = file_signature(file_paths), file_signature(rule_based_file_paths)
+    agg = AGGREGATES.get(
+        (
+            None
+            if None in signatures
+            else ("collisions", distance, llm_max_id, signatures)
+        ),
+        compute,
     )
     # Visualization
     plt.figure(figsize=kwargs["figsize"])
-    sns.lineplot(
-        data=combined,
-        x="step_number",
-        y="collision_count",
-        hue="bird_type",
-        palette=kwargs["palette"],
-    )
+    lineplot(agg, "step_number", "bird_type", palette=kwargs["palette"])
 
     # Overlay Line Plot in case of barplot
     # sns.lineplot(data=collisions_data, x='step_number', y='collision_count', hue='bird_type', marker='o', legend=False)
@@ -404,14 +534,18 @@ def collisions(
     plt.legend(title=kwargs["legend_title"])
     if kwargs["savefig"]:
         plt.savefig(
-            "collisions_all.pdf",
+            kwargs.get("output", "collisions_all.pdf"),
             bbox_inches=kwargs["bbox_inches"],
             pad_inches=kwargs["pad_inches"],
         )
-    plt.show()
+    if kwargs.get("show", True):
+        plt.show()
+    else:
+        plt.close()
 
 
 if __name__ == "__main__":
+    AGGREGATES.cache_dir = "aggregate_cache"
     # overall configurations
     kwargs = {
         "figsize": (12, 6),
@@ -431,7 +565,8 @@ if __name__ == "__main__":
     heading_differences(file_paths, rule_based_file_paths, **kwargs)
 
     # Figure 8
-    # Load CSV files
+    # The distance CSV files are loaded once through FLOCK_DATA and shared by
+    # Figures 8 to 10
     file_paths = [f"distances_flockdata_seed_{i}.csv" for i in range(1, 6)]
     rule_based_file_paths = [
         f"distances_flockdata_rulebased_seed_{i}.csv" for i in range(1, 6)
@@ -439,17 +574,6 @@ if __name__ == "__main__":
     distances(file_paths, rule_based_file_paths, **kwargs)
 
     # Figure 9
-    # Load CSV files
-    file_paths = [
-        "distances_flockdata_seed_1.csv",
-        "distances_flockdata_seed_2.csv",
-        "distances_flockdata_seed_3.csv",
-        "distances_flockdata_seed_4.csv",
-        "distances_flockdata_seed_5.csv",
-    ]
-    rule_based_file_paths = [
-        f"distances_flockdata_rulebased_seed_{i}.csv" for i in range(1, 6)
-    ]
     collisions(file_paths, rule_based_file_paths, **kwargs)
 
     # Figure 10
@@ -0,0 +1,4 @@
+"""
+Python side of the NetLogo ``py`` extension glue shared by the ant colony and
+flocking models.
+"""
@@ -0,0 +1,261 @@
+"""
+Precomputed line-plot aggregates for the analysis scripts.
+
+seaborn's lineplot bootstraps a confidence interval over the raw rows of every
+x position, which dominates figure time on the pairwise flocking tables. Here
+the mean, standard deviation and a normal-approximation confidence interval of
+every (x, hue) group are computed in one groupby pass, cached by the signature
+of the input files, and drawn from the small aggregate table.
+
+Tables too large for memory are folded chunk by chunk into a RunningAggregate,
+which keeps only the count, sum and sum of squares of every group and yields
+the same statistics.
+"""
+
+import hashlib
+import os
+from statistics import NormalDist
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+
+def aggregate(
+    data: pd.DataFrame, x: str, y: str, hue: str, confidence: float = 0.95
+) -> pd.DataFrame:
+    """
+    Compute the per-(x, hue) statistics of a column in one groupby pass.
+
+    :param data: pd.DataFrame
+        The raw rows.
+    :param x: str
+        Column on the x axis, e.g. "step_number".
+    :param y: str
+        Column to aggregate, e.g. "food_amount".
+    :param hue: str
+        Column of the line groups, e.g. "source".
+    :param confidence: float, optional
+        Level of the confidence interval of the mean. Default is 0.95.
+
+    :return: pd.DataFrame
+        Columns x, hue, mean, std, count, ci_low and ci_high, with the hue
+        groups in order of first appearance as seaborn would draw them.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    result = (
+        data.groupby([hue, x], sort=False, observed=True)[y]
+        .agg(["mean", "std", "count"])
+        .reset_index()
+    )
+    half_width = z * result["std"] / result["count"] ** 0.5
+    result["ci_low"] = result["mean"] - half_width
+    result["ci_high"] = result["mean"] + half_width
+    result.attrs["y"] = y
+    return result
+
+
+class RunningAggregate:
+    """
+    Per-(x, hue) count, sum and sum of squares of a column, accumulated over
+    the chunks of a table.
+    """
+
+    def __init__(self, x: str, y: str, hue: str):
+        """
+        :param x: str
+            Column on the x axis, e.g. "step_number".
+        :param y: str
+            Column to aggregate, e.g. "distance".
+        :param hue: str
+            Column of the line groups, e.g. "bird1_type".
+        """
+        self.x = x
+        self.y = y
+        self.hue = hue
+        self._totals = None
+
+    def add(self, data: pd.DataFrame) -> None:
+        """
+        Fold the rows of one chunk into the totals.
+        """
+        values = data[self.y].astype(np.float64)
+        part = (
+            pd.DataFrame(
+                {
+                    self.hue: data[self.hue],
+                    self.x: data[self.x],
+                    "count": values.notna().astype(np.int64),
+                    "sum": values,
+                    "sum_squares": values * values,
+                }
+            )
+            .groupby([self.hue, self.x], sort=False, observed=True)
+            .sum()
+        )
+        if self._totals is not None:
+            part = (
+                pd.concat([self._totals, part])
+                .groupby(level=[0, 1], sort=False, observed=True)
+                .sum()
+            )
+        self._totals = part
+
+    def result(self, confidence: float = 0.95) -> pd.DataFrame:
+        """
+        Return the statistics of the rows added so far.
+
+        :return: pd.DataFrame
+            The columns of aggregate: x, hue, mean, std, count, ci_low and
+            ci_high, with the hue groups in order of first appearance.
+        """
+        if self._totals is None:
+            totals = pd.DataFrame(
+                columns=[self.hue, self.x, "count", "sum", "sum_squares"]
+            )
+        else:
+            totals = self._totals.reset_index()
+        count = totals["count"].astype(np.float64)
+        mean = totals["sum"] / count
+        # Sample variance from the sums; rounding can leave it slightly negative
+        variance = (totals["sum_squares"] - totals["sum"] * mean) / (count - 1)
+        std = np.sqrt(variance.clip(lower=0)).where(count > 1)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        half_width = z * std / count**0.5
+        result = pd.DataFrame(
+            {
+                self.hue: totals[self.hue],
+                self.x: totals[self.x],
+                "mean": mean,
+                "std": std,
+                "count": totals["count"],
+                "ci_low": mean - half_width,
+                "ci_high": mean + half_width,
+            }
+        )
+        result.attrs["y"] = self.y
+        return result
+
+
+def lineplot(
+    agg: pd.DataFrame,
+    x: str,
+    hue: str,
+    palette=None,
+    ax=None,
+    band_alpha: float = 0.2,
+    **kwargs,
+):
+    """
+    Draw the mean line and confidence band of every hue group of an aggregate.
+
+    :param agg: pd.DataFrame
+        Output of aggregate.
+    :param x: str
+        Column on the x axis.
+    :param hue: str
+        Column of the line groups.
+    :param palette: str, optional
+        seaborn color palette. Default is the current palette.
+    :param ax: matplotlib.axes.Axes, optional
+        Axes to draw on. Default is the current axes.
+    :param band_alpha: float, optional
+        Opacity of the confidence band. Default is 0.2.
+    :param kwargs: Additional keyword arguments for Axes.plot, e.g. alpha.
+
+    :return: matplotlib.axes.Axes
+    """
+    ax = plt.gca() if ax is None else ax
+    levels = list(dict.fromkeys(agg[hue]))
+    for level, color in zip(levels, sns.color_palette(palette, len(levels))):
+        part = agg[agg[hue] == level].sort_values(x)
+        ax.plot(part[x], part["mean"], color=color, label=level, **kwargs)
+        ax.fill_between(
+            part[x],
+            part["ci_low"],
+            part["ci_high"],
+            color=color,
+            alpha=band_alpha,
+            linewidth=0,
+        )
+    ax.set_xlabel(x)
+    ax.set_ylabel(agg.attrs.get("y", ""))
+    ax.legend(title=hue)
+    return ax
+
+
+def file_signature(paths) -> tuple:
+    """
+    Return the (path, size, mtime) of every file below the given paths, or
+    None if an entry is not a path (e.g. an already loaded DataFrame).
+    """
+    signature = []
+    for path in paths:
+        if not isinstance(path, str):
+            return None
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    signature.extend(file_signature([os.path.join(root, name)]))
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        else:
+            # Journal prefixes and other indirect inputs, keyed on their files
+            directory = os.path.dirname(path) or "."
+            prefix = os.path.basename(path) + "."
+            signature.extend(
+                file_signature(
+                    [
+                        os.path.join(directory, name)
+                        for name in sorted(os.listdir(directory))
+                        if name.startswith(prefix)
+                    ]
+                )
+            )
+    return tuple(signature)
+
+
+class AggregateCache:
+    """
+    Cache of aggregate tables, in memory and optionally as Parquet files.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        :param cache_dir: str, optional
+            Directory of the Parquet copies. Default is None (memory only).
+        """
+        self.cache_dir = cache_dir
+        self._tables = {}
+
+    def get(self, key, compute) -> pd.DataFrame:
+        """
+        Return the aggregate of a key, computing and storing it on a miss.
+
+        :param key: tuple or None
+            Everything the aggregate depends on, typically the figure name, its
+            parameters and the file_signature of its inputs. None disables
+            caching.
+        :param compute: callable
+            Returns the aggregate when it is not cached.
+        """
+        if key is None:
+            return compute()
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        if digest in self._tables:
+            return self._tables[digest]
+        cache_file = None
+        if self.cache_dir is not None:
+            cache_file = os.path.join(self.cache_dir, digest + ".parquet")
+            if os.path.exists(cache_file):
+                agg = pd.read_parquet(cache_file)
+                self._tables[digest] = agg
+                return agg
+        agg = compute()
+        self._tables[digest] = agg
+        if cache_file is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            agg.to_parquet(cache_file, index=False)
+        return agg
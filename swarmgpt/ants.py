@@ -0,0 +1,249 @@
+"""
+Prompt construction and reply parsing for the LLM-steered ants.
+"""
+
+from collections import namedtuple
+
+from swarmgpt.parsing import Schema
+from swarmgpt.prompts import PromptTemplate
+
+# Set to False when the run is logged to an ActionJournal instead of stdout
+VERBOSE = True
+
+SYSTEM_TEXT = (
+    "You are an ant in a 2D simulation. Your task is to pick up food and release it "
+    "at the nest. Release pheromone on food source and while you are carrying food. "
+    "Use nest scent to navigate back to the nest only when carrying food, "
+    "prioritizing nest scent over pheromones. Use highest pheromone scent to "
+    "navigate to food when not carrying any. Move away from nest and rotate randomly "
+    "if you are not carrying any food and you are not sensing any pheromone. Format "
+    "your actions as a Python dictionary with these keys and options: "
+    '"move-forward" (options: True, False), "rotate" (options: "left", "right", '
+    '"none", "random" ), "pick-up-food" (options: True, False), "drop-pheromone" '
+    '(options: True, False), "drop-food" (options: True, False). You will be '
+    "provided with environment information. Keep your response concise, under 45 "
+    "tokens."
+)
+
+# User prompt over the discretized observation; the table is rendered at import
+# for every combination on empty patches, other food quantities are added when
+# they first occur
+PROMPTS = PromptTemplate(
+    SYSTEM_TEXT,
+    "This is your current environment: -Highest Pheromone Concentration: "
+    "{pheromone}, -Nest Presence: {on_nest}, -Stronger Nest Scent: {nest}, -Food "
+    "Concentration at your location: {food}, -Carrying Food Status {carrying}",
+    slots=dict(
+        pheromone=("Left", "Right", "Front", "None"),
+        on_nest=(False, True),
+        nest=("Left", "Right", "Front"),
+        food=("0",),
+        carrying=(False, True),
+    ),
+    texts=dict(
+        on_nest={
+            False: "**False** (You are not currently at the nest)",
+            True: "**True** (You are currently at the nest)",
+        },
+        carrying={
+            False: "**False** (You are not currently carrying food)",
+            True: "**True** (You are currently carrying food)",
+        },
+    ),
+)
+
+AntAction = namedtuple(
+    "AntAction",
+    ["move_forward", "rotate", "pick_up_food", "drop_pheromone", "drop_food"],
+)
+
+ACTION_SCHEMA = Schema(
+    AntAction,
+    (
+        ("move-forward", "bool"),
+        ("rotate", "choice", ("left", "right", "none", "random")),
+        ("pick-up-food", "bool"),
+        ("drop-pheromone", "bool"),
+        ("drop-food", "bool"),
+    ),
+)
+
+
+def _flag(value) -> bool:
+    # NetLogo hands over either booleans or the "True"/"False" strings
+    if isinstance(value, str):
+        return value.lower() != "false"
+    return bool(value)
+
+
+def netlogo_number(value) -> str:
+    """
+    Format a sensor value the way NetLogo's (word precision x 2) does.
+    """
+    value = round(float(value), 2)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def discretize(
+    sense_pheromone_left,
+    sense_pheromone_front,
+    sense_pheromone_right,
+    sense_on_nest,
+    sense_nest_left,
+    sense_nest_front,
+    sense_nest_right,
+    sense_food_quantity,
+    sense_carrying_food,
+) -> tuple:
+    """
+    Reduce the sensor readings of an ant to what its prompt states.
+
+    :return: tuple
+        (pheromone, on_nest, nest, food, carrying) with pheromone one of
+        "Left", "Right", "Front" or "None", nest one of "Left", "Right" or
+        "Front", food the food quantity as NetLogo prints it and booleans
+        on_nest and carrying. Equal tuples give equal prompts.
+    """
+    sense_pheromone_left = float(sense_pheromone_left)
+    sense_pheromone_front = float(sense_pheromone_front)
+    sense_pheromone_right = float(sense_pheromone_right)
+    sense_nest_left = float(sense_nest_left)
+    sense_nest_front = float(sense_nest_front)
+    sense_nest_right = float(sense_nest_right)
+    if (
+        sense_pheromone_left > sense_pheromone_front
+        and sense_pheromone_left > sense_pheromone_right
+    ):
+        pheromone = "Left"
+    elif (
+        sense_pheromone_right > sense_pheromone_front
+        and sense_pheromone_right > sense_pheromone_left
+    ):
+        pheromone = "Right"
+    elif sense_pheromone_front > 0 and (
+        sense_pheromone_front >= sense_pheromone_right
+        or sense_pheromone_front >= sense_pheromone_left
+    ):
+        pheromone = "Front"
+    else:
+        pheromone = "None"
+    if sense_nest_left > sense_nest_front and sense_nest_left > sense_nest_right:
+        nest = "Left"
+    elif sense_nest_right > sense_nest_front and sense_nest_right > sense_nest_left:
+        nest = "Right"
+    else:
+        nest = "Front"
+    if not isinstance(sense_food_quantity, str):
+        sense_food_quantity = netlogo_number(sense_food_quantity)
+    return (
+        pheromone,
+        _flag(sense_on_nest),
+        nest,
+        sense_food_quantity,
+        _flag(sense_carrying_food),
+    )
+
+
+def create_prompt(*sensors) -> tuple:
+    """
+    Build the user and system prompts of an ant from its sensor readings.
+
+    :param sensors:
+        The arguments of discretize.
+
+    :return: tuple of str
+        (prompt_text, system_text)
+    """
+    return PROMPTS.render(discretize(*sensors)), SYSTEM_TEXT
+
+
+def observation_prompt(observation: list, context=None) -> tuple:
+    """
+    Build the prompts of an ant from a typed observation row.
+
+    :param observation: list
+        [pheromone_left, pheromone_front, pheromone_right, on_nest, nest_left,
+        nest_front, nest_right, food_quantity, carrying_food] as numbers and
+        booleans, as sent by NetLogo's observation reporter.
+    :param context: unused
+        Present for the AgentBridge interface.
+
+    :return: tuple of str
+        (prompt_text, system_text)
+    """
+    (
+        pheromone_left,
+        pheromone_front,
+        pheromone_right,
+        on_nest,
+        nest_left,
+        nest_front,
+        nest_right,
+        food_quantity,
+        carrying_food,
+    ) = observation
+    # Round like sense-world so the prompt matches the per-agent path
+    return (
+        PROMPTS.render(
+            discretize(
+                round(pheromone_left, 2),
+                round(pheromone_front, 2),
+                round(pheromone_right, 2),
+                on_nest,
+                round(nest_left, 2),
+                round(nest_front, 2),
+                round(nest_right, 2),
+                food_quantity,
+                carrying_food,
+            )
+        ),
+        SYSTEM_TEXT,
+    )
+
+
+def priority(observation: list) -> int:
+    """
+    Request order of an ant for the scheduler: ants carrying food or standing
+    on food come first, as their actions decide the food collected.
+
+    :param observation: list
+        The observation row of observation_prompt.
+
+    :return: int
+        0 for the first group, 1 for the others.
+    """
+    food_quantity, carrying_food = observation[7], observation[8]
+    return 0 if _flag(carrying_food) or float(food_quantity) > 0 else 1
+
+
+def action_record(result) -> list:
+    """
+    Turn a ParseResult of ACTION_SCHEMA into the record NetLogo reads.
+
+    :return: list
+        [True, "None", move_forward, rotate, pick_up_food, drop_pheromone,
+        drop_food] with booleans and a lower-case rotate string on success,
+        or [False, error_message] on failure.
+    """
+    if not result.ok:
+        return [False, result.message]
+    return [True, "None", *result.action]
+
+
+def parse_response(response: str) -> list:
+    """
+    Parse an ant reply into a typed action record.
+
+    :param response: str
+        The reply text of the model.
+
+    :return: list
+        See action_record.
+    """
+    elements_list = action_record(ACTION_SCHEMA.parse(response))
+    if VERBOSE:
+        if elements_list[0]:
+            print("Parsed ok: ", elements_list)
+        else:
+            print("Error: ", elements_list[1])
+    return elements_list
@@ -0,0 +1,344 @@
+"""
+Interchangeable LLM backends behind the chat.completions.create interface the
+models call.
+
+- openai: the OpenAI API (production).
+- ollama: a local Ollama server.
+- stub: any OpenAI-compatible HTTP endpoint, by default the stub server below.
+- oracle: an in-process, deterministic rule-based responder.
+
+Every backend can be wrapped with injected latency and errors so tick
+throughput and parser robustness can be benchmarked without a network.
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+BACKENDS = ("openai", "ollama", "stub", "oracle")
+STUB_URL = "http://127.0.0.1:8000/v1"
+
+
+class BackendError(RuntimeError):
+    """Raised for failures injected by FaultyClient."""
+
+
+def _completion(
+    content: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0
+):
+    # Mimic the attributes of a ChatCompletion that the models read
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+def _message_text(messages: list, role: str) -> str:
+    return "".join(m["content"] for m in messages if m["role"] == role)
+
+
+def _field(pattern: str, text: str, default: str = "") -> str:
+    match = re.search(pattern, text)
+    return match.group(1) if match else default
+
+
+def ant_oracle_action(prompt_text: str) -> dict:
+    """
+    Answer an ant user prompt with the rules stated in the ant system prompt.
+
+    :param prompt_text: str
+        The user prompt produced by create_prompt.
+
+    :return: dict
+        The action dictionary an ideal model would reply with.
+    """
+    pheromone = _field(r"Highest Pheromone Concentration: (\w+)", prompt_text, "None")
+    on_nest = _field(r"Nest Presence: \*\*(\w+)\*\*", prompt_text) == "True"
+    nest = _field(r"Stronger Nest Scent: (\w+)", prompt_text, "Front")
+    food = float(
+        _field(r"Food Concentration at your location: ([\d.]+)", prompt_text, "0")
+    )
+    carrying = _field(r"Carrying Food Status \*\*(\w+)\*\*", prompt_text) == "True"
+    turn = {"Left": "left", "Right": "right"}
+
+    action = {
+        "move-forward": True,
+        "rotate": "none",
+        "pick-up-food": False,
+        "drop-pheromone": False,
+        "drop-food": False,
+    }
+    if carrying:
+        if on_nest:
+            action["drop-food"] = True
+        else:
+            # Head home along the nest scent, marking the trail
+            action["rotate"] = turn.get(nest, "none")
+            action["drop-pheromone"] = True
+    elif food > 0:
+        action.update(
+            {"move-forward": False, "pick-up-food": True, "drop-pheromone": True}
+        )
+    elif pheromone in ("Left", "Right", "Front"):
+        action["rotate"] = turn.get(pheromone, "none")
+    else:
+        action["rotate"] = "random"
+    return action
+
+
+def oracle_reply(messages: list) -> str:
+    """
+    Produce a deterministic reply to an ant or bird prompt.
+
+    Bird prompts are answered by keeping the current heading.
+    """
+    prompt_text = _message_text(messages, "user")
+    if "Current heading:" in prompt_text:
+        heading = _field(r"Current heading: ([-\d.]+)", prompt_text, "0")
+        return json.dumps({"rationale": "keep heading", "new-heading": float(heading)})
+    return json.dumps(ant_oracle_action(prompt_text))
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class OracleClient:
+    """
+    In-process client answering every request with oracle_reply.
+    """
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        messages = kwargs.get("messages", [])
+        content = oracle_reply(messages)
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        return _completion(
+            content, kwargs.get("model", "oracle"), prompt_tokens, len(content.split())
+        )
+
+
+class OllamaClient:
+    """
+    Adapter exposing an Ollama server through chat.completions.create.
+    """
+
+    def __init__(self, host=None):
+        import ollama
+
+        self._ollama = ollama.Client(host=host) if host else ollama
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        options = {}
+        if "temperature" in kwargs:
+            options["temperature"] = kwargs["temperature"]
+        if "max_tokens" in kwargs:
+            options["num_predict"] = kwargs["max_tokens"]
+        response = self._ollama.chat(
+            model=kwargs["model"], messages=kwargs["messages"], options=options
+        )
+        return _completion(
+            response["message"]["content"],
+            kwargs["model"],
+            response.get("prompt_eval_count") or 0,
+            response.get("eval_count") or 0,
+        )
+
+
+class FaultyClient:
+    """
+    Wrap a client with injected latency and random failures.
+    """
+
+    def __init__(
+        self,
+        client,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed=None,
+    ):
+        """
+        :param client: OpenAI-compatible client
+            The wrapped backend.
+        :param latency: float, optional
+            Seconds added to every request. Default is 0.
+        :param jitter: float, optional
+            Upper bound of a uniform random delay added on top. Default is 0.
+        :param error_rate: float, optional
+            Probability in [0, 1] that a request raises BackendError. Default is 0.
+        :param seed: int, optional
+            Seed of the fault generator, for repeatable benchmarks.
+        """
+        self.client = client
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise BackendError("injected backend error")
+        return self.client.chat.completions.create(**kwargs)
+
+
+def make_client(
+    backend: str = "openai",
+    api_key=None,
+    base_url=None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed=None,
+    max_retries=None,
+):
+    """
+    Create the client of a backend.
+
+    :param backend: str, optional
+        One of "openai", "ollama", "stub" or "oracle". Default is "openai".
+    :param api_key: str, optional
+        API key for the OpenAI and stub backends.
+    :param base_url: str, optional
+        Endpoint of the OpenAI, stub or Ollama server.
+    :param latency, jitter, error_rate, seed: optional
+        Fault injection settings, see FaultyClient.
+    :param max_retries: int, optional
+        Retries of the OpenAI client itself. Set to 0 when a RequestScheduler
+        retries the requests. Default is the library default.
+
+    :return: OpenAI-compatible client
+    """
+    options = {} if max_retries is None else {"max_retries": max_retries}
+    if backend == "openai":
+        from openai import OpenAI
+
+        client = OpenAI(api_key=api_key, base_url=base_url, **options)
+    elif backend == "stub":
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=api_key or "stub", base_url=base_url or STUB_URL, **options
+        )
+    elif backend == "ollama":
+        client = OllamaClient(base_url)
+    elif backend == "oracle":
+        client = OracleClient()
+    else:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if latency or jitter or error_rate:
+        client = FaultyClient(client, latency, jitter, error_rate, seed)
+    return client
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    client = None
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._reply(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        try:
+            response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            # Pass the status of upstream errors on, so the caller retries 429s
+            status = getattr(e, "status_code", None) or 500
+            self._reply(status, {"error": {"message": str(e), "type": "server_error"}})
+            return
+        self._reply(
+            200,
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": getattr(response, "model", request.get("model")),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": response.choices[0].message.content,
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": vars(response.usage) if response.usage is not None else None,
+            },
+        )
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_client(
+    client, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """
+    Create an OpenAI-compatible HTTP server answered by a client, e.g. to share
+    one cached backend between several model processes.
+
+    Call serve_forever() on the result.
+    """
+    handler = type("StubHandler", (_StubHandler,), {"client": client})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve_stub(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed=None,
+) -> ThreadingHTTPServer:
+    """
+    Create an OpenAI-compatible HTTP server answered by the oracle.
+
+    Call serve_forever() on the result, or run this module as a script.
+    """
+    return serve_client(
+        FaultyClient(OracleClient(), latency, jitter, error_rate, seed), host, port
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible oracle stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = serve_stub(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed
+    )
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,151 @@
+"""
+Prompt construction and reply parsing for the LLM-steered birds.
+"""
+
+from collections import namedtuple
+
+from swarmgpt.ants import netlogo_number
+from swarmgpt.parsing import Schema
+from swarmgpt.prompts import PromptTemplate
+
+# Set to False when the run is logged to an ActionJournal instead of stdout
+VERBOSE = True
+
+SYSTEM_TEXT = (
+    "You are an agent in a 2D simulation. Following the compass convention, your "
+    "task is to determine your new heading based on the flocking principles of "
+    "separation turn, alignment turn (average heading of neighbors), and coherence "
+    "turn (average heading towards flockmates). The parameters for these principles "
+    "are: maximum-separate-turn, maximum-align-turn, maximum-cohere-turn, "
+    "minimum-separation-distance. The simulation provides the following "
+    "information: Current heading, Neighbors in vision radius. When calculating the "
+    "alignment turn, always choose the shortest path (clockwise or "
+    "counterclockwise) to align with the average heading of neighbors. Provide your "
+    "final new heading after applying these rules, expressed as an angle in "
+    "degrees. The result should be in JSON format only, with the keys and values: "
+    '"rationale" (value: your explanation) and "new-heading" (value: heading in '
+    "degrees). "
+)
+
+# The flocking parameters change only when the sliders move, so their part of the
+# user prompt is rendered once per parameter set
+PROMPTS = PromptTemplate(
+    SYSTEM_TEXT,
+    "These are the flocking parameters: -Maximum separate turn: {max_separate_turn}"
+    ", -Maximum align turn: {max_align_turn}, -Maximum cohere turn: "
+    "{max_cohere_turn}, -Minimum separation: {minimum_separation}; This is your "
+    "current environment: -Current heading: ",
+)
+
+NO_NEIGHBORS_TEXT = "no neighbors in vision radius"
+
+BirdAction = namedtuple("BirdAction", ["new_heading", "rationale"])
+
+ACTION_SCHEMA = Schema(
+    BirdAction,
+    (("new-heading", "number"), ("rationale", "text")),
+    optional=("rationale",),
+)
+
+
+def create_prompt(
+    bird_heading,
+    bird_neighbors,
+    max_separate_turn_text,
+    max_align_turn_text,
+    max_cohere_turn_text,
+    minimum_separation_text,
+) -> tuple:
+    """
+    Build the user and system prompts of a bird.
+
+    :return: tuple of str
+        (prompt_text, system_text)
+    """
+    prompt_text = (
+        PROMPTS.render(
+            (
+                max_separate_turn_text,
+                max_align_turn_text,
+                max_cohere_turn_text,
+                minimum_separation_text,
+            )
+        )
+        + bird_heading
+        + " deg, -Neighbors in vision radius: "
+        + bird_neighbors
+    )
+    return prompt_text, SYSTEM_TEXT
+
+
+def neighbor_info(flockmates: list) -> str:
+    """
+    Describe the flockmates of a bird like generate-neighbor-info does.
+
+    :param flockmates: list
+        One [heading, relative_x, relative_y] entry per flockmate.
+
+    :return: str
+    """
+    info = "".join(
+        f"neighbor_{counter}: x: {netlogo_number(nx)}, y: {netlogo_number(ny)}, "
+        f"heading: {netlogo_number(nheading)} deg; "
+        for counter, (nheading, nx, ny) in enumerate(flockmates, start=1)
+    )
+    return info or NO_NEIGHBORS_TEXT
+
+
+def observation_prompt(observation: list, context: list) -> tuple:
+    """
+    Build the prompts of a bird from a typed observation row.
+
+    :param observation: list
+        [heading, flockmates] where flockmates is the flockmates-list of the
+        bird.
+    :param context: list
+        [max_separate_turn, max_align_turn, max_cohere_turn,
+        minimum_separation] of the current tick.
+
+    :return: tuple of str
+        (prompt_text, system_text)
+    """
+    heading, flockmates = observation
+    return create_prompt(
+        netlogo_number(heading),
+        neighbor_info(flockmates),
+        *(netlogo_number(value) for value in context),
+    )
+
+
+def action_record(result) -> list:
+    """
+    Turn a ParseResult of ACTION_SCHEMA into the record NetLogo reads.
+
+    :return: list
+        [True, "None", new_heading] with a float heading on success, or
+        [False, error_message] on failure.
+    """
+    if not result.ok:
+        return [False, result.message]
+    return [True, "None", result.action.new_heading]
+
+
+def parse_response(response: str) -> list:
+    """
+    Parse a bird reply into a typed action record.
+
+    :param response: str
+        The reply text of the model.
+
+    :return: list
+        See action_record.
+    """
+    if VERBOSE:
+        print("Raw response: ", response)
+    elements_list = action_record(ACTION_SCHEMA.parse(response))
+    if VERBOSE:
+        if elements_list[0]:
+            print("Parsed ok: ", elements_list)
+        else:
+            print("Error: ", elements_list[1])
+    return elements_list
@@ -0,0 +1,153 @@
+"""
+Bulk observation API between NetLogo and the LLM dispatcher.
+
+NetLogo sends the observations of all LLM agents of a tick as one list of
+lists (py:set) and receives the typed actions of all agents from a single
+py:runresult, instead of marshalling strings agent by agent.
+
+In a pipelined run, NetLogo submits the observations of a tick and collects
+the actions at the next decision, so the requests are in flight while NetLogo
+updates the rule-based agents and the patches. The actions then act one tick
+after the observations they answer (a lag of one tick). Every submit starts a
+new generation; a tick that is not collected in time is abandoned, its requests
+not sent yet are skipped and its late replies neither reach the gate nor
+NetLogo.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from swarmgpt.scheduler import FALLBACK
+
+
+class AgentBridge:
+    """
+    Turn a tick's observation rows into action rows through a dispatcher.
+    """
+
+    def __init__(self, dispatcher, observation_prompt, journal=None, priority=None):
+        """
+        :param dispatcher: BatchDispatcher
+            Sends the prompts and parses the replies.
+        :param observation_prompt: callable
+            Builds (prompt_text, system_text) from an observation row and the
+            tick context, e.g. swarmgpt.ants.observation_prompt.
+        :param journal: ActionJournal, optional
+            Receives the prompt and parsed reply of every agent.
+        :param priority: callable, optional
+            Maps an observation row (without the agent id) to a number; agents
+            with lower values are requested first, see BatchDispatcher.dispatch.
+        """
+        self.dispatcher = dispatcher
+        self.observation_prompt = observation_prompt
+        self.journal = journal
+        self.priority = priority
+        self._pending = None
+        self._executor = None
+        self._generation = 0
+
+    def _decide(self, observations: list, context, current=None) -> tuple:
+        start = time.perf_counter()
+        profiler = getattr(self.dispatcher, "profiler", None)
+        if profiler is None:
+            prompts = [
+                self.observation_prompt(row[1:], context) for row in observations
+            ]
+        else:
+            prompts = []
+            for row in observations:
+                with profiler.span("prompt", row[0]):
+                    prompts.append(self.observation_prompt(row[1:], context))
+        priorities = None
+        if self.priority is not None:
+            priorities = [self.priority(row[1:]) for row in observations]
+        records = self.dispatcher.dispatch(
+            prompts, [row[0] for row in observations], priorities, current
+        )
+        return prompts, records, time.perf_counter() - start
+
+    def _finish(self, observations: list, prompts: list, records: list) -> list:
+        if self.journal is not None:
+            for row, (prompt_text, system_text), record in zip(
+                observations, prompts, records
+            ):
+                self.journal.stage(row[0], system_text, prompt_text, record)
+        return [[row[0]] + record for row, record in zip(observations, records)]
+
+    def step(self, observations: list, context=None) -> list:
+        """
+        Decide the actions of all agents of a tick.
+
+        :param observations: list
+            One [agent_id, ...sensor values] row per agent.
+        :param context: optional
+            Values shared by all agents of the tick, passed to
+            observation_prompt.
+
+        :return: list
+            One [agent_id, ...action record] row per agent, in the same order.
+        """
+        prompts, records, seconds = self._decide(observations, context)
+        profiler = getattr(self.dispatcher, "profiler", None)
+        if profiler is not None:
+            # Python side of the tick; the rest of py:runresult is marshalling
+            profiler.record("bridge", seconds, -1)
+        return self._finish(observations, prompts, records)
+
+    def submit(self, observations: list, context=None) -> None:
+        """
+        Start deciding the actions of a tick in the background, for a
+        pipelined run. The actions are returned by the next collect.
+
+        :param observations: list
+            One [agent_id, ...sensor values] row per agent.
+        :param context: optional
+            Values shared by all agents of the tick, see step.
+        """
+        if self._executor is None:
+            # Several workers, so the replies still in flight of an abandoned
+            # tick do not hold up the next one
+            self._executor = ThreadPoolExecutor(max_workers=4)
+        self._generation += 1
+        generation = self._generation
+        self._pending = (
+            observations,
+            self._executor.submit(
+                self._decide,
+                observations,
+                context,
+                lambda: self._generation == generation,
+            ),
+        )
+
+    def collect(self, timeout: float = None) -> list:
+        """
+        Return the actions of the observations of the last submit.
+
+        :param timeout: float, optional
+            Seconds to wait for them. The agents of a tick that is not decided
+            in time get [agent_id, False, FALLBACK], so the model falls back to
+            its rule-based procedure, and the tick is abandoned.
+            Default is to wait.
+
+        :return: list
+            One [agent_id, ...action record] row per agent, as step returns
+            them; an empty list when nothing was submitted.
+        """
+        if self._pending is None:
+            return []
+        observations, future = self._pending
+        self._pending = None
+        start = time.perf_counter()
+        try:
+            prompts, records, _ = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Abandon the tick: its late replies are discarded
+            self._generation += 1
+            return [[row[0], False, FALLBACK] for row in observations]
+        profiler = getattr(self.dispatcher, "profiler", None)
+        if profiler is not None:
+            # Time NetLogo waited for the requests still in flight
+            profiler.record("collect", time.perf_counter() - start, -1)
+        return self._finish(observations, prompts, records)
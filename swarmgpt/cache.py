@@ -0,0 +1,241 @@
+"""
+Persistent response cache keyed on (model, temperature, system prompt, user
+prompt, other request options), placed in front of an OpenAI-compatible client.
+Only replies accepted by a validator, typically the action parser, are stored.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from swarmgpt.backends import _completion, _message_text
+from swarmgpt.lifecycle import on_end_of_run
+
+# Request options that do not change the reply
+_TRANSPORT_OPTIONS = frozenset(["messages", "model", "temperature", "timeout"])
+
+
+def cache_key(
+    model: str,
+    temperature: float,
+    system_text: str,
+    prompt_text: str,
+    options: dict = None,
+) -> str:
+    """
+    Return the content address of a request.
+
+    :param options: dict, optional
+        Other request options that change the reply, e.g. max_tokens.
+    """
+    digest = hashlib.sha256()
+    parts = [model, repr(float(temperature)), system_text, prompt_text]
+    if options:
+        parts.append(json.dumps(options, sort_keys=True, default=repr))
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of reply texts with LRU and TTL eviction.
+
+    The connection is shared between threads so the cache can sit behind the
+    BatchDispatcher; a lock serialises access. Hits only note their time; the
+    last_used column is updated in one transaction with the next put, before
+    evicting, or on close.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int = 100000,
+        ttl=None,
+        prefix: str = None,
+        run_info=None,
+    ):
+        """
+        :param path: str, optional
+            SQLite database file. Default is an in-memory database.
+        :param max_entries: int, optional
+            Entries kept before the least recently used are evicted.
+            Default is 100000.
+        :param ttl: float, optional
+            Age in seconds after which an entry is ignored and removed.
+            Default is None (entries never expire).
+        :param prefix: str, optional
+            Path prefix of the statistics file written at exit, e.g.
+            antgpt_hybrid_seed_21504. Default is None (nothing written).
+        :param run_info: dict, optional
+            Metadata written with the statistics.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self.run_info = dict(run_info or {})
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._used = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT,"
+            " created REAL,"
+            " last_used REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self._db.commit()
+        # Commit the last_used times of the hits since the last put; the
+        # statistics, registered later, are written first
+        on_end_of_run(self.close)
+        if prefix is not None:
+            on_end_of_run(self.write)
+
+    def get(self, key: str):
+        """
+        Return the cached reply of a key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self._used.pop(key, None)
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._used[key] = now
+            self.hits += 1
+            return row[0]
+
+    def _write_used(self) -> None:
+        # Called with the lock held; the caller commits
+        if self._used:
+            self._db.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._used.items()],
+            )
+            self._used = {}
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """
+        Store a reply and evict the least recently used entries over the limit.
+        """
+        now = time.time()
+        with self._lock:
+            self._write_used()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            (size,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if size > self.max_entries:
+                excess = size - self.max_entries
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current number of entries.
+        """
+        with self._lock:
+            (size,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": size,
+        }
+
+    def write(self, file_name: str = None) -> None:
+        """
+        Write the statistics as JSON, by default to <prefix>.cache.json.
+        """
+        file_name = file_name or self.prefix + ".cache.json"
+        with open(file_name, "w") as file:
+            json.dump(dict(self.run_info, **self.stats()), file, indent=1)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is None:
+                return
+            self._write_used()
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+
+class _CachedCompletions:
+    def __init__(self, client, cache: ResponseCache, validate=None):
+        self._client = client
+        self._cache = cache
+        self._validate = validate
+
+    def create(self, **kwargs):
+        model = kwargs.get("model", "")
+        messages = kwargs.get("messages", [])
+        key = cache_key(
+            model,
+            kwargs.get("temperature", 1.0),
+            _message_text(messages, "system"),
+            _message_text(messages, "user"),
+            {k: v for k, v in kwargs.items() if k not in _TRANSPORT_OPTIONS},
+        )
+        content = self._cache.get(key)
+        if content is not None:
+            # A cached reply costs no tokens
+            response = _completion(content, model)
+            response.cached = True
+            return response
+        response = self._client.chat.completions.create(**kwargs)
+        content = response.choices[0].message.content
+        # A reply that does not parse is asked again next time
+        if content is not None and (self._validate is None or self._validate(content)):
+            self._cache.put(key, model, content)
+        return response
+
+
+class CachedClient:
+    """
+    Wrap a client so chat.completions.create is answered from a ResponseCache
+    whenever an identical request was already made.
+    """
+
+    def __init__(self, client, cache: ResponseCache, validate=None):
+        """
+        :param client: OpenAI-compatible client
+            Answers the requests that are not cached.
+        :param cache: ResponseCache
+        :param validate: callable, optional
+            Returns whether a reply text may be cached, e.g.
+            lambda text: ACTION_SCHEMA.parse(text).ok. Default caches every
+            reply with a text.
+        """
+        self.client = client
+        self.cache = cache
+        self.chat = SimpleNamespace(
+            completions=_CachedCompletions(client, cache, validate)
+        )
@@ -0,0 +1,248 @@
+"""
+Concurrent per-tick dispatch of the LLM requests of all LLM-steered agents.
+"""
+
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from swarmgpt.scheduler import FALLBACK, estimate_tokens
+
+
+class BatchDispatcher:
+    """
+    Issue the chat completions of one tick concurrently on a bounded thread
+    pool and return the parsed action records in request order.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        parse,
+        max_workers: int = 8,
+        timeout: float = 15,
+        max_tokens: int = 500,
+        temperature: float = 0.1,
+        profiler=None,
+        scheduler=None,
+        prompt_cache_key: str = None,
+        gate=None,
+    ):
+        """
+        :param client: OpenAI-compatible client
+            Object exposing client.chat.completions.create(...).
+        :param model: str
+            Name of the model to query.
+        :param parse: callable
+            Turns the reply text into an action record (list) for NetLogo.
+        :param max_workers: int, optional
+            Maximum number of requests in flight. Default is 8.
+        :param timeout: float, optional
+            Per-request timeout in seconds. Default is 15.
+        :param max_tokens: int, optional
+            Completion token limit. Default is 500.
+        :param temperature: float, optional
+            Sampling temperature. Default is 0.1.
+        :param profiler: LatencyProfiler, optional
+            Receives the request and parse timings of every agent.
+        :param scheduler: RequestScheduler, optional
+            Applies rate limits, retries and the tick deadline to the requests.
+            A request that fails or misses the deadline is answered with
+            [False, FALLBACK] so the model falls back to its rule-based
+            procedure.
+        :param prompt_cache_key: str, optional
+            Sent with every request so that an OpenAI-compatible server routes
+            requests sharing the system prompt to its prompt cache, e.g.
+            swarmgpt.ants.PROMPTS.system_hash. Default is None (not sent).
+        :param gate: ObservationGate, optional
+            Answers an agent whose prompt did not change with its last valid
+            action instead of sending a request.
+        """
+        self.client = client
+        self.model = model
+        self.parse = parse
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.profiler = profiler
+        self.scheduler = scheduler
+        self.gate = gate
+        self.options = {}
+        if prompt_cache_key is not None:
+            self.options["prompt_cache_key"] = prompt_cache_key
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _create(self, prompt_text: str, system_text: str, remaining: float = None):
+        timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+        return self.client.chat.completions.create(
+            model=self.model,
+            timeout=timeout,
+            max_tokens=self.max_tokens,
+            messages=[
+                {"role": "system", "content": system_text},
+                {"role": "user", "content": prompt_text},
+            ],
+            temperature=self.temperature,
+            **self.options,
+        )
+
+    def complete(self, prompt_text: str, system_text: str, agent: int = None) -> str:
+        """
+        Send a single prompt and return the reply text.
+        """
+        start = time.perf_counter()
+        retries = 0
+        try:
+            if self.scheduler is None:
+                response = self._create(prompt_text, system_text)
+            else:
+                response, retries = self.scheduler.call(
+                    lambda remaining: self._create(prompt_text, system_text, remaining),
+                    estimate_tokens(system_text, prompt_text) + self.max_tokens,
+                )
+        except Exception as e:
+            if self.profiler is not None:
+                self.profiler.record(
+                    "request",
+                    time.perf_counter() - start,
+                    agent,
+                    ok=False,
+                    retries=getattr(e, "retries", 0),
+                )
+            raise
+        if self.profiler is not None:
+            # Cached replies report no tokens
+            usage = getattr(response, "usage", None)
+            self.profiler.record(
+                "request",
+                time.perf_counter() - start,
+                agent,
+                retries=retries,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            )
+        return response.choices[0].message.content
+
+    def parse_reply(self, text: str, agent: int = None) -> list:
+        """
+        Parse a reply text into an action record.
+        """
+        if self.profiler is None:
+            return self.parse(text)
+        start = time.perf_counter()
+        record = self.parse(text)
+        self.profiler.record(
+            "parse", time.perf_counter() - start, agent, ok=record[0] is True
+        )
+        return record
+
+    def _reuse(self, prompt_text: str, agent: int):
+        record = self.gate.reuse(agent, prompt_text)
+        if record is not None and self.profiler is not None:
+            self.profiler.record("reuse", 0.0, agent)
+        return record
+
+    def decide(self, prompt_text: str, system_text: str, agent: int = None) -> list:
+        """
+        Send a single prompt and parse the reply, for the per-agent path.
+
+        With a scheduler, a request that fails or misses the tick deadline is
+        answered with [False, FALLBACK]; without, its error is raised. With a
+        gate, an unchanged prompt is answered with the agent's last action.
+        """
+        if self.gate is not None:
+            record = self._reuse(prompt_text, agent)
+            if record is not None:
+                return record
+        try:
+            text = self.complete(prompt_text, system_text, agent)
+        except Exception:
+            if self.gate is not None:
+                self.gate.update(agent, prompt_text, None)
+            if self.scheduler is None:
+                raise
+            return [False, FALLBACK]
+        record = self.parse_reply(text, agent)
+        if self.gate is not None:
+            self.gate.update(agent, prompt_text, record)
+        return record
+
+    def _complete_current(self, current, prompt_text, system_text, agent):
+        if current is not None and not current():
+            raise CancelledError("the records of this dispatch are no longer needed")
+        return self.complete(prompt_text, system_text, agent)
+
+    def dispatch(
+        self,
+        prompts: list,
+        agents: list = None,
+        priorities: list = None,
+        current=None,
+    ) -> list:
+        """
+        Send all prompts of a tick concurrently and parse the replies.
+
+        A request that fails is reported like a parse failure,
+        [False, error_message], so NetLogo handles it the same way. With a
+        scheduler, requests that fail or are not answered before the tick
+        deadline are reported as [False, FALLBACK]; the models start the
+        deadline of every tick with scheduler.begin_tick(), for the batched
+        and the per-agent path alike. With a gate, agents whose prompt did not
+        change are not requested.
+
+        :param prompts: List of (prompt_text, system_text) pairs
+            The create_prompt outputs of every LLM agent of the tick.
+        :param agents: List of int, optional
+            The agent ids of the prompts, for the profiler.
+        :param priorities: List of numbers, optional
+            Requests are issued in increasing priority value, so the first
+            ones get the rate budget when it is short. Default is prompt order.
+        :param current: callable, optional
+            Returns False once the caller gave up on the records, e.g. a
+            pipelined tick collected after its timeout. Requests not sent by
+            then are skipped and the replies no longer update the gate.
+            Default is always current.
+
+        :return: list
+            One action record per prompt, in the same order.
+        """
+        agents = agents or [None] * len(prompts)
+        reused = {}
+        if self.gate is not None:
+            for i, agent in enumerate(agents):
+                record = self._reuse(prompts[i][0], agent)
+                if record is not None:
+                    reused[i] = record
+        order = [i for i in range(len(prompts)) if i not in reused]
+        if priorities is not None:
+            order.sort(key=priorities.__getitem__)
+        futures = {
+            i: self.executor.submit(
+                self._complete_current, current, *prompts[i], agents[i]
+            )
+            for i in order
+        }
+        records = []
+        for i, agent in enumerate(agents):
+            if i in reused:
+                records.append(reused[i])
+                continue
+            try:
+                if self.scheduler is None:
+                    text = futures[i].result()
+                else:
+                    text = futures[i].result(timeout=self.scheduler.remaining())
+            except Exception as e:
+                if self.scheduler is None:
+                    records.append([False, str(e)])
+                else:
+                    futures[i].cancel()
+                    records.append([False, FALLBACK])
+            else:
+                records.append(self.parse_reply(text, agent))
+            if self.gate is not None and (current is None or current()):
+                self.gate.update(agent, prompts[i][0], records[-1])
+        return records
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
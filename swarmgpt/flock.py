@@ -0,0 +1,216 @@
+"""
+Vectorized flocking step of the rule-based birds.
+
+The flock procedure of the model (find-flockmates, find-nearest-neighbor, then
+separate, or align and cohere, each through turn-at-most) runs once per bird
+in NetLogo code. FlockEngine.step computes the new headings of all rule-based
+birds of a tick from one array of positions and headings, with the same
+parameters, in-radius test and torus wrap.
+
+All birds see the state at the start of the step, whereas ask lets a bird see
+the headings already changed by the birds asked before it in random order.
+
+NeighborIndex answers the closest-flockmates query of the LLM birds from a
+KD-tree on the torus, built once per tick, instead of sorting all flockmates
+of every bird.
+"""
+
+import numpy as np
+
+CLOSEST = 8
+
+
+def subtract_headings(heading1, heading2) -> np.ndarray:
+    """
+    NetLogo's subtract-headings: the signed turn from heading2 to heading1 in
+    (-180, 180].
+    """
+    diff = np.mod(np.subtract(heading1, heading2), 360.0)
+    return np.where(diff > 180.0, diff - 360.0, diff)
+
+
+def atan_heading(x, y) -> np.ndarray:
+    """
+    NetLogo's atan x y: the heading in [0, 360) of the offset (x, y).
+    """
+    return np.mod(np.degrees(np.arctan2(x, y)), 360.0)
+
+
+def turn_at_most(heading, turn, max_turn) -> np.ndarray:
+    """
+    NetLogo's turn-at-most: turn right by turn degrees, by at most max_turn.
+    """
+    return np.mod(heading + np.clip(turn, -max_turn, max_turn), 360.0)
+
+
+def torus_offsets(positions, world_width: float = None, world_height: float = None):
+    """
+    Offsets from every bird to every other bird, along the shortest way around
+    the world edges when the world size is given.
+
+    :param positions: np.ndarray of shape (n, 2)
+        xcor and ycor of every bird.
+
+    :return: np.ndarray of shape (n, n, 2)
+        Offset [i, j] points from bird i to bird j.
+    """
+    offsets = positions[np.newaxis, :, :] - positions[:, np.newaxis, :]
+    for axis, size in enumerate((world_width, world_height)):
+        if size:
+            offsets[..., axis] -= size * np.round(offsets[..., axis] / size)
+    return offsets
+
+
+class FlockEngine:
+    """
+    Batched flock step of a model run.
+    """
+
+    def __init__(self, world_width: float = None, world_height: float = None):
+        """
+        :param world_width: float, optional
+            world-width of a horizontally wrapping world. Default is no wrap.
+        :param world_height: float, optional
+            world-height of a vertically wrapping world. Default is no wrap.
+        """
+        self.world_width = world_width
+        self.world_height = world_height
+
+    def step(self, state: list, n_llm: int, params: list) -> list:
+        """
+        Compute one flock step.
+
+        :param state: list
+            [xcor, ycor, heading] of every bird, ordered by who.
+        :param n_llm: int
+            The LLM birds are the first n_llm birds (bird-id < num_gpt_birds).
+        :param params: list
+            max-separate-turn, max-align-turn, max-cohere-turn,
+            minimum-separation and vision.
+
+        :return: list
+            The new headings of the rule-based birds, ordered by who.
+        """
+        max_separate, max_align, max_cohere, min_separation, vision = map(float, params)
+        state = np.asarray(state, dtype=np.float64).reshape(-1, 3)
+        positions = state[:, :2]
+        headings = state[:, 2]
+        offsets = torus_offsets(positions, self.world_width, self.world_height)
+        distance = np.hypot(offsets[..., 0], offsets[..., 1])
+        np.fill_diagonal(distance, np.inf)
+        in_vision = distance <= vision
+        n_llm = max(0, min(int(n_llm), len(state)))
+        return self._headings(
+            slice(n_llm, None),
+            headings,
+            offsets,
+            distance,
+            in_vision,
+            (max_separate, max_align, max_cohere, min_separation),
+        ).tolist()
+
+    def _headings(self, birds, headings, offsets, distance, in_vision, params):
+        max_separate, max_align, max_cohere, min_separation = params
+        own = headings[birds]
+        distance = distance[birds]
+        in_vision = in_vision[birds]
+        offsets = offsets[birds]
+        count = in_vision.sum(axis=1)
+        has_mates = count > 0
+        nearest = np.argmin(distance, axis=1)
+        rows = np.arange(len(own))
+        separating = has_mates & (distance[rows, nearest] < min_separation)
+
+        # separate: turn away from the heading of the nearest neighbor
+        separated = turn_at_most(
+            own, subtract_headings(own, headings[nearest]), max_separate
+        )
+
+        # align: turn towards the mean flockmate heading, as a vector sum
+        radians = np.radians(headings)
+        x = in_vision @ np.sin(radians)
+        y = in_vision @ np.cos(radians)
+        target = np.where((x == 0) & (y == 0), own, atan_heading(x, y))
+        aligned = turn_at_most(own, subtract_headings(target, own), max_align)
+
+        # cohere: from the aligned heading, turn towards the mean direction to
+        # the flockmates; sin and cos of the heading towards a flockmate are its
+        # offset over its distance
+        weight = np.divide(
+            1.0,
+            distance,
+            out=np.zeros_like(distance),
+            where=in_vision & (distance > 0),
+        )
+        safe_count = np.maximum(count, 1)
+        x = (weight * offsets[..., 0]).sum(axis=1) / safe_count
+        y = (weight * offsets[..., 1]).sum(axis=1) / safe_count
+        target = np.where((x == 0) & (y == 0), aligned, atan_heading(x, y))
+        cohered = turn_at_most(aligned, subtract_headings(target, aligned), max_cohere)
+
+        return np.where(has_mates, np.where(separating, separated, cohered), own)
+
+
+class NeighborIndex:
+    """
+    The closest flockmates of a set of birds, from a KD-tree of one tick.
+    """
+
+    def __init__(
+        self,
+        world_width: float,
+        world_height: float,
+        closest: int = CLOSEST,
+    ):
+        """
+        :param world_width: float
+            world-width of the wrapping world.
+        :param world_height: float
+            world-height of the wrapping world.
+        :param closest: int, optional
+            Number of closest flockmates returned per bird. Default is 8.
+        """
+        self.world_size = (float(world_width), float(world_height))
+        self.closest = closest
+
+    def query(self, state: list, birds: list, vision: float) -> list:
+        """
+        Find the closest flockmates in vision of some birds.
+
+        :param state: list
+            [xcor, ycor, heading] of every bird, ordered by who.
+        :param birds: list of int
+            who of the birds to answer, e.g. the LLM birds.
+        :param vision: float
+            Flockmates are at a torus distance <= vision, as with in-radius.
+
+        :return: list
+            Per bird, the [who, relative x, relative y] of at most closest
+            flockmates, nearest first. The relative positions are the plain
+            coordinate differences, as find-flockmates-llm reports them.
+        """
+        from scipy.spatial import cKDTree
+
+        state = np.asarray(state, dtype=np.float64).reshape(-1, 3)
+        birds = np.asarray(birds, dtype=np.intp)
+        if not len(birds):
+            return []
+        box = np.asarray(self.world_size)
+        wrapped = np.mod(state[:, :2], box)
+        # np.mod can round a tiny negative coordinate up to the box size itself
+        wrapped = np.where(wrapped >= box, wrapped - box, wrapped)
+        tree = cKDTree(wrapped, boxsize=self.world_size)
+        k = min(self.closest + 1, len(state))
+        distance, mates = tree.query(
+            wrapped[birds],
+            k=[*range(1, k + 1)],
+            distance_upper_bound=np.nextafter(float(vision), np.inf),
+        )
+        neighbors = []
+        for bird, row, found in zip(birds, mates, distance):
+            row = row[(found <= vision) & (row != bird)][: self.closest]
+            relative = state[row, :2] - state[bird, :2]
+            neighbors.append(
+                [[int(mate), x, y] for mate, (x, y) in zip(row, relative.tolist())]
+            )
+        return neighbors
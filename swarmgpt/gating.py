@@ -0,0 +1,97 @@
+"""
+Reuse of an agent's last action while its observation does not change.
+
+Many LLM ants keep the same discretized observation for several ticks, e.g.
+walking without pheromone and without food. The user prompt is rendered from
+the discretized observation alone (see swarmgpt.ants.discretize and
+swarmgpt.prompts), so an unchanged prompt means an unchanged observation. The
+gate remembers the prompt and the last valid action of every agent and answers
+an unchanged prompt with that action, for at most max_staleness ticks in a row,
+instead of sending a request.
+"""
+
+import json
+import threading
+
+from swarmgpt.lifecycle import on_end_of_run
+
+
+class ObservationGate:
+    """
+    Last prompt and valid action record of every agent.
+    """
+
+    def __init__(self, max_staleness: int = 5, prefix: str = None, run_info=None):
+        """
+        :param max_staleness: int, optional
+            Number of consecutive ticks an action is reused before the agent is
+            asked again. 0 never reuses. Default is 5.
+        :param prefix: str, optional
+            Path prefix of the summary file written at exit, e.g.
+            antgpt_hybrid_seed_21504. Default is None (nothing written).
+        :param run_info: dict, optional
+            Metadata written with the summary.
+        """
+        self.max_staleness = max_staleness
+        self.prefix = prefix
+        self.run_info = dict(run_info or {})
+        self.requested = 0
+        self.skipped = 0
+        self._last = {}
+        self._lock = threading.Lock()
+        if prefix is not None:
+            on_end_of_run(self.write)
+
+    def reuse(self, agent, key):
+        """
+        Return the action record to reuse for an agent, or None when the agent
+        has to be asked.
+
+        :param agent: int
+            The agent id; None is never gated.
+        :param key: hashable
+            The observation of this tick, e.g. the user prompt.
+        """
+        if agent is None:
+            return None
+        with self._lock:
+            last = self._last.get(agent)
+            if last is not None and last[0] == key and last[2] < self.max_staleness:
+                last[2] += 1
+                self.skipped += 1
+                return list(last[1])
+            self.requested += 1
+            return None
+
+    def update(self, agent, key, record: list) -> None:
+        """
+        Remember the action record of an agent's request. Only valid records
+        (record[0] is True) are reused.
+        """
+        if agent is None:
+            return
+        with self._lock:
+            if record and record[0] is True:
+                self._last[agent] = [key, list(record), 0]
+            else:
+                self._last.pop(agent, None)
+
+    def summary(self) -> dict:
+        """
+        Return the numbers of requested and skipped calls.
+        """
+        total = self.requested + self.skipped
+        return {
+            "max_staleness": self.max_staleness,
+            "requested": self.requested,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / total if total else 0.0,
+        }
+
+    def write(self, file_name: str = None) -> None:
+        """
+        Write the summary as JSON, by default to <prefix>.gate.json.
+        """
+        file_name = file_name or self.prefix + ".gate.json"
+        with open(file_name, "w") as file:
+            json.dump(dict(self.run_info, **self.summary()), file, indent=1)
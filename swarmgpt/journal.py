@@ -0,0 +1,313 @@
+"""
+Structured, buffered action journal replacing the stdout action log.
+
+A journal is a series of JSON Lines segments named
+``<prefix>.<first step:08d>.jsonl[.gz]``. Each segment starts with a run
+header, stores every system prompt once as a ``prompt`` record and then holds
+one ``step`` record per tick:
+
+    {"type": "step", "step": 12, "metrics": {"food_amount": 3},
+     "agents": [{"id": 0, "ok": true, "status": 0,
+                 "actions": ["move", "rotate-left"],
+                 "system": "<prompt hash>", "prompt": "...", "record": [...]}]}
+
+The status is the action-status-code of the agent: 0 for a parsed reply, 1 for
+a parse error and 2 for a request that failed or missed the tick deadline, for
+which the model ran its rule-based procedure (see swarmgpt.scheduler).
+
+Segments rotate once they exceed a size limit, so each one can be read and
+replayed on its own. Every finished step is flushed to disk, so a run that is
+killed loses at most the step in progress.
+"""
+
+import bisect
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+from swarmgpt.lifecycle import on_end_of_run
+from swarmgpt.scheduler import FALLBACK
+
+JOURNAL_VERSION = 1
+# action-status-code of an agent that ran the rule-based fallback
+STATUS_FALLBACK = 2
+SEGMENT_PATTERN = re.compile(r"\.(\d{8})\.jsonl(\.gz)?$")
+
+
+@lru_cache(maxsize=256)
+def prompt_hash(text: str) -> str:
+    """
+    Return the short content hash used to reference a system prompt.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ActionJournal:
+    """
+    Write the prompts and executed actions of a run as JSON Lines segments.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        run_info=None,
+        max_segment_bytes: int = 64 * 2**20,
+        compress: bool = True,
+        buffer_bytes: int = 2**20,
+        sync: bool = True,
+    ):
+        """
+        :param prefix: str
+            Path prefix of the segment files, e.g. antgpt_hybrid_seed_21504.
+        :param run_info: dict, optional
+            Metadata written in the header of every segment.
+        :param max_segment_bytes: int, optional
+            Uncompressed size after which a new segment is started at the next
+            step boundary. Default is 64 MiB.
+        :param compress: bool, optional
+            Whether to gzip the segments. Default is True.
+        :param buffer_bytes: int, optional
+            Bytes buffered in memory between writes. Default is 1 MiB.
+        :param sync: bool, optional
+            Whether to flush every finished step to disk. Default is True.
+        """
+        self.prefix = prefix
+        self.run_info = dict(run_info or {})
+        self.max_segment_bytes = max_segment_bytes
+        self.compress = compress
+        self.buffer_bytes = buffer_bytes
+        self.sync = sync
+        self.prompts = {}
+        self._staged = {}
+        self._buffer = []
+        self._buffered = 0
+        self._file = None
+        self._segment = -1
+        self._segment_bytes = 0
+        self._segment_prompts = set()
+        on_end_of_run(self.close)
+
+    def _segment_name(self, step: int) -> str:
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        return f"{self.prefix}.{step:08d}{suffix}"
+
+    def _write_line(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self._segment_bytes += len(line)
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+
+    def _open_segment(self, step: int) -> None:
+        self.close()
+        self._segment += 1
+        name = self._segment_name(step)
+        self._file = (
+            gzip.open(name, "wt", encoding="utf-8")
+            if self.compress
+            else open(name, "w", encoding="utf-8")
+        )
+        self._segment_bytes = 0
+        self._segment_prompts = set()
+        header = {"type": "run", "version": JOURNAL_VERSION, "segment": self._segment}
+        header.update(self.run_info)
+        self._write_line(header)
+
+    def stage(self, agent_id, system_text: str, prompt_text: str, record: list) -> None:
+        """
+        Remember the prompt and parsed reply of an agent for the current step.
+        """
+        key = prompt_hash(system_text)
+        self.prompts.setdefault(key, system_text)
+        self._staged[int(agent_id)] = {
+            "system": key,
+            "prompt": prompt_text,
+            "record": record,
+        }
+
+    def end_step(self, step: int, executed: list, metrics=None) -> None:
+        """
+        Write the record of a finished step.
+
+        :param step: int
+            The tick number.
+        :param executed: list
+            One [agent_id, action_ok, action_names, status] row per LLM agent,
+            where action_names are the executed actions, e.g. "move" or
+            "rotate-random-l" for ants and "heading:123.5" for birds, and the
+            optional status is the action-status-code of the agent.
+        :param metrics: dict, optional
+            Per-step values such as {"food_amount": 3}.
+        """
+        step = int(step)
+        if self._file is None or self._segment_bytes >= self.max_segment_bytes:
+            self._open_segment(step)
+        agents = []
+        for agent_id, action_ok, action_names, *status in executed:
+            agent = {
+                "id": int(agent_id),
+                "ok": bool(action_ok),
+                "actions": list(action_names),
+            }
+            if status:
+                agent["status"] = int(status[0])
+            staged = self._staged.pop(int(agent_id), None)
+            if staged is not None:
+                if staged["system"] not in self._segment_prompts:
+                    self._segment_prompts.add(staged["system"])
+                    self._write_line(
+                        {
+                            "type": "prompt",
+                            "hash": staged["system"],
+                            "text": self.prompts[staged["system"]],
+                        }
+                    )
+                agent.update(staged)
+            agents.append(agent)
+        self._staged.clear()
+        record = {"type": "step", "step": step, "agents": agents}
+        if metrics:
+            record["metrics"] = metrics
+        self._write_line(record)
+        if self.sync:
+            self.flush()
+            # A gzip flush ends the deflate block, so the step can be read back
+            self._file.flush()
+
+    def flush(self) -> None:
+        if self._buffer and self._file is not None:
+            self._file.write("".join(self._buffer))
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def segments(prefix: str) -> list:
+    """
+    Return the segment files of a journal, sorted by first step.
+    """
+    found = []
+    for name in glob.glob(glob.escape(prefix) + ".*.jsonl*"):
+        match = SEGMENT_PATTERN.search(name)
+        if match and name[: match.start()] == prefix:
+            found.append((int(match.group(1)), name))
+    return sorted(found)
+
+
+def signature(prefix: str) -> list:
+    """
+    Return the first step, name, size and modification time of every segment,
+    which change when a segment is added, grows or is rewritten.
+    """
+    found = []
+    for first, name in segments(prefix):
+        stat = os.stat(name)
+        found.append((first, name, stat.st_size, stat.st_mtime_ns))
+    return found
+
+
+def is_journal(path: str) -> bool:
+    return not os.path.isfile(path) and bool(segments(path))
+
+
+def read_segment(file_name: str):
+    """
+    Yield the records of one segment with system prompt hashes resolved.
+    """
+    opener = gzip.open if file_name.endswith(".gz") else open
+    prompts = {}
+    with opener(file_name, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                record = json.loads(line)
+                if record["type"] == "prompt":
+                    prompts[record["hash"]] = record["text"]
+                elif record["type"] == "step":
+                    for agent in record["agents"]:
+                        if "system" in agent:
+                            agent["system_text"] = prompts.get(agent["system"])
+                    yield record
+        except (EOFError, json.JSONDecodeError):
+            # The segment of an interrupted run ends with a partial record
+            return
+
+
+def read_steps(prefix: str):
+    """
+    Yield every step record of a journal in order.
+    """
+    for _, file_name in segments(prefix):
+        yield from read_segment(file_name)
+
+
+def replay_record(agent: dict) -> list:
+    """
+    Convert a journaled agent into the record process_step returns. The
+    action_ok of an agent that ran the rule-based fallback is FALLBACK, and its
+    actions are unset.
+    """
+    # Imported here as replay imports this module
+    from swarmgpt.replay import ANT_ACTION_MARKERS, FALLBACK_ACTION
+
+    ok = agent["ok"]
+    if agent.get("status") == STATUS_FALLBACK or FALLBACK_ACTION in agent["actions"]:
+        ok = FALLBACK
+    bird_actions = [a for a in agent["actions"] if a.startswith("heading:")]
+    if bird_actions:
+        return [str(agent["id"]), ok, bird_actions[-1].split(":")[1].strip()]
+    record = [str(agent["id"]), ok] + [False] * len(ANT_ACTION_MARKERS)
+    for marker, position in ANT_ACTION_MARKERS:
+        if marker[len("--- action ") :] in agent["actions"]:
+            record[position] = True
+    return record
+
+
+class JournalReplay:
+    """
+    Random access to the steps of a journal, holding one segment in memory.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.signature = signature(prefix)
+        self._starts = [first for first, *_ in self.signature]
+        self._loaded = None
+        self._steps = {}
+
+    def is_stale(self) -> bool:
+        try:
+            return signature(self.prefix) != self.signature
+        except FileNotFoundError:
+            # A segment was removed while listing
+            return True
+
+    def steps(self) -> list:
+        return [record["step"] for record in read_steps(self.prefix)]
+
+    def actions(self, step: int) -> list:
+        """
+        Return the replay records of a step, or an empty list if it is absent.
+        """
+        position = bisect.bisect_right(self._starts, int(step)) - 1
+        if position < 0:
+            return []
+        if self._loaded != position:
+            self._steps = {
+                record["step"]: record
+                for record in read_segment(self.signature[position][1])
+            }
+            self._loaded = position
+        record = self._steps.get(int(step))
+        if record is None:
+            return []
+        return [replay_record(agent) for agent in record["agents"]]
@@ -0,0 +1,44 @@
+"""
+End of a model run on the Python side.
+
+NetLogo has no end-of-run hook, so the objects that complete a file when the
+run ends (journals, pairwise files, summaries) register their closing method
+with on_end_of_run. The methods run at interpreter exit, or earlier when the
+run calls end_run, e.g. from the final commands of a BehaviorSpace experiment.
+Either way every method runs once.
+"""
+
+import atexit
+import threading
+
+_pending = []
+_lock = threading.Lock()
+
+
+def on_end_of_run(finish) -> None:
+    """
+    Run finish, a method without arguments, when the run ends.
+    """
+    with _lock:
+        if not _pending:
+            atexit.register(end_run)
+        _pending.append(finish)
+
+
+def end_run() -> None:
+    """
+    Run the registered methods, the latest first, and forget them.
+    """
+    with _lock:
+        pending = _pending[::-1]
+        _pending.clear()
+        atexit.unregister(end_run)
+    error = None
+    for finish in pending:
+        try:
+            finish()
+        except Exception as e:
+            # Complete the other files first, as atexit would
+            error = error or e
+    if error is not None:
+        raise error
@@ -0,0 +1,269 @@
+"""
+Online statistics of the ant colony runs, updated by the models every tick.
+
+The models report each search and way-back duration as it happens and the
+amount of food collected at the end of every tick. Means and variances are
+kept with Welford's algorithm and quartiles with P-square estimators, so the
+summary of a run can be queried at any point and is periodically written to
+``<prefix>.metrics.json`` without keeping the individual durations.
+"""
+
+import json
+import math
+import os
+
+from swarmgpt.lifecycle import on_end_of_run
+
+QUANTILES = (0.25, 0.5, 0.75)
+# NetLogo numbers cannot be NaN; stat reports this for undefined statistics
+MISSING = -1
+
+
+class Welford:
+    """
+    Running count, mean, variance, minimum and maximum of a series.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        """
+        Sample variance (ddof=1, as pandas describe), NaN below two values.
+        """
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class P2Quantile:
+    """
+    P-square estimate of a quantile with five markers and constant memory
+    (Jain and Chlamtac, 1985).
+    """
+
+    def __init__(self, p: float):
+        """
+        :param p: float
+            The quantile to estimate, between 0 and 1.
+        """
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float) -> None:
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        positions = self.positions
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (
+                offset <= -1 and positions[i - 1] - positions[i] < -1
+            ):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (
+                        positions[i + step] - positions[i]
+                    )
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        heights, positions = self.heights, self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step)
+            * (heights[i + 1] - heights[i])
+            / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step)
+            * (heights[i] - heights[i - 1])
+            / (positions[i] - positions[i - 1])
+        )
+
+    @property
+    def value(self) -> float:
+        """
+        The current estimate; exact (linear interpolation) below six values.
+        """
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5 or self.positions[4] == 5:
+            position = (len(self.heights) - 1) * self.p
+            low = math.floor(position)
+            high = min(low + 1, len(self.heights) - 1)
+            return self.heights[low] + (position - low) * (
+                self.heights[high] - self.heights[low]
+            )
+        return self.heights[2]
+
+
+class StreamStats:
+    """
+    Welford moments and P-square quartiles of one series.
+    """
+
+    def __init__(self, quantiles=QUANTILES):
+        self.moments = Welford()
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self.moments.add(value)
+        for estimator in self.quantiles.values():
+            estimator.add(value)
+
+    def summary(self) -> dict:
+        """
+        Return the statistics with the keys of pandas describe.
+        """
+        moments = self.moments
+        summary = {
+            "count": moments.count,
+            "mean": moments.mean if moments.count else math.nan,
+            "std": moments.std,
+            "min": moments.min if moments.count else math.nan,
+        }
+        for q, estimator in self.quantiles.items():
+            summary[f"{q:.0%}"] = estimator.value
+        summary["max"] = moments.max if moments.count else math.nan
+        return summary
+
+
+def _json_number(value):
+    # JSON has no NaN or infinity
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+class MetricsAccumulator:
+    """
+    Live food-collection and duration statistics of a run.
+    """
+
+    def __init__(self, prefix: str, source: str, run_info=None, flush_every: int = 100):
+        """
+        :param prefix: str
+            Path prefix of the summary file, e.g. antgpt_hybrid_seed_21504.
+        :param source: str
+            Model variant the durations are attributed to, e.g. "Hybrid".
+        :param run_info: dict, optional
+            Metadata written with the summary.
+        :param flush_every: int, optional
+            Ticks between two writes of the summary file; 0 disables periodic
+            writes. Default is 100.
+        """
+        self.prefix = prefix
+        self.source = source
+        self.run_info = dict(run_info or {})
+        self.flush_every = flush_every
+        self.durations = {}
+        self.food_amounts = []
+        self.step = None
+        on_end_of_run(self.flush)
+
+    @property
+    def file_name(self) -> str:
+        return self.prefix + ".metrics.json"
+
+    def add(self, kind: str, food_patch: int, steps: float, source: str = None):
+        """
+        Record one duration.
+
+        :param kind: str
+            "search" (steps until food was found) or "wayback" (steps to bring
+            it back to the nest).
+        :param food_patch: int
+            The food source number, 1 to 3.
+        :param steps: float
+            The duration in ticks.
+        :param source: str, optional
+            Model variant, default is the accumulator's source.
+        """
+        key = (source or self.source, kind, int(food_patch))
+        if key not in self.durations:
+            self.durations[key] = StreamStats()
+        self.durations[key].add(steps)
+
+    def end_step(self, step: int, food_amount: int) -> None:
+        """
+        Record the food collected at the end of a tick and flush if due.
+        """
+        self.step = int(step)
+        self.food_amounts.append(int(food_amount))
+        if self.flush_every and (self.step + 1) % self.flush_every == 0:
+            self.flush()
+
+    def stat(self, kind: str, food_patch: int, name: str, source: str = None):
+        """
+        Return one statistic, e.g. stat("search", 1, "mean"), for monitors.
+        Durations are never negative, so a statistic that is not defined yet,
+        such as the mean without durations, is reported as MISSING (-1).
+        """
+        stats = self.durations.get((source or self.source, kind, int(food_patch)))
+        value = MISSING if stats is None else stats.summary()[name]
+        return value if math.isfinite(value) else MISSING
+
+    def summary(self) -> dict:
+        """
+        Return the current statistics of the run.
+        """
+        durations = {}
+        for (source, kind, food_patch), stats in sorted(self.durations.items()):
+            durations.setdefault(kind, []).append(
+                dict(source=source, food_patch=food_patch, **stats.summary())
+            )
+        return {
+            "step": self.step,
+            "food_amount": self.food_amounts[-1] if self.food_amounts else None,
+            "durations": durations,
+        }
+
+    def flush(self) -> None:
+        """
+        Atomically rewrite the summary file with the current statistics and
+        the food amount series.
+        """
+        summary = self.summary()
+        for rows in summary["durations"].values():
+            for row in rows:
+                for key, value in row.items():
+                    row[key] = _json_number(value)
+        record = dict(self.run_info, **summary, food_amounts=self.food_amounts)
+        temporary = self.file_name + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(record, file)
+        os.replace(temporary, self.file_name)
@@ -0,0 +1,220 @@
+"""
+Condensed binary storage of the pairwise bird distances and heading
+differences computed by calculate-differences.
+
+The model used to produce every ordered pair (i, j) and (j, i) of a tick. Both
+values are symmetric, so a file only stores the upper triangle (i < j) in
+scipy.spatial.distance condensed order, as fixed-width records:
+
+    header: magic, version, number of birds, world width and height
+    record: step (int32), then n * (n - 1) / 2 (distance, heading_difference)
+            float32 pairs
+
+A record's offset is known from its index, so files can be memory-mapped and
+sliced by step without parsing.
+
+Position files share the header and store the (xcor, ycor, heading) of every
+bird per tick instead, for analyses that index the birds spatially rather than
+reading all pairs.
+"""
+
+import os
+
+import numpy as np
+
+from swarmgpt.lifecycle import on_end_of_run
+
+MAGIC = b"SWGPAIRS"
+POSITIONS_MAGIC = b"SWGPOSIT"
+VERSION = 1
+HEADER = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("n_birds", "<u4"),
+        ("world_width", "<f8"),
+        ("world_height", "<f8"),
+    ]
+)
+PAIR = np.dtype([("distance", "<f4"), ("heading_difference", "<f4")])
+POSITION = np.dtype([("xcor", "<f4"), ("ycor", "<f4"), ("heading", "<f4")])
+
+
+def pair_count(n_birds: int) -> int:
+    return n_birds * (n_birds - 1) // 2
+
+
+def record_dtype(n_birds: int) -> np.dtype:
+    """
+    Return the dtype of one tick of a file with n_birds birds.
+    """
+    return np.dtype([("step", "<i4"), ("pairs", PAIR, (pair_count(n_birds),))])
+
+
+def position_record_dtype(n_birds: int) -> np.dtype:
+    """
+    Return the dtype of one tick of a position file with n_birds birds.
+    """
+    return np.dtype([("step", "<i4"), ("birds", POSITION, (n_birds,))])
+
+
+def heading_differences(headings) -> np.ndarray:
+    """
+    Vectorized heading-difference reporter of the model over all i < j pairs.
+    """
+    headings = np.asarray(headings, dtype=np.float64)
+    i, j = np.triu_indices(len(headings), 1)
+    diff = np.mod(headings[i] - headings[j], 360.0)
+    return np.abs(np.where(diff > 180.0, diff - 360.0, diff))
+
+
+def distances(positions, world_width: float = None, world_height: float = None):
+    """
+    Distances between all i < j pairs, wrapping around the world edges like
+    NetLogo's distance when the world size is given.
+
+    :param positions: array-like of shape (n, 2)
+        xcor and ycor of every bird, ordered by who.
+    :param world_width: float, optional
+        world-width of a horizontally wrapping world. Default is no wrap.
+    :param world_height: float, optional
+        world-height of a vertically wrapping world. Default is no wrap.
+
+    :return: np.ndarray
+        The condensed distances.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    i, j = np.triu_indices(len(positions), 1)
+    delta = np.abs(positions[i] - positions[j])
+    for axis, size in enumerate((world_width, world_height)):
+        if size:
+            delta[:, axis] = np.minimum(delta[:, axis], size - delta[:, axis])
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+
+class PairwiseWriter:
+    """
+    Append the condensed pairs of every tick to a binary file.
+    """
+
+    magic = MAGIC
+
+    def __init__(
+        self,
+        file_name: str,
+        n_birds: int,
+        world_width: float = None,
+        world_height: float = None,
+    ):
+        """
+        :param file_name: str
+            Output file, e.g. flockdata_seed_21504.pairs.
+        :param n_birds: int
+            Number of birds, fixed for the whole run.
+        :param world_width: float, optional
+            world-width of the model, used to wrap distances. Default is no wrap.
+        :param world_height: float, optional
+            world-height of the model, used to wrap distances. Default is no wrap.
+        """
+        self.file_name = file_name
+        self.n_birds = int(n_birds)
+        self.world_width = world_width
+        self.world_height = world_height
+        self.dtype = self._record_dtype()
+        self._file = open(file_name, "wb", buffering=2**20)
+        header = np.zeros(1, dtype=HEADER)
+        header[0] = (
+            self.magic,
+            VERSION,
+            self.n_birds,
+            world_width or 0,
+            world_height or 0,
+        )
+        self._file.write(header.tobytes())
+        on_end_of_run(self.close)
+
+    def _record_dtype(self) -> np.dtype:
+        return record_dtype(self.n_birds)
+
+    def _fill(self, record: np.ndarray, state: np.ndarray) -> None:
+        record["pairs"]["distance"] = distances(
+            state[:, :2], self.world_width, self.world_height
+        )
+        record["pairs"]["heading_difference"] = heading_differences(state[:, 2])
+
+    def write(self, step: int, state: list) -> None:
+        """
+        Write the record of one tick.
+
+        :param step: int
+            The tick number.
+        :param state: list
+            One [xcor, ycor, heading] row per bird, ordered by who.
+        """
+        state = np.asarray(state, dtype=np.float64).reshape(self.n_birds, 3)
+        record = np.zeros(1, dtype=self.dtype)
+        record["step"] = int(step)
+        self._fill(record, state)
+        self._file.write(record.tobytes())
+
+    def flush(self) -> None:
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class PositionWriter(PairwiseWriter):
+    """
+    Append the positions and headings of every tick to a binary file.
+    """
+
+    magic = POSITIONS_MAGIC
+
+    def _record_dtype(self) -> np.dtype:
+        return position_record_dtype(self.n_birds)
+
+    def _fill(self, record: np.ndarray, state: np.ndarray) -> None:
+        for column, name in enumerate(POSITION.names):
+            record["birds"][name] = state[:, column]
+
+
+def _read_records(file_name: str, magic: bytes, dtype_of):
+    header = np.fromfile(file_name, dtype=HEADER, count=1)
+    if len(header) == 0 or header[0]["magic"] != magic:
+        raise ValueError(f"{file_name} is not a {magic.decode()} file")
+    if header[0]["version"] != VERSION:
+        raise ValueError(f"unsupported file version {header[0]['version']}")
+    dtype = dtype_of(int(header[0]["n_birds"]))
+    count = (os.path.getsize(file_name) - HEADER.itemsize) // dtype.itemsize
+    if count == 0:
+        return header[0], np.zeros(0, dtype=dtype)
+    records = np.memmap(
+        file_name, dtype=dtype, mode="r", offset=HEADER.itemsize, shape=(count,)
+    )
+    return header[0], records
+
+
+def read_pairs(file_name: str):
+    """
+    Memory-map a pairwise file.
+
+    :return: tuple
+        The header record and a read-only array of per-tick records with
+        "step" and "pairs" fields. A partial last record of an interrupted run
+        is ignored.
+    """
+    return _read_records(file_name, MAGIC, record_dtype)
+
+
+def read_positions(file_name: str):
+    """
+    Memory-map a position file.
+
+    :return: tuple
+        The header record and a read-only array of per-tick records with
+        "step" and "birds" fields, see read_pairs.
+    """
+    return _read_records(file_name, POSITIONS_MAGIC, position_record_dtype)
@@ -0,0 +1,214 @@
+"""
+Schema-driven parsing of the model replies into typed action records.
+
+The reply object is located once, inside a Markdown code fence if there is
+one, and decoded with the C JSON scanner. Only when the strict decode fails are
+the lower-cased, quote-swapped form the first parsers accepted and then Python
+literals (single quotes, True/False) tried. Braces inside strings, e.g. in the
+flocking rationale, do not end the object. Every reply yields a ParseResult
+with a ParseCode, so failures can be counted by cause.
+"""
+
+import ast
+import json
+import re
+from collections import namedtuple
+from enum import IntEnum
+from functools import partial
+
+FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.S)
+_DECODER = json.JSONDecoder()
+_MISSING = object()
+
+
+class ParseCode(IntEnum):
+    OK = 0
+    EMPTY = 1
+    NO_OBJECT = 2
+    BAD_JSON = 3
+    MISSING_KEY = 4
+    BAD_VALUE = 5
+
+
+class ParseResult(namedtuple("ParseResult", ["code", "action", "message"])):
+    """
+    Outcome of parsing one reply: a ParseCode, the typed action (None on
+    failure) and an error message ("" on success).
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return not self.code
+
+
+def _balanced(text: str, start: int):
+    # The {...} starting at start, skipping braces inside quoted strings
+    depth = 0
+    quote = None
+    escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote is not None:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == quote:
+                quote = None
+        elif c == '"' or c == "'":
+            quote = c
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+    return None
+
+
+def extract_object(text: str) -> tuple:
+    """
+    Find and decode the first object of a reply.
+
+    :param text: str
+        The reply text of the model.
+
+    :return: tuple
+        (ParseCode, dict or None, error message)
+    """
+    if not text or text.isspace():
+        return ParseCode.EMPTY, None, "empty reply"
+    if "```" in text:
+        fenced = FENCE.search(text)
+        if fenced is not None and "{" in fenced.group(1):
+            text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return ParseCode.NO_OBJECT, None, "no object in reply"
+    try:
+        value = _DECODER.raw_decode(text, start)[0]
+    except ValueError:
+        try:
+            value = _DECODER.raw_decode(text.lower().replace("'", '"'), start)[0]
+        except ValueError as e:
+            candidate = _balanced(text, start)
+            if candidate is None:
+                return ParseCode.BAD_JSON, None, "unterminated object"
+            try:
+                value = ast.literal_eval(candidate)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                return ParseCode.BAD_JSON, None, str(e)
+    if not isinstance(value, dict):
+        return ParseCode.BAD_JSON, None, "reply object is not a dictionary"
+    return ParseCode.OK, value, ""
+
+
+def _to_bool(value) -> bool:
+    if type(value) is bool:
+        return value
+    if type(value) is str:
+        text = value.strip().lower()
+        if text in ("true", "false"):
+            return text == "true"
+    raise ValueError(f"{value!r} is not a boolean")
+
+
+def _to_choice(value, options=None) -> str:
+    text = str(value).strip().lower().replace("_", "-")
+    if options is not None and text not in options:
+        raise ValueError(f"{value!r} is not one of {', '.join(sorted(options))}")
+    return text
+
+
+def _to_number(value) -> float:
+    if isinstance(value, bool):
+        raise ValueError("boolean is not a number")
+    return float(value)
+
+
+CONVERTERS = {
+    "bool": _to_bool,
+    "choice": _to_choice,
+    "number": _to_number,
+    "text": str,
+}
+
+
+class Schema:
+    """
+    Keys and value kinds of a reply object, and the record type they fill.
+    """
+
+    def __init__(self, record_type, fields, optional=()):
+        """
+        :param record_type: namedtuple class
+            Built from the converted values, in field order.
+        :param fields: sequence of (key, kind) or (key, "choice", options)
+            Reply keys (lower case, "-" separated) and their kinds: "bool",
+            "choice", "number" or "text". A choice with options only accepts
+            those values.
+        :param optional: sequence of str, optional
+            Keys that may be missing; their record value is then None.
+        """
+        self.record_type = record_type
+        self.fields = tuple(
+            (
+                key,
+                (
+                    CONVERTERS[kind]
+                    if not options
+                    else partial(_to_choice, options=frozenset(options[0]))
+                ),
+            )
+            for key, kind, *options in fields
+        )
+        self.optional = frozenset(optional)
+
+    def validate(self, value: dict) -> ParseResult:
+        """
+        Convert a decoded reply object into a typed record.
+        """
+        normalized = None
+        values = []
+        for key, convert in self.fields:
+            item = value.get(key, _MISSING)
+            if item is _MISSING:
+                if normalized is None:
+                    # Keys as the models spell them: any case, "_" or "-"
+                    normalized = {
+                        str(k).strip().lower().replace("_", "-"): v
+                        for k, v in value.items()
+                    }
+                item = normalized.get(key, _MISSING)
+                if item is _MISSING:
+                    if key not in self.optional:
+                        return ParseResult(
+                            ParseCode.MISSING_KEY, None, f"missing {key}"
+                        )
+                    values.append(None)
+                    continue
+            try:
+                values.append(convert(item))
+            except (TypeError, ValueError) as e:
+                return ParseResult(ParseCode.BAD_VALUE, None, f"{key}: {e}")
+        return ParseResult(ParseCode.OK, self.record_type._make(values), "")
+
+    def parse(self, text: str) -> ParseResult:
+        """
+        Parse one reply text.
+        """
+        code, value, message = extract_object(text)
+        if code:
+            return ParseResult(code, None, message)
+        return self.validate(value)
+
+    def parse_many(self, texts) -> list:
+        """
+        Parse many reply texts, e.g. the replies of a recorded run.
+
+        :return: list of ParseResult
+        """
+        parse = self.parse
+        return [parse(text) for text in texts]
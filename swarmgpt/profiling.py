@@ -0,0 +1,234 @@
+"""
+Latency profile of the LLM agent loop.
+
+Timings of the phases of every agent and tick (prompt construction, the model
+request, reply parsing, and the NetLogo side between Python calls) are kept
+with the token usage, retries and parse outcome in a fixed-size ring buffer.
+The percentiles of every phase and the totals of the run are available at any
+time and written to ``<prefix>.profile.json`` at exit.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+from swarmgpt.lifecycle import on_end_of_run
+
+SPAN = np.dtype(
+    [
+        ("tick", "<i4"),
+        ("agent", "<i4"),
+        ("phase", "u1"),
+        ("ok", "?"),
+        ("retries", "<u2"),
+        ("prompt_tokens", "<i4"),
+        ("completion_tokens", "<i4"),
+        ("seconds", "<f8"),
+    ]
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyProfiler:
+    """
+    Ring buffer of phase timings, shared by the dispatcher threads.
+    """
+
+    def __init__(self, prefix: str = None, capacity: int = 65536, run_info=None):
+        """
+        :param prefix: str, optional
+            Path prefix of the summary file written at exit, e.g.
+            antgpt_hybrid_seed_21504. Default is None (nothing written).
+        :param capacity: int, optional
+            Number of spans kept; older spans are overwritten. The run totals
+            cover every span. Default is 65536.
+        :param run_info: dict, optional
+            Metadata written with the summary.
+        """
+        self.prefix = prefix
+        self.run_info = dict(run_info or {})
+        self.tick = -1
+        self.agent = -1
+        self.phases = []
+        self._codes = {}
+        self._spans = np.zeros(capacity, dtype=SPAN)
+        self._written = 0
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._lap = time.perf_counter()
+        self._tick_start = self._lap
+        if prefix is not None:
+            on_end_of_run(self.write)
+
+    def _code(self, phase: str) -> int:
+        if phase not in self._codes:
+            self._codes[phase] = len(self.phases)
+            self.phases.append(phase)
+            self._totals[phase] = dict(
+                count=0,
+                seconds=0.0,
+                failures=0,
+                retries=0,
+                prompt_tokens=0,
+                completion_tokens=0,
+            )
+        return self._codes[phase]
+
+    def record(
+        self,
+        phase: str,
+        seconds: float,
+        agent: int = None,
+        ok: bool = True,
+        retries: int = 0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        """
+        Record one span.
+
+        :param phase: str
+            E.g. "prompt", "request", "parse" or a NetLogo phase.
+        :param seconds: float
+            Duration of the span.
+        :param agent: int, optional
+            Agent id, default is the current agent (-1 for tick-wide phases).
+        :param ok: bool, optional
+            False for failed requests and parse failures.
+        :param retries: int, optional
+            Retries before the request succeeded or gave up.
+        :param prompt_tokens: int, optional
+            Prompt tokens reported by the model.
+        :param completion_tokens: int, optional
+            Completion tokens reported by the model.
+        """
+        with self._lock:
+            code = self._code(phase)
+            self._spans[self._written % len(self._spans)] = (
+                self.tick,
+                self.agent if agent is None else agent,
+                code,
+                ok,
+                retries,
+                prompt_tokens,
+                completion_tokens,
+                seconds,
+            )
+            self._written += 1
+            totals = self._totals[phase]
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["failures"] += not ok
+            totals["retries"] += retries
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+
+    @contextmanager
+    def span(self, phase: str, agent: int = None):
+        """
+        Time the body of a with statement as one span.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, agent)
+
+    def wrap(self, phase: str, function):
+        """
+        Return function with every call recorded as a span of the current agent.
+        """
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            with self.span(phase):
+                return function(*args, **kwargs)
+
+        return timed
+
+    def begin_tick(self, tick: int) -> None:
+        """
+        Start a tick; also restarts the lap clock.
+        """
+        self.tick = int(tick)
+        self.agent = -1
+        self._tick_start = self._lap = time.perf_counter()
+
+    def lap(self, phase: str, agent: int = -1) -> None:
+        """
+        Record the time since the previous lap (or the start of the tick) as a
+        span, for phases that run in NetLogo between two Python calls.
+        """
+        now = time.perf_counter()
+        self.record(phase, now - self._lap, agent)
+        self._lap = now
+
+    def end_tick(self) -> None:
+        """
+        Record the whole tick as a "tick" span.
+        """
+        self.record("tick", time.perf_counter() - self._tick_start, -1)
+
+    def spans(self) -> np.ndarray:
+        """
+        Return the spans still in the ring buffer, oldest first.
+        """
+        with self._lock:
+            capacity = len(self._spans)
+            if self._written <= capacity:
+                return self._spans[: self._written].copy()
+            start = self._written % capacity
+            return np.concatenate([self._spans[start:], self._spans[:start]])
+
+    def percentiles(self, phase: str, percentiles=PERCENTILES) -> dict:
+        """
+        Return the latency percentiles of a phase over the buffered spans.
+
+        :return: dict
+            E.g. {"p50": ..., "p95": ..., "p99": ...} in seconds, empty if the
+            phase has no buffered span.
+        """
+        code = self._codes.get(phase)
+        if code is None:
+            return {}
+        spans = self.spans()
+        seconds = spans["seconds"][spans["phase"] == code]
+        if len(seconds) == 0:
+            return {}
+        values = np.percentile(seconds, percentiles)
+        return {f"p{p:g}": float(v) for p, v in zip(percentiles, values)}
+
+    def summary(self) -> dict:
+        """
+        Return the run totals and percentiles of every phase.
+        """
+        phases = {}
+        for phase in list(self.phases):
+            totals = dict(self._totals[phase])
+            totals["mean"] = totals["seconds"] / totals["count"]
+            totals.update(self.percentiles(phase))
+            phases[phase] = totals
+        return {"ticks": self.tick + 1, "spans": self._written, "phases": phases}
+
+    def to_frame(self):
+        """
+        Return the buffered spans as a DataFrame with phase names.
+        """
+        import pandas as pd
+
+        data = pd.DataFrame(self.spans())
+        data["phase"] = pd.Categorical.from_codes(data["phase"], self.phases)
+        return data
+
+    def write(self, file_name: str = None) -> None:
+        """
+        Write the summary as JSON, by default to <prefix>.profile.json.
+        """
+        file_name = file_name or self.prefix + ".profile.json"
+        with open(file_name, "w") as file:
+            json.dump(dict(self.run_info, **self.summary()), file, indent=1)
@@ -0,0 +1,88 @@
+"""
+Prompt templates compiled once per run.
+
+A PromptTemplate holds a constant system prompt with its content hash and the
+format of the user prompts. User prompts over a small discrete observation
+space are rendered into a table when the template is built and afterwards only
+looked up, so building a prompt costs a dictionary access instead of a string
+concatenation per agent and tick.
+"""
+
+import string
+from itertools import product
+
+from swarmgpt.journal import prompt_hash
+
+
+class PromptTemplate:
+    """
+    A system prompt and a table of rendered user prompts.
+    """
+
+    def __init__(
+        self,
+        system_text: str,
+        user_format: str,
+        slots: dict = None,
+        texts: dict = None,
+        max_entries: int = 4096,
+    ):
+        """
+        :param system_text: str
+            The constant system prompt.
+        :param user_format: str
+            str.format template of the user prompt with named fields.
+        :param slots: dict, optional
+            Field name to the values to precompute, e.g. {"nest": ("Left",
+            "Right", "Front")}. The table is filled with the product of the
+            values of every field. Default is no precomputation.
+        :param texts: dict, optional
+            Field name to a {value: text} map, for fields whose prompt text
+            differs from the observation value, e.g. booleans.
+        :param max_entries: int, optional
+            Table size after which new prompts are rendered without being
+            stored. Default is 4096.
+        """
+        self.system_text = system_text
+        self.system_hash = prompt_hash(system_text)
+        self.user_format = user_format
+        self.fields = tuple(
+            name for _, name, _, _ in string.Formatter().parse(user_format) if name
+        )
+        self.texts = dict(texts or {})
+        self.max_entries = max_entries
+        self._table = {}
+        if slots:
+            for values in product(*(slots[field] for field in self.fields)):
+                self.render(values)
+
+    def render(self, values: tuple) -> str:
+        """
+        Return the user prompt of a discrete observation.
+
+        :param values: tuple
+            One value per field, in the order of the fields in user_format.
+        """
+        text = self._table.get(values)
+        if text is None:
+            text = self.user_format.format(
+                **{
+                    field: self.texts[field][value] if field in self.texts else value
+                    for field, value in zip(self.fields, values)
+                }
+            )
+            if len(self._table) < self.max_entries:
+                self._table[values] = text
+        return text
+
+    def prompt_key(self, values: tuple) -> str:
+        """
+        Return a stable hash of the system prompt and a discrete observation,
+        identifying the full request across runs.
+        """
+        return prompt_hash(
+            self.system_hash + "\x00" + "\x00".join(str(value) for value in values)
+        )
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -0,0 +1,279 @@
+"""
+Indexed replay of the step logs written by the ant and flocking models.
+
+A log is scanned once to find the byte range of every ``step: N`` ...
+``end step`` section. The ranges are persisted next to the log (``<log>.idx``)
+so later replays can seek straight to a step instead of re-reading the file.
+"""
+
+import json
+import os
+
+from swarmgpt.journal import JournalReplay, is_journal
+from swarmgpt.scheduler import FALLBACK
+
+# Action markers printed by populate_ant_with_llm_data and their position in
+# the replayed ant record
+ANT_ACTION_MARKERS = (
+    ("--- action move", 2),
+    ("--- action rotate-right", 3),
+    ("--- action rotate-left", 4),
+    ("--- action rotate-random-l", 5),
+    ("--- action rotate-random-r", 6),
+    ("--- action pick-up-food", 7),
+    ("--- action drop-pheromone", 8),
+    ("--- action drop-food", 9),
+)
+
+# Action logged by an agent whose request failed or missed the tick deadline and
+# which ran the rule-based procedure instead; its action_ok is FALLBACK
+FALLBACK_ACTION = "rule-based-fallback"
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+
+def _new_record(kind: str, agent_id: str) -> list:
+    """
+    Create the default replay record for an agent section.
+
+    :param kind: str
+        Either "AntID" or "BirdID".
+    :param agent_id: str
+        The id printed in the "Start-..." line.
+
+    :return: list
+        [id, action_ok, ...actions] with every action unset.
+    """
+    if kind == "BirdID":
+        return [agent_id, False, 0.0]
+    return [agent_id, False] + [False] * len(ANT_ACTION_MARKERS)
+
+
+def _update_record(kind: str, record: list, line: str) -> None:
+    """
+    Update an agent record in place from one line of its log section.
+    """
+    if "Parser ok" in line:
+        record[1] = True
+    elif "--- action " + FALLBACK_ACTION in line:
+        record[1] = FALLBACK
+        return
+    if kind == "BirdID":
+        if "--- action heading:" in line:
+            record[2] = line.split(":")[1].strip()
+        return
+    for marker, position in ANT_ACTION_MARKERS:
+        if marker in line:
+            record[position] = True
+
+
+def parse_section(lines) -> list:
+    """
+    Parse the lines of a single step section into replay records.
+
+    :param lines: Iterable of str
+        The lines between "step: N" and "end step".
+
+    :return: list
+        One record per agent, in log order. Ant records are
+        [AntID, action_ok, move, rotate_right, rotate_left, rotate_random_l,
+        rotate_random_r, pick_up_food, drop_pheromone, drop_food]; bird records
+        are [BirdID, action_ok, heading]. action_ok is True, False, or FALLBACK
+        for an agent that ran the rule-based procedure.
+    """
+    actions_list = []
+    kind = None
+    record = None
+    for line in lines:
+        if line.startswith(("Start-AntID:", "Start-BirdID:")):
+            kind = line[len("Start-") : line.index(":")]
+            record = _new_record(kind, line.split(":")[1].strip())
+            continue
+        if line.startswith(("End-AntID:", "End-BirdID:")):
+            if record is not None and line.split(":")[1].strip() == record[0]:
+                actions_list.append(record)
+                record = None
+            continue
+        if record is not None:
+            _update_record(kind, record, line)
+    return actions_list
+
+
+def build_index(file_name: str) -> dict:
+    """
+    Scan a log once and return the byte range of every step section.
+
+    Only the first section of a repeated step number is kept, which matches
+    what the original line-by-line search returned.
+
+    :param file_name: str
+        Path of the log file.
+
+    :return: dict
+        Maps the step number to a (start, end) tuple of byte offsets.
+    """
+    index = {}
+    current_step = None
+    start = position = 0
+    with open(file_name, "rb") as file:
+        for line in file:
+            line_start = position
+            position += len(line)
+            text = line.strip()
+            if text.startswith(b"step: ") and current_step is None:
+                try:
+                    step = int(text[len(b"step: ") :])
+                except ValueError:
+                    continue
+                if step not in index:
+                    current_step, start = step, position
+            elif text == b"end step" and current_step is not None:
+                index[current_step] = (start, line_start)
+                current_step = None
+    # Keep a truncated last step so an interrupted run can still be replayed
+    if current_step is not None:
+        index[current_step] = (start, position)
+    return index
+
+
+class ReplayLog:
+    """
+    Random access to the step sections of a model log.
+
+    Each step is parsed at most once; lookups after the first are served from
+    memory.
+    """
+
+    def __init__(self, file_name: str, persist_index: bool = True):
+        """
+        :param file_name: str
+            Path of the log file.
+        :param persist_index: bool, optional
+            Whether to load and save the byte-offset index next to the log.
+            Default is True.
+        """
+        self.file_name = file_name
+        self.persist_index = persist_index
+        stat = os.stat(file_name)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.index = self._load_index()
+        self._parsed = {}
+
+    @property
+    def index_file(self) -> str:
+        return self.file_name + INDEX_SUFFIX
+
+    def _load_index(self) -> dict:
+        if self.persist_index:
+            try:
+                with open(self.index_file, "r") as file:
+                    stored = json.load(file)
+                if (
+                    stored.get("version") == INDEX_VERSION
+                    and tuple(stored.get("signature", ())) == self.signature
+                ):
+                    return {int(k): tuple(v) for k, v in stored["steps"].items()}
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = build_index(self.file_name)
+        if self.persist_index:
+            try:
+                with open(self.index_file, "w") as file:
+                    json.dump(
+                        {
+                            "version": INDEX_VERSION,
+                            "signature": list(self.signature),
+                            "steps": index,
+                        },
+                        file,
+                    )
+            except OSError:
+                # A read-only log directory only costs us the rescan next time
+                pass
+        return index
+
+    def is_stale(self) -> bool:
+        """
+        Check whether the log changed on disk since it was indexed.
+        """
+        try:
+            stat = os.stat(self.file_name)
+        except OSError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != self.signature
+
+    def steps(self) -> list:
+        """
+        Return the sorted list of step numbers present in the log.
+        """
+        return sorted(self.index)
+
+    def actions(self, step: int) -> list:
+        """
+        Return the replay records of a step, or an empty list if it is absent.
+        """
+        step = int(step)
+        if step not in self._parsed:
+            span = self.index.get(step)
+            if span is None:
+                return []
+            start, end = span
+            with open(self.file_name, "rb") as file:
+                file.seek(start)
+                chunk = file.read(end - start)
+            self._parsed[step] = parse_section(
+                chunk.decode("utf-8", errors="replace").splitlines()
+            )
+        return self._parsed[step]
+
+    def preload(self) -> None:
+        """
+        Parse every step with a single sequential read of the log.
+        """
+        with open(self.file_name, "rb") as file:
+            data = file.read()
+        for step, (start, end) in self.index.items():
+            if step not in self._parsed:
+                self._parsed[step] = parse_section(
+                    data[start:end].decode("utf-8", errors="replace").splitlines()
+                )
+
+
+# Open logs, keyed by absolute path, shared by successive process_step calls
+_open_logs = {}
+
+
+def open_log(file_name: str) -> ReplayLog:
+    """
+    Return the cached replay of a text log or journal prefix, re-indexing it
+    if it changed.
+    """
+    key = os.path.abspath(file_name)
+    log = _open_logs.get(key)
+    if log is None or log.is_stale():
+        log = (
+            JournalReplay(file_name) if is_journal(file_name) else ReplayLog(file_name)
+        )
+        _open_logs[key] = log
+    return log
+
+
+def process_step(file_name: str, step: int) -> list:
+    """
+    Return the recorded actions of every agent for one step of a log.
+
+    Drop-in replacement for the process_step helper the models used to define
+    inline; the log is indexed on first use and each call is a lookup.
+
+    :param file_name: str
+        Path of the log file, e.g. antgpt_hybrid_seed_21504.txt, or the prefix
+        of an action journal (see swarmgpt.journal).
+    :param step: int
+        The step number to replay.
+
+    :return: list
+        The replay records of the step (see parse_section).
+    """
+    return open_log(file_name).actions(step)
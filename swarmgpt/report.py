@@ -0,0 +1,276 @@
+"""
+Headless report of the paper figures from a directory of run exports.
+
+    python -m swarmgpt.report RUN_DIR --output figures_out --jobs 4
+
+The ant figures (3-5) are rendered from the food_collected_* and
+AntColony_*_duration CSV files and the flocking figures (7-10) from the
+headingsdiff_flockdata_* and distances_flockdata_* CSV files, or the
+flockdata_*.pairs files written by swarmgpt.runner, found in RUN_DIR, for every
+seed present. Figures are rendered with the Agg backend in a process
+pool, and a figure is skipped when its inputs and the analysis code are
+unchanged since it was last built (see <output>/manifest.json).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANTS_DATA = os.path.join(ROOT, "ants", "data")
+BIRDS_DATA = os.path.join(ROOT, "birds", "data")
+
+PLOT_KWARGS = {
+    "figsize": (12, 6),
+    "palette": "Set2",
+    "bbox_inches": "tight",
+    "pad_inches": 0.1,
+    "legend_title": "Model Variant",
+    "savefig": True,
+    "show": False,
+}
+
+# name: (analysis module, function, default output file, input file patterns)
+FIGURES = {
+    "figure3": (
+        "ants_food_collection",
+        "collected_food",
+        "collected_food_amount_hybrid.pdf",
+        (r"food_collected_(?:llm|netlogo|hybrid)_seed_(\d+)\.csv",),
+    ),
+    "figure4": (
+        "ants_food_collection",
+        "steps_return_food",
+        "steps_return_food.pdf",
+        (r"AntColony_(?:LLM|Netlogo|Hybrid)_Seed_(\d+)_wayback_duration\.csv",),
+    ),
+    "figure5": (
+        "ants_food_collection",
+        "steps_search_food",
+        "steps_search_food.pdf",
+        (r"AntColony_(?:LLM|Netlogo|Hybrid)_Seed_(\d+)_search_duration\.csv",),
+    ),
+    "figure7": (
+        "flocking",
+        "heading_differences",
+        "heading_differences_hybrid_rule-based.pdf",
+        (
+            r"(?:headingsdiff_)?flockdata_seed_(\d+)\.(?:csv|pairs)",
+            r"(?:headingsdiff_)?flockdata_rulebased_seed_(\d+)\.(?:csv|pairs)",
+        ),
+    ),
+    "figure8": (
+        "flocking",
+        "distances",
+        "distances_hybrid_rule-based.pdf",
+        (
+            r"(?:distances_)?flockdata_seed_(\d+)\.(?:csv|pairs)",
+            r"(?:distances_)?flockdata_rulebased_seed_(\d+)\.(?:csv|pairs)",
+        ),
+    ),
+    "figure9": (
+        "flocking",
+        "collisions",
+        "collisions_all.pdf",
+        (
+            r"(?:distances_)?flockdata_seed_(\d+)\.(?:csv|pairs)",
+            r"(?:distances_)?flockdata_rulebased_seed_(\d+)\.(?:csv|pairs)",
+        ),
+    ),
+    "figure10": (
+        "flocking",
+        "number_neighbours",
+        "average_neighbors_d_all.pdf",
+        (
+            r"(?:distances_)?flockdata_seed_(\d+)\.(?:csv|pairs)",
+            r"(?:distances_)?flockdata_rulebased_seed_(\d+)\.(?:csv|pairs)",
+        ),
+    ),
+}
+
+MANIFEST = "manifest.json"
+
+
+def find_inputs(run_dir: str, figure: str) -> dict:
+    """
+    Return the input files of a figure, grouped by pattern.
+
+    :return: dict
+        Maps each input pattern of the figure to the sorted list of
+        (seed, file_name) matches in run_dir, one per seed. A seed exported
+        both as CSV and as .pairs file is read from the .pairs file.
+    """
+    names = sorted(os.listdir(run_dir))
+    found = {}
+    for pattern in FIGURES[figure][3]:
+        regex = re.compile("^" + pattern + "$")
+        by_seed = {}
+        for name in names:
+            match = regex.match(name)
+            if match is None:
+                continue
+            seed = int(match.group(1))
+            if seed not in by_seed or name.endswith(".pairs"):
+                by_seed[seed] = name
+        found[pattern] = sorted(by_seed.items())
+    return found
+
+
+def _signature(run_dir: str, figure: str) -> list:
+    module = FIGURES[figure][0]
+    code = [
+        os.path.join(ANTS_DATA if module.startswith("ants") else BIRDS_DATA, name)
+        for name in (
+            ["ants_food_collection.py", "ants_dataset.py"]
+            if module.startswith("ants")
+            else ["flocking.py", "flock_dataset.py", "flock_neighbors.py"]
+        )
+    ] + [os.path.join(ROOT, "swarmgpt", "aggregate.py")]
+    files = [
+        os.path.join(run_dir, name)
+        for matches in find_inputs(run_dir, figure).values()
+        for _, name in matches
+    ]
+    signature = []
+    for path in code + files:
+        stat = os.stat(path)
+        signature.append([os.path.relpath(path, ROOT), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def render(figure: str, run_dir: str, output_dir: str, dataset: str = None) -> str:
+    """
+    Render one figure headlessly. Runs in a worker process.
+
+    :param figure: str
+        Key of FIGURES, e.g. "figure3".
+    :param run_dir: str
+        Directory holding the run exports.
+    :param output_dir: str
+        Directory the figure is written to.
+    :param dataset: str, optional
+        Parquet dataset of the ant CSV files, see ants_dataset.ensure_dataset.
+
+    :return: str
+        Path of the written figure.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    module_name, function_name, output, _ = FIGURES[figure]
+    sys.path.insert(0, ANTS_DATA if module_name.startswith("ants") else BIRDS_DATA)
+    module = __import__(module_name)
+    # Keep the aggregates (and the compact pairwise tables) for later builds
+    module.AGGREGATES.cache_dir = os.path.join(output_dir, "aggregate_cache")
+    if hasattr(module, "FLOCK_DATA"):
+        module.FLOCK_DATA.cache_dir = os.path.join(output_dir, "pairwise_cache")
+    kwargs = dict(PLOT_KWARGS, output=os.path.join(output_dir, output))
+    inputs = find_inputs(run_dir, figure)
+    if module_name.startswith("ants"):
+        seeds = sorted({seed for matches in inputs.values() for seed, _ in matches})
+        getattr(module, function_name)(dataset=dataset, seeds=seeds, **kwargs)
+    else:
+        hybrid, rule_based = (
+            [os.path.join(run_dir, name) for _, name in matches]
+            for matches in inputs.values()
+        )
+        getattr(module, function_name)(hybrid, rule_based, **kwargs)
+    return kwargs["output"]
+
+
+def build(
+    run_dir: str,
+    output_dir: str,
+    figures: list = None,
+    jobs: int = None,
+    force: bool = False,
+) -> dict:
+    """
+    Render the figures whose inputs or code changed since the last build.
+
+    :param run_dir: str
+        Directory holding the run exports.
+    :param output_dir: str
+        Directory of the figures and the build manifest.
+    :param figures: List of str, optional
+        Keys of FIGURES to build. Default is every figure with input files.
+    :param jobs: int, optional
+        Worker processes. Default is the number of CPUs.
+    :param force: bool, optional
+        Whether to rebuild figures that are up to date. Default is False.
+
+    :return: dict
+        Maps each figure to "built", "skipped", "no input" or an error message.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_file = os.path.join(output_dir, MANIFEST)
+    try:
+        with open(manifest_file, "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    status = {}
+    pending = {}
+    for figure in figures or FIGURES:
+        if not all(find_inputs(run_dir, figure).values()):
+            status[figure] = "no input"
+            continue
+        signature = _signature(run_dir, figure)
+        output = os.path.join(output_dir, FIGURES[figure][2])
+        if not force and manifest.get(figure) == signature and os.path.exists(output):
+            status[figure] = "skipped"
+            continue
+        pending[figure] = signature
+
+    dataset = None
+    if any(FIGURES[figure][0].startswith("ants") for figure in pending):
+        # Convert once here, the workers only read the dataset
+        sys.path.insert(0, ANTS_DATA)
+        from ants_dataset import ensure_dataset
+
+        # One dataset per run directory, so reports of several run directories
+        # sharing an output directory neither reconvert each other's datasets
+        # nor read their aggregates, which are keyed on the dataset files
+        run_key = hashlib.sha256(os.path.abspath(run_dir).encode("utf-8")).hexdigest()
+        dataset = ensure_dataset(
+            run_dir, os.path.join(output_dir, "ants_dataset", run_key[:16])
+        )
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            figure: executor.submit(render, figure, run_dir, output_dir, dataset)
+            for figure in pending
+        }
+        for figure, future in futures.items():
+            try:
+                future.result()
+                manifest[figure] = pending[figure]
+                status[figure] = "built"
+            except Exception as e:
+                manifest.pop(figure, None)
+                status[figure] = f"error: {e}"
+
+    with open(manifest_file, "w") as file:
+        json.dump(manifest, file, indent=1)
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("run_dir", help="directory holding the run exports")
+    parser.add_argument("--output", default="report", help="output directory")
+    parser.add_argument(
+        "--figures", nargs="*", choices=list(FIGURES), help="figures to build"
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--force", action="store_true", help="rebuild all figures")
+    args = parser.parse_args()
+    for figure, result in build(
+        args.run_dir, args.output, args.figures, args.jobs, args.force
+    ).items():
+        print(f"{figure}: {result}")
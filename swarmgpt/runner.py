@@ -0,0 +1,498 @@
+"""
+Parallel headless runs of the models over a grid of variants, seeds and agent
+counts.
+
+    python -m swarmgpt.runner runs --netlogo /opt/NetLogo --seeds 1 2 3 4 5 --jobs 4
+
+Every cell of the grid runs in its own headless NetLogo process, driven by a
+generated BehaviorSpace experiment. The LLM variants do not call the backend
+themselves: they use the stub backend, answered by one OpenAI-compatible
+service in the runner process that serves every worker from a single response
+cache and forwards the misses to the chosen backend. The service listens on a
+free port, passed to the models as llm_url. The exports of a cell are
+written to a private work directory and moved into RUN_DIR under the names
+ants_food_collection.py, flocking.py and swarmgpt.report expect, once the run
+has finished. The bird variants export flockdata_*.pairs files instead of the
+headingsdiff_* and distances_* CSV files; swarmgpt.report and the functions of
+flocking.py read both. A cell whose exports are already in RUN_DIR is skipped,
+so an interrupted sweep resumes with the cells it had not finished.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from swarmgpt import ants, birds
+from swarmgpt.backends import BACKENDS, make_client, serve_client
+from swarmgpt.cache import CachedClient, ResponseCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# model: path of the .nlogo file, relative to ROOT
+# setup: NetLogo commands creating the world of {agents} agents
+# settings: globals set between the world setup and setup-llm
+# steps: go calls per run, as with the stop condition of the go button
+# outputs: (file written in the work directory, file name in RUN_DIR)
+Variant = namedtuple(
+    "Variant",
+    ["model", "setup", "settings", "go", "steps", "default_agents", "outputs"],
+)
+
+LLM_SETTINGS = {"llm_backend": '"stub"', "batch_llm": "true", "journal_llm": "true"}
+# Variants without LLM agents never send a request
+RULE_BASED_SETTINGS = {"llm_backend": '"oracle"', "batch_llm": "true"}
+
+VARIANTS = {
+    "ants/hybrid": Variant(
+        "ants/AntColony_Hybrid_LLM_Rulebased.nlogo",
+        "setup_ants_with {agents}",
+        LLM_SETTINGS,
+        "go_ants",
+        1001,
+        10,
+        (
+            ("food_collected.csv", "food_collected_hybrid_seed_{seed}.csv"),
+            ("search.csv", "AntColony_Hybrid_Seed_{seed}_search_duration.csv"),
+            ("wayback.csv", "AntColony_Hybrid_Seed_{seed}_wayback_duration.csv"),
+        ),
+    ),
+    # The hybrid model without LLM ants is the rule-based NetLogo colony
+    "ants/netlogo": Variant(
+        "ants/AntColony_Hybrid_LLM_Rulebased.nlogo",
+        "setup_ants_with {agents}",
+        dict(RULE_BASED_SETTINGS, num_llm_ants="0"),
+        "go_ants",
+        1001,
+        10,
+        (
+            ("food_collected.csv", "food_collected_netlogo_seed_{seed}.csv"),
+            ("search.csv", "AntColony_Netlogo_Seed_{seed}_search_duration.csv"),
+            ("wayback.csv", "AntColony_Netlogo_Seed_{seed}_wayback_duration.csv"),
+        ),
+    ),
+    "ants/llm": Variant(
+        "ants/AntColony_LLM_Only.nlogo",
+        "setup_ants_with {agents}",
+        LLM_SETTINGS,
+        "go_ants",
+        1001,
+        10,
+        (
+            ("food_collected.csv", "food_collected_llm_seed_{seed}.csv"),
+            ("search.csv", "AntColony_LLM_Seed_{seed}_search_duration.csv"),
+            ("wayback.csv", "AntColony_LLM_Seed_{seed}_wayback_duration.csv"),
+        ),
+    ),
+    "birds/hybrid": Variant(
+        "birds/bird_flocking_hybrid_llm_rulebased.nlogo",
+        "set population {agents} setup_birds",
+        dict(LLM_SETTINGS, export_pairs="true"),
+        "go_birds",
+        800,
+        50,
+        (("flockdata_seed_{seed}.pairs", "flockdata_seed_{seed}.pairs"),),
+    ),
+    "birds/rulebased": Variant(
+        "birds/bird_flocking_hybrid_llm_rulebased.nlogo",
+        "set population {agents} set num_gpt_birds 0 setup_birds",
+        dict(RULE_BASED_SETTINGS, export_pairs="true"),
+        "go_birds",
+        800,
+        50,
+        (("flockdata_seed_{seed}.pairs", "flockdata_rulebased_seed_{seed}.pairs"),),
+    ),
+}
+
+# NetLogo commands writing the exports of a model into the current directory;
+# the bird model writes its .pairs file itself, see export_pairs
+EXPORTS = {
+    "ants/AntColony_Hybrid_LLM_Rulebased.nlogo": (
+        'export-food-collected-to-csv "food_collected.csv" '
+        'export-durations-to-csv "search.csv" "wayback.csv"'
+    ),
+    "ants/AntColony_LLM_Only.nlogo": (
+        'export-food-collected-to-csv "food_collected.csv" '
+        'export-durations-to-csv "search.csv" "wayback.csv"'
+    ),
+    "birds/bird_flocking_hybrid_llm_rulebased.nlogo": "",
+}
+
+# Complete the journals, metrics, pairwise files and summaries of the run (see
+# swarmgpt.lifecycle) before NetLogo stops the Python process
+CLOSE_PYTHON = 'py:run "from swarmgpt.lifecycle import end_run; end_run()"'
+
+# The service forwards the cache misses to one of these; "stub" would forward
+# them to the service itself
+SERVICE_BACKENDS = tuple(backend for backend in BACKENDS if backend != "stub")
+
+Cell = namedtuple("Cell", ["variant", "seed", "agents"])
+
+
+def _netlogo_string(text: str) -> str:
+    return '"' + text.replace("\\", "/").replace('"', '\\"') + '"'
+
+
+def cell_name(cell: Cell) -> str:
+    """
+    Return a file-system friendly name of a cell, e.g. ants-hybrid_seed_3_agents_10.
+    """
+    return f"{cell.variant.replace('/', '-')}_seed_{cell.seed}_agents_{cell.agents}"
+
+
+def output_dir(run_dir: str, cell: Cell) -> str:
+    """
+    Return the directory of the exports of a cell: RUN_DIR itself for the
+    default agent count of the model, RUN_DIR/agents_<n> otherwise, so each
+    directory holds one file per variant and seed.
+    """
+    if cell.agents == VARIANTS[cell.variant].default_agents:
+        return run_dir
+    return os.path.join(run_dir, f"agents_{cell.agents}")
+
+
+def outputs(run_dir: str, cell: Cell) -> list:
+    """
+    Return the (work directory file, RUN_DIR file) paths of the exports of a
+    cell, relative to the work directory and absolute respectively.
+    """
+    directory = output_dir(run_dir, cell)
+    return [
+        (
+            source.format(seed=cell.seed),
+            os.path.join(directory, target.format(seed=cell.seed)),
+        )
+        for source, target in VARIANTS[cell.variant].outputs
+    ]
+
+
+def is_complete(run_dir: str, cell: Cell) -> bool:
+    """
+    Whether every export of a cell is in RUN_DIR.
+    """
+    return all(os.path.exists(target) for _, target in outputs(run_dir, cell))
+
+
+def experiment_xml(cell: Cell, work_dir: str, settings: dict = None) -> str:
+    """
+    Return the BehaviorSpace experiment of one cell.
+
+    :param cell: Cell
+    :param work_dir: str
+        Directory the model writes its files to.
+    :param settings: dict, optional
+        Globals overriding the settings of the variant, as NetLogo literals,
+        e.g. {"schedule_llm": "true"}.
+    """
+    variant = VARIANTS[cell.variant]
+    settings = dict(variant.settings, **(settings or {}))
+    setup = [
+        f"set-current-directory {_netlogo_string(work_dir)}",
+        f'set used_seed "{cell.seed}"',
+        variant.setup.format(agents=cell.agents),
+        *(f"set {name} {value}" for name, value in settings.items()),
+        "setup-llm",
+    ]
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE experiments SYSTEM "behaviorspace.dtd">\n'
+        "<experiments>\n"
+        f'  <experiment name="{cell_name(cell)}" repetitions="1" '
+        'runMetricsEveryStep="false">\n'
+        f"    <setup>{escape(chr(10).join(setup))}</setup>\n"
+        f"    <go>{escape(variant.go)}</go>\n"
+        f"    <final>{escape(EXPORTS[variant.model] + chr(10) + CLOSE_PYTHON)}</final>\n"
+        f'    <timeLimit steps="{variant.steps}"/>\n'
+        "  </experiment>\n"
+        "</experiments>\n"
+    )
+
+
+def headless_script(netlogo: str) -> str:
+    """
+    Return the path of the headless launcher of a NetLogo installation.
+    """
+    name = "netlogo-headless.bat" if os.name == "nt" else "netlogo-headless.sh"
+    return os.path.join(netlogo, name)
+
+
+def run_cell(
+    cell: Cell, run_dir: str, netlogo: str, settings: dict = None, timeout=None
+) -> str:
+    """
+    Run one cell headlessly and move its exports into RUN_DIR.
+
+    :return: str
+        "done", or "failed (<reason>)" with the NetLogo output kept in
+        RUN_DIR/logs/<cell name>.log.
+    """
+    name = cell_name(cell)
+    work_dir = os.path.abspath(os.path.join(run_dir, ".work", name))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    setup_file = os.path.join(work_dir, "experiment.xml")
+    with open(setup_file, "w") as file:
+        file.write(experiment_xml(cell, work_dir, settings))
+    log_dir = os.path.join(run_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    # The models import swarmgpt relative to the working directory of NetLogo
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+    )
+    command = [
+        headless_script(netlogo),
+        "--model",
+        os.path.join(ROOT, VARIANTS[cell.variant].model),
+        "--setup-file",
+        setup_file,
+        "--experiment",
+        name,
+        "--threads",
+        "1",
+    ]
+    with open(os.path.join(log_dir, name + ".log"), "w") as log:
+        try:
+            result = subprocess.run(
+                command,
+                cwd=work_dir,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return "failed (timeout)"
+    if result.returncode != 0:
+        return f"failed (exit code {result.returncode})"
+    files = outputs(run_dir, cell)
+    missing = [
+        source
+        for source, _ in files
+        if not os.path.exists(os.path.join(work_dir, source))
+    ]
+    if missing:
+        return f"failed (missing {', '.join(missing)})"
+    for source, target in files:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(work_dir, source), target)
+    # Keep journals, profiles and metrics of the run next to the log
+    for extra in os.listdir(work_dir):
+        if extra != "experiment.xml":
+            os.replace(
+                os.path.join(work_dir, extra), os.path.join(log_dir, name + "." + extra)
+            )
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return "done"
+
+
+def grid(variants, seeds, agents=None) -> list:
+    """
+    Return the cells of a sweep.
+
+    :param variants: List of str
+        Keys of VARIANTS.
+    :param seeds: List of int
+    :param agents: List of int, optional
+        Agent counts. Default is the default count of each model.
+    """
+    return [
+        Cell(variant, seed, count)
+        for variant in variants
+        for count in (agents or [VARIANTS[variant].default_agents])
+        for seed in seeds
+    ]
+
+
+def start_service(
+    backend: str, cache_file: str, host: str = "127.0.0.1", **client_options
+):
+    """
+    Start the shared LLM service on a free port in a background thread.
+
+    :param backend: str
+        Backend the cache misses are forwarded to, one of SERVICE_BACKENDS, see
+        make_client.
+    :param cache_file: str
+        SQLite file of the ResponseCache shared by all workers.
+    :param host: str, optional
+        Address the service listens on. Default is the loopback address.
+
+    :return: ThreadingHTTPServer
+        Call shutdown() when the sweep is done. See service_url. Its cache
+        attribute is the ResponseCache.
+    """
+    if backend not in SERVICE_BACKENDS:
+        raise ValueError(
+            f"Unknown service backend {backend!r}, expected one of {SERVICE_BACKENDS}"
+        )
+    # The service answers ants and birds; cache the replies either one parses
+    client = CachedClient(
+        make_client(backend, **client_options),
+        ResponseCache(cache_file),
+        validate=lambda text: ants.ACTION_SCHEMA.parse(text).ok
+        or birds.ACTION_SCHEMA.parse(text).ok,
+    )
+    server = serve_client(client, host, 0)
+    server.cache = client.cache
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def service_url(server) -> str:
+    """
+    Return the endpoint of a service started by start_service, the llm_url of
+    the models.
+    """
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def run(
+    run_dir: str,
+    netlogo: str,
+    cells: list,
+    jobs: int = None,
+    backend: str = "openai",
+    cache_file: str = None,
+    settings: dict = None,
+    timeout=None,
+    force: bool = False,
+    **client_options,
+) -> dict:
+    """
+    Run the cells of a sweep that are not complete yet.
+
+    :param run_dir: str
+        Directory of the exports.
+    :param netlogo: str
+        NetLogo installation directory.
+    :param cells: List of Cell
+        See grid.
+    :param jobs: int, optional
+        NetLogo processes run at the same time. Default is the number of CPUs.
+    :param backend: str, optional
+        Backend of the shared LLM service, one of SERVICE_BACKENDS. Default is
+        "openai".
+    :param cache_file: str, optional
+        Response cache of the service. Default is RUN_DIR/llm_cache.sqlite.
+        Its hit and miss counts are written next to it, to llm_cache.stats.json.
+    :param settings: dict, optional
+        Globals set in every cell, see experiment_xml. llm_url is set to the
+        service.
+    :param timeout: float, optional
+        Seconds after which a cell is stopped and reported as failed.
+    :param force: bool, optional
+        Whether to rerun complete cells. Default is False.
+    :param client_options: optional
+        Passed to make_client, e.g. api_key.
+
+    :return: dict
+        Maps each cell to "skipped", "done" or "failed (<reason>)".
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    status = {}
+    pending = []
+    for cell in cells:
+        if not force and is_complete(run_dir, cell):
+            status[cell] = "skipped"
+        else:
+            pending.append(cell)
+    if not pending:
+        return status
+    cache_file = cache_file or os.path.join(run_dir, "llm_cache.sqlite")
+    server = start_service(backend, cache_file, **client_options)
+    settings = dict(
+        {"llm_url": _netlogo_string(service_url(server))}, **(settings or {})
+    )
+    try:
+        # Each worker thread waits on its own NetLogo process
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            futures = {
+                cell: executor.submit(
+                    run_cell, cell, run_dir, netlogo, settings, timeout
+                )
+                for cell in pending
+            }
+            for cell, future in futures.items():
+                try:
+                    status[cell] = future.result()
+                except Exception as e:
+                    status[cell] = f"failed ({e})"
+    finally:
+        server.shutdown()
+        server.cache.write(os.path.splitext(cache_file)[0] + ".stats.json")
+        server.cache.close()
+    try:
+        os.rmdir(os.path.join(run_dir, ".work"))
+    except OSError:
+        pass  # failed cells keep their work directories
+    return status
+
+
+def _setting(text: str) -> tuple:
+    name, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name, value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("run_dir", help="directory of the exports")
+    parser.add_argument(
+        "--netlogo",
+        default=os.environ.get("NETLOGO_HOME"),
+        help="NetLogo installation directory (default: $NETLOGO_HOME)",
+    )
+    parser.add_argument(
+        "--variants", nargs="*", choices=list(VARIANTS), default=list(VARIANTS)
+    )
+    parser.add_argument("--seeds", nargs="*", type=int, default=[1, 2, 3, 4, 5])
+    parser.add_argument(
+        "--agents", nargs="*", type=int, help="agent counts (default: model default)"
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="NetLogo processes")
+    parser.add_argument("--backend", choices=SERVICE_BACKENDS, default="openai")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--cache", default=None, help="response cache file")
+    parser.add_argument(
+        "--set",
+        type=_setting,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="NetLogo global set in every cell, e.g. schedule_llm=true",
+    )
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per cell")
+    parser.add_argument("--force", action="store_true", help="rerun complete cells")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="list the cells that would run"
+    )
+    args = parser.parse_args()
+    cells = grid(args.variants, args.seeds, args.agents)
+    if args.dry_run:
+        for cell in cells:
+            complete = not args.force and is_complete(args.run_dir, cell)
+            print(f"{cell_name(cell)}: {'skipped' if complete else 'pending'}")
+        sys.exit(0)
+    if not args.netlogo:
+        parser.error("--netlogo or NETLOGO_HOME is required")
+    for cell, result in run(
+        args.run_dir,
+        args.netlogo,
+        cells,
+        args.jobs,
+        args.backend,
+        args.cache,
+        dict(args.set),
+        args.timeout,
+        args.force,
+        api_key=args.api_key,
+    ).items():
+        print(f"{cell_name(cell)}: {result}")
@@ -0,0 +1,263 @@
+"""
+Request and token budgets, retries and a per-tick deadline for the LLM calls.
+
+The scheduler sits between the dispatcher and the model client. Every request
+first takes a slot of the requests-per-minute budget and its estimated tokens
+of the tokens-per-minute budget. Throttling and transient failures are retried
+with jittered exponential backoff, but only while the tick deadline allows it.
+A request that cannot complete in time raises DeadlineExceeded, and the
+dispatcher then answers that agent with the FALLBACK record. The models then
+run the rule-based procedure for that agent instead of dropping its action.
+"""
+
+import random
+import threading
+import time
+from functools import lru_cache
+
+from swarmgpt.backends import BackendError
+
+# Error message of the action record of an agent whose request failed or missed
+# the tick deadline; the models run the rule-based procedure for it
+FALLBACK = "fallback"
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request cannot complete before the tick deadline."""
+
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Rough token count of prompt texts (about four characters per token).
+    """
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+@lru_cache(maxsize=1)
+def _transient_errors() -> tuple:
+    # Connection and timeout errors of the clients, which carry no status code
+    errors = [ConnectionError, TimeoutError, BackendError]
+    try:
+        from openai import APIConnectionError  # includes APITimeoutError
+
+        errors.append(APIConnectionError)
+    except ImportError:
+        pass
+    try:
+        from httpx import TransportError  # raised by the ollama client
+
+        errors.append(TransportError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def _retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, _transient_errors()) and not isinstance(
+        error, DeadlineExceeded
+    )
+
+
+def _retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        :param per_minute: float
+            Budget per minute, also the burst capacity.
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float, deadline: float = None) -> bool:
+        """
+        Take an amount from the bucket, waiting for the refill if needed.
+
+        :param amount: float
+            Amount to take, capped at the capacity.
+        :param deadline: float, optional
+            time.monotonic() value after which waiting is pointless. Default is
+            no deadline.
+
+        :return: bool
+            False if the amount would only be available after the deadline.
+        """
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.level >= amount:
+                    self.level -= amount
+                    return True
+                wait = (amount - self.level) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def refund(self, amount: float) -> None:
+        """
+        Return an amount to the bucket; a negative amount charges it.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Enforce request and token budgets and retry failed requests within the
+    deadline of the tick.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        tick_deadline: float = None,
+        seed=None,
+    ):
+        """
+        :param requests_per_minute: float, optional
+            Request budget. Default is None (unlimited).
+        :param tokens_per_minute: float, optional
+            Token budget, charged with the estimated prompt tokens plus the
+            completion limit and settled with the reported usage. Default is
+            None (unlimited).
+        :param max_retries: int, optional
+            Retries of a throttled or failed request. Default is 3.
+        :param backoff: float, optional
+            Base delay in seconds of the exponential backoff. Default is 0.5.
+        :param max_backoff: float, optional
+            Longest delay between two attempts. Default is 8.
+        :param tick_deadline: float, optional
+            Seconds from begin_tick within which every request of the tick
+            must complete. Default is None (no deadline).
+        :param seed: int, optional
+            Seed of the backoff jitter.
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.tick_deadline = tick_deadline
+        self.deadline = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = dict(requests=0, retries=0, failures=0, deadline_misses=0)
+
+    def begin_tick(self) -> None:
+        """
+        Start the deadline of a new tick. The models call it once at the start
+        of every tick.
+        """
+        self.deadline = (
+            None
+            if self.tick_deadline is None
+            else time.monotonic() + self.tick_deadline
+        )
+
+    def remaining(self):
+        """
+        Return the seconds left before the tick deadline, or None.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _acquire(self, tokens: int) -> bool:
+        if self.requests is not None and not self.requests.acquire(1, self.deadline):
+            return False
+        if self.tokens is not None and not self.tokens.acquire(tokens, self.deadline):
+            if self.requests is not None:
+                self.requests.refund(1)
+            return False
+        return True
+
+    def _miss(self, retries: int, cause: Exception = None):
+        self._count("deadline_misses")
+        error = DeadlineExceeded("request missed the tick deadline")
+        error.retries = retries
+        error.__cause__ = cause
+        return error
+
+    def call(self, send, tokens: int = 0) -> tuple:
+        """
+        Run a request under the budgets, retrying it until the deadline.
+
+        :param send: callable
+            send(remaining) performs one attempt and returns the response;
+            remaining is the number of seconds left before the deadline, or
+            None, to bound the request timeout.
+        :param tokens: int, optional
+            Estimated tokens of the request, see estimate_tokens.
+
+        :return: tuple
+            (response, retries)
+
+        :raises DeadlineExceeded: if the request cannot complete in time. The
+            number of retries is in its retries attribute.
+        """
+        self._count("requests")
+        retries = 0
+        while True:
+            if self.remaining() == 0 or not self._acquire(tokens):
+                raise self._miss(retries)
+            try:
+                response = send(self.remaining())
+            except Exception as e:
+                if self.tokens is not None:
+                    self.tokens.refund(tokens)
+                if not _retryable(e) or retries >= self.max_retries:
+                    self._count("failures")
+                    e.retries = retries
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2**retries)
+                    delay *= self._random.uniform(0.5, 1.0)
+                if (
+                    self.deadline is not None
+                    and time.monotonic() + delay > self.deadline
+                ):
+                    raise self._miss(retries, e)
+                time.sleep(delay)
+                retries += 1
+                self._count("retries")
+                continue
+            if self.tokens is not None:
+                # Settle the estimate; cache hits report no usage and cost none
+                usage = getattr(response, "usage", None)
+                self.tokens.refund(tokens - (getattr(usage, "total_tokens", 0) or 0))
+            return response, retries
@@ -0,0 +1,14 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# swarmgpt is imported from the checkout; the analysis scripts import each
+# other from their data directories, as when run from there
+for path in (
+    ROOT,
+    os.path.join(ROOT, "ants", "data"),
+    os.path.join(ROOT, "birds", "data"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,59 @@
+import sqlite3
+
+from swarmgpt.backends import make_client
+from swarmgpt.cache import CachedClient, ResponseCache
+
+MESSAGES = [
+    {"role": "system", "content": "You are an ant."},
+    {"role": "user", "content": "Nest Presence: **True**"},
+]
+
+
+def last_used(path):
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT key, last_used FROM responses"))
+
+
+def test_hits_are_answered_from_the_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    client = CachedClient(make_client("oracle"), cache)
+    first = client.chat.completions.create(model="m", messages=MESSAGES)
+    second = client.chat.completions.create(model="m", messages=MESSAGES)
+    assert not getattr(first, "cached", False)
+    assert second.cached
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert second.usage.total_tokens == 0
+    other = client.chat.completions.create(model="m", messages=MESSAGES, max_tokens=5)
+    assert not getattr(other, "cached", False)
+    assert cache.stats()["hits"] == 1
+    cache.close()
+
+
+def test_hit_times_are_written_with_the_next_put_or_on_close(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=2)
+    cache.put("a", "m", "reply a")
+    cache.put("b", "m", "reply b")
+    stored = last_used(path)
+    assert cache.get("a") == "reply a"
+    # no write on the hit
+    assert last_used(path) == stored
+    # the hit on "a" is written before evicting, so "b" is the least recent
+    cache.put("c", "m", "reply c")
+    assert sorted(last_used(path)) == ["a", "c"]
+    assert cache.get("c") == "reply c"
+    stored = last_used(path)["c"]
+    cache.close()
+    assert last_used(path)["c"] > stored
+    cache.close()
+
+
+def test_rejected_replies_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    client = CachedClient(make_client("oracle"), cache, validate=lambda text: False)
+    client.chat.completions.create(model="m", messages=MESSAGES)
+    assert not getattr(
+        client.chat.completions.create(model="m", messages=MESSAGES), "cached", False
+    )
+    assert cache.stats()["entries"] == 0
+    cache.close()
@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+import pytest
+
+from swarmgpt.flock import FlockEngine, NeighborIndex
+
+WORLD = 71.0
+PARAMS = [1.5, 5.0, 3.0, 1.0, 5.0]
+
+
+def _wrap(delta):
+    return delta - WORLD * round(delta / WORLD)
+
+
+def _subtract_headings(heading1, heading2):
+    diff = (heading1 - heading2) % 360.0
+    return diff - 360.0 if diff > 180.0 else diff
+
+
+def _atan(x, y):
+    return math.degrees(math.atan2(x, y)) % 360.0
+
+
+def _turn_at_most(heading, turn, max_turn):
+    if abs(turn) > max_turn:
+        turn = max_turn if turn > 0 else -max_turn
+    return (heading + turn) % 360.0
+
+
+def netlogo_flock(state, bird, params):
+    """
+    The flock procedure of the model for one bird, transcribed statement by
+    statement, on the state at the start of the step.
+    """
+    max_separate, max_align, max_cohere, min_separation, vision = params
+    x, y, heading = state[bird]
+    flockmates = []
+    for other, (ox, oy, other_heading) in enumerate(state):
+        dx, dy = _wrap(ox - x), _wrap(oy - y)
+        if other != bird and math.hypot(dx, dy) <= vision:
+            flockmates.append((math.hypot(dx, dy), dx, dy, other_heading))
+    if not flockmates:
+        return heading
+
+    nearest = min(flockmates, key=lambda mate: mate[0])
+    if nearest[0] < min_separation:
+        # separate: turn-away ([heading] of nearest-neighbor) max-separate-turn
+        return _turn_at_most(
+            heading, _subtract_headings(heading, nearest[3]), max_separate
+        )
+
+    # align: turn-towards average-flockmate-heading max-align-turn
+    x_component = sum(math.sin(math.radians(mate[3])) for mate in flockmates)
+    y_component = sum(math.cos(math.radians(mate[3])) for mate in flockmates)
+    if x_component != 0 or y_component != 0:
+        target = _atan(x_component, y_component)
+        heading = _turn_at_most(heading, _subtract_headings(target, heading), max_align)
+
+    # cohere: turn-towards average-heading-towards-flockmates max-cohere-turn,
+    # with towards myself + 180 the heading from the bird to the flockmate
+    towards = [_atan(dx, dy) for _, dx, dy, _ in flockmates]
+    x_component = np.mean([math.sin(math.radians(t)) for t in towards])
+    y_component = np.mean([math.cos(math.radians(t)) for t in towards])
+    if x_component != 0 or y_component != 0:
+        target = _atan(x_component, y_component)
+        heading = _turn_at_most(
+            heading, _subtract_headings(target, heading), max_cohere
+        )
+    return heading
+
+
+def random_state(n_birds, seed):
+    generator = np.random.default_rng(seed)
+    return np.column_stack(
+        (
+            generator.uniform(-WORLD / 2, WORLD / 2, n_birds),
+            generator.uniform(-WORLD / 2, WORLD / 2, n_birds),
+            generator.uniform(0, 360, n_birds),
+        )
+    ).tolist()
+
+
+def _angle_error(headings, expected):
+    diff = np.mod(np.subtract(headings, expected), 360.0)
+    return np.minimum(diff, 360.0 - diff)
+
+
+@pytest.mark.parametrize("n_birds, n_llm, seed", [(30, 5, 0), (100, 5, 1), (60, 0, 2)])
+def test_step_matches_netlogo_flock_per_bird(n_birds, n_llm, seed):
+    # dense enough for birds that separate, align and cohere, and loners
+    state = random_state(n_birds, seed)
+    headings = FlockEngine(WORLD, WORLD).step(state, n_llm, PARAMS)
+    expected = [netlogo_flock(state, bird, PARAMS) for bird in range(n_llm, n_birds)]
+    assert len(headings) == n_birds - n_llm
+    assert _angle_error(headings, expected).max() < 1e-9
+
+
+def test_step_wraps_around_the_world_edges():
+    # two birds across the vertical edge are 1 apart on the torus
+    state = [[35.0, 0.0, 90.0], [-35.0, 0.5, 0.0], [0.0, 0.0, 180.0]]
+    params = [1.5, 5.0, 3.0, 0.5, 2.0]
+    headings = FlockEngine(WORLD, WORLD).step(state, 0, params)
+    expected = [netlogo_flock(state, bird, params) for bird in range(3)]
+    assert _angle_error(headings, expected).max() < 1e-9
+    assert headings[2] == 180.0
+
+
+def test_neighbor_index_returns_closest_flockmates_in_vision():
+    state = random_state(80, 3)
+    birds = [0, 1, 2, 3, 4]
+    vision = 8.0
+    neighbors = NeighborIndex(WORLD, WORLD, closest=8).query(state, birds, vision)
+    for bird, mates in zip(birds, neighbors):
+        x, y, _ = state[bird]
+        distance = {
+            other: math.hypot(_wrap(ox - x), _wrap(oy - y))
+            for other, (ox, oy, _) in enumerate(state)
+            if other != bird
+        }
+        expected = sorted((d, other) for other, d in distance.items() if d <= vision)[
+            :8
+        ]
+        assert [mate[0] for mate in mates] == [other for _, other in expected]
+        for who, rel_x, rel_y in mates:
+            assert rel_x == state[who][0] - x
+            assert rel_y == state[who][1] - y
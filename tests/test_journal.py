@@ -0,0 +1,44 @@
+import pytest
+
+from ants_food_collection import load_food_collected
+from swarmgpt.journal import ActionJournal, JournalReplay, segments
+
+
+def write_journal(prefix, steps, compress=False):
+    journal = ActionJournal(prefix, {"seed": 1}, compress=compress)
+    for step in steps:
+        journal.end_step(step, [[0, True, ["move"], 0]], {"food_amount": step // 2})
+    return journal
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_food_collected_from_interrupted_journal(tmp_path, compress):
+    prefix = str(tmp_path / "antgpt_hybrid_seed_1")
+    journal = write_journal(prefix, range(4), compress)
+    journal.close()
+    segment = segments(prefix)[-1][1]
+    # cut into the last record, as a killed run leaves it
+    with open(segment, "rb") as file:
+        content = file.read()
+    with open(segment, "wb") as file:
+        file.write(content[: len(content) - 30])
+    data = load_food_collected(prefix)
+    assert list(data.columns) == ["step_number", "food_amount"]
+    # the complete steps before the cut
+    steps = list(data["step_number"])
+    assert 0 < len(steps) < 4
+    assert steps == list(range(len(steps)))
+    assert list(data["food_amount"]) == [step // 2 for step in steps]
+
+
+def test_replay_is_stale_when_a_segment_grows(tmp_path):
+    prefix = str(tmp_path / "antgpt_hybrid_seed_2")
+    journal = write_journal(prefix, range(2))
+    replay = JournalReplay(prefix)
+    assert not replay.is_stale()
+    assert replay.actions(1)[0][:3] == ["0", True, True]
+    assert replay.actions(2) == []
+    journal.end_step(2, [[0, True, ["move"], 0]], {"food_amount": 1})
+    assert replay.is_stale()
+    assert JournalReplay(prefix).actions(2)
+    journal.close()
@@ -0,0 +1,112 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from swarmgpt.metrics import (
+    MISSING,
+    MetricsAccumulator,
+    P2Quantile,
+    StreamStats,
+    Welford,
+)
+
+
+def durations(size, seed=0):
+    # skewed like the search durations of the runs
+    return np.random.default_rng(seed).gamma(2.0, 40.0, size).round()
+
+
+@pytest.mark.parametrize("size", [1, 2, 10, 5000])
+def test_welford_matches_numpy(size):
+    values = durations(size)
+    moments = Welford()
+    for value in values:
+        moments.add(value)
+    assert moments.count == size
+    assert moments.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert moments.min == values.min()
+    assert moments.max == values.max()
+    if size > 1:
+        assert moments.variance == pytest.approx(values.var(ddof=1), rel=1e-9)
+        assert moments.std == pytest.approx(values.std(ddof=1), rel=1e-9)
+    else:
+        assert math.isnan(moments.variance)
+
+
+@pytest.mark.parametrize("p", [0.25, 0.5, 0.75])
+@pytest.mark.parametrize("size", [1, 3, 5])
+def test_p2_quantile_is_exact_for_few_values(p, size):
+    values = durations(size, seed=1)
+    estimator = P2Quantile(p)
+    for value in values:
+        estimator.add(value)
+    assert estimator.value == pytest.approx(np.quantile(values, p))
+
+
+@pytest.mark.parametrize("p", [0.25, 0.5, 0.75])
+@pytest.mark.parametrize("seed", [2, 3])
+def test_p2_quantile_estimates_numpy_quantile(p, seed):
+    values = durations(20000, seed)
+    estimator = P2Quantile(p)
+    for value in values:
+        estimator.add(value)
+    # within 2% of the spread of the data
+    spread = np.quantile(values, 0.75) - np.quantile(values, 0.25)
+    assert abs(estimator.value - np.quantile(values, p)) < 0.02 * spread
+
+
+def test_p2_quantile_without_values_is_nan():
+    assert math.isnan(P2Quantile(0.5).value)
+
+
+def test_stream_stats_summary_has_describe_keys():
+    values = durations(3, seed=4)
+    stats = StreamStats()
+    for value in values:
+        stats.add(value)
+    summary = stats.summary()
+    described = pd.Series(values).describe()
+    assert list(summary) == list(described.index)
+    for key, value in described.items():
+        assert summary[key] == pytest.approx(value)
+
+
+def test_accumulator_stat_and_summary_file(tmp_path):
+    prefix = str(tmp_path / "antgpt_hybrid_seed_1")
+    metrics = MetricsAccumulator(prefix, "Hybrid", {"seed": 1}, flush_every=2)
+    # nothing recorded yet: NetLogo gets a number, not NaN
+    assert metrics.stat("search", 1, "mean") == MISSING
+    metrics.add("search", 1, 12)
+    assert metrics.stat("search", 1, "mean") == 12
+    assert metrics.stat("search", 1, "std") == MISSING
+    metrics.add("search", 1, 20)
+    metrics.add("wayback", 2, 7, source="NetLogo")
+    assert metrics.stat("search", 1, "std") == pytest.approx(np.std([12, 20], ddof=1))
+    assert metrics.stat("wayback", 2, "max", source="NetLogo") == 7
+    assert metrics.stat("wayback", 2, "max") == MISSING
+
+    metrics.end_step(0, 0)
+    metrics.end_step(1, 3)
+    with open(metrics.file_name) as file:
+        record = json.load(file)
+    assert record["seed"] == 1
+    assert record["step"] == 1
+    assert record["food_amounts"] == [0, 3]
+    wayback = record["durations"]["wayback"]
+    assert wayback == [
+        {
+            "source": "NetLogo",
+            "food_patch": 2,
+            "count": 1,
+            "mean": 7.0,
+            "std": None,
+            "min": 7.0,
+            "25%": 7.0,
+            "50%": 7.0,
+            "75%": 7.0,
+            "max": 7.0,
+        }
+    ]
@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from flock_dataset import iter_upper_triangle, read_condensed, read_positions
+from swarmgpt.pairwise import HEADER, PairwiseWriter, PositionWriter
+
+WORLD = 71.0
+
+
+def flock_states(n_birds, n_steps, seed=0):
+    generator = np.random.default_rng(seed)
+    return [
+        np.column_stack(
+            (
+                generator.uniform(-WORLD / 2, WORLD / 2, n_birds),
+                generator.uniform(-WORLD / 2, WORLD / 2, n_birds),
+                generator.uniform(0, 360, n_birds),
+            )
+        ).tolist()
+        for _ in range(n_steps)
+    ]
+
+
+def expected_pairs(states):
+    # calculate-differences of the model: distance and heading-difference of
+    # every bird pair, kept once per unordered pair
+    rows = []
+    for step, state in enumerate(states):
+        for i, (x1, y1, h1) in enumerate(state):
+            for j, (x2, y2, h2) in enumerate(state[i + 1 :], i + 1):
+                dx = abs(x1 - x2)
+                dy = abs(y1 - y2)
+                distance = math.hypot(min(dx, WORLD - dx), min(dy, WORLD - dy))
+                diff = (h1 - h2) % 360.0
+                rows.append(
+                    (step, i, j, distance, abs(diff - 360.0 if diff > 180.0 else diff))
+                )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "step_number",
+            "bird1_id",
+            "bird2_id",
+            "distance",
+            "heading_difference",
+        ],
+    )
+
+
+def write_pairs(file_name, states, writer=PairwiseWriter):
+    pairs = writer(str(file_name), len(states[0]), WORLD, WORLD)
+    for step, state in enumerate(states):
+        pairs.write(step, state)
+    pairs.close()
+
+
+def test_pairs_round_trip(tmp_path):
+    states = flock_states(12, 5)
+    file_name = tmp_path / "flockdata_seed_1.pairs"
+    write_pairs(file_name, states)
+    data = read_condensed(str(file_name))
+    expected = expected_pairs(states)
+    assert list(data.columns) == list(expected.columns)
+    for column in ("step_number", "bird1_id", "bird2_id"):
+        np.testing.assert_array_equal(data[column], expected[column])
+    for column in ("distance", "heading_difference"):
+        # stored as float32
+        np.testing.assert_allclose(data[column], expected[column], rtol=1e-6, atol=1e-4)
+
+
+def test_pairs_step_selection_and_chunks(tmp_path):
+    states = flock_states(6, 7)
+    file_name = tmp_path / "flockdata_seed_2.pairs"
+    write_pairs(file_name, states)
+    full = read_condensed(str(file_name))
+    sliced = read_condensed(str(file_name), slice(1, None, 3))
+    assert sorted(sliced["step_number"].unique()) == [1, 4]
+    pd.testing.assert_frame_equal(
+        sliced.reset_index(drop=True),
+        full[full["step_number"].isin([1, 4])].reset_index(drop=True),
+    )
+    chunks = list(iter_upper_triangle(str(file_name), ["distance"], chunksize=30))
+    assert len(chunks) == 4
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True),
+        full[["step_number", "bird1_id", "bird2_id", "distance"]],
+    )
+
+
+def test_partial_last_record_is_ignored(tmp_path):
+    states = flock_states(5, 3)
+    file_name = tmp_path / "flockdata_seed_3.pairs"
+    write_pairs(file_name, states)
+    with open(file_name, "ab") as file:
+        file.write(b"\0" * 10)
+    assert read_condensed(str(file_name))["step_number"].max() == 2
+
+
+def test_unknown_version_and_magic_are_rejected(tmp_path):
+    states = flock_states(4, 2)
+    file_name = tmp_path / "flockdata_seed_4.pairs"
+    write_pairs(file_name, states)
+    content = bytearray(file_name.read_bytes())
+    offset = HEADER.fields["version"][1]
+    content[offset : offset + 4] = (99).to_bytes(4, "little")
+    file_name.write_bytes(bytes(content))
+    with pytest.raises(ValueError, match="version"):
+        read_condensed(str(file_name))
+    positions = tmp_path / "flockdata_seed_4.positions"
+    write_pairs(positions, states, PositionWriter)
+    with pytest.raises(ValueError, match="SWGPAIRS"):
+        read_condensed(str(positions))
+
+
+def test_positions_round_trip(tmp_path):
+    states = flock_states(8, 3)
+    file_name = tmp_path / "flockdata_seed_5.positions"
+    write_pairs(file_name, states, PositionWriter)
+    data = read_positions(str(file_name))
+    assert data.attrs["world_size"] == (WORLD, WORLD)
+    np.testing.assert_array_equal(data["step_number"], np.repeat(np.arange(3), 8))
+    np.testing.assert_array_equal(data["bird_id"], np.tile(np.arange(8), 3))
+    np.testing.assert_allclose(
+        data[["xcor", "ycor", "heading"]].to_numpy(),
+        np.concatenate(states),
+        rtol=1e-6,
+        atol=1e-4,
+    )
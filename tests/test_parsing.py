@@ -0,0 +1,99 @@
+import pytest
+
+from swarmgpt import ants, birds
+from swarmgpt.parsing import ParseCode
+
+ANT_REPLY = (
+    '{"move-forward": true, "rotate": "left", "pick-up-food": false, '
+    '"drop-pheromone": true, "drop-food": false}'
+)
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(ants, "VERBOSE", False)
+    monkeypatch.setattr(birds, "VERBOSE", False)
+
+
+def test_plain_reply():
+    assert ants.parse_response(ANT_REPLY) == [
+        True,
+        "None",
+        True,
+        "left",
+        False,
+        True,
+        False,
+    ]
+
+
+def test_fenced_reply_with_prose():
+    reply = f"Sure, here is my action:\n```json\n{ANT_REPLY}\n```\nGood luck!"
+    assert ants.parse_response(reply)[:4] == [True, "None", True, "left"]
+
+
+def test_python_style_dictionary_and_key_spelling():
+    reply = (
+        "{'Move_Forward': True, 'ROTATE': 'Random', 'pick_up_food': 'false', "
+        "'drop_pheromone': False, 'drop_food': True}"
+    )
+    assert ants.parse_response(reply) == [
+        True,
+        "None",
+        True,
+        "random",
+        False,
+        False,
+        True,
+    ]
+
+
+def test_nested_braces_in_rationale():
+    reply = (
+        'I turn. {"new-heading": 95.5, "rationale": "neighbors at {1, 2} '
+        'and {3, 4} \\"}\\" keep cohesion"} trailing {text}'
+    )
+    result = birds.ACTION_SCHEMA.parse(reply)
+    assert result.ok
+    assert result.action.new_heading == 95.5
+    assert result.action.rationale == 'neighbors at {1, 2} and {3, 4} "}" keep cohesion'
+    assert birds.parse_response(reply) == [True, "None", 95.5]
+
+
+def test_missing_optional_rationale():
+    assert birds.parse_response('{"new_heading": "270"}') == [True, "None", 270.0]
+
+
+@pytest.mark.parametrize(
+    "reply, code",
+    [
+        ("", ParseCode.EMPTY),
+        ("   \n", ParseCode.EMPTY),
+        ("I will move forward.", ParseCode.NO_OBJECT),
+        ('{"move-forward": true, "rotate": ', ParseCode.BAD_JSON),
+        ("[1, 2, 3] {nonsense: ]", ParseCode.BAD_JSON),
+        ('{"move-forward": true, "rotate": "left"}', ParseCode.MISSING_KEY),
+        (ANT_REPLY.replace('"left"', '"sideways"'), ParseCode.BAD_VALUE),
+        (ANT_REPLY.replace("true", '"yes"', 1), ParseCode.BAD_VALUE),
+        (ANT_REPLY.replace("false", "1", 1), ParseCode.BAD_VALUE),
+        (ANT_REPLY.replace("false", "null", 1), ParseCode.BAD_VALUE),
+    ],
+)
+def test_ant_reply_errors(reply, code):
+    result = ants.ACTION_SCHEMA.parse(reply)
+    assert result.code == code
+    assert result.action is None
+    assert result.message
+    assert ants.parse_response(reply) == [False, result.message]
+
+
+@pytest.mark.parametrize(
+    "reply",
+    [
+        '{"new-heading": "north"}',
+        '{"new-heading": null}',
+        '{"new-heading": [90]}',
+    ],
+)
+def test_bird_reply_bad_heading(reply):
+    assert birds.ACTION_SCHEMA.parse(reply).code == ParseCode.BAD_VALUE
@@ -0,0 +1,18 @@
+from swarmgpt.report import find_inputs
+
+
+def test_find_inputs_reads_each_seed_once_preferring_pairs(tmp_path):
+    for name in (
+        "distances_flockdata_seed_1.csv",
+        "flockdata_seed_1.pairs",
+        "distances_flockdata_seed_2.csv",
+        "flockdata_rulebased_seed_1.pairs",
+        "headingsdiff_flockdata_seed_1.csv",
+    ):
+        (tmp_path / name).touch()
+    hybrid, rule_based = find_inputs(str(tmp_path), "figure8").values()
+    assert hybrid == [
+        (1, "flockdata_seed_1.pairs"),
+        (2, "distances_flockdata_seed_2.csv"),
+    ]
+    assert rule_based == [(1, "flockdata_rulebased_seed_1.pairs")]